@@ -1,14 +1,62 @@
 """Autonomous AI marketing agent scheduler."""
 
 import asyncio
-import time
+import logging
+import os
 import random
+import threading
 from datetime import datetime
+from functools import partial
 from src.agent.graph import graph, State
+from src.agent.accounts import DEFAULT_ACCOUNT, get_account, load_accounts
+from src.agent.clients import close_http_session
+from src.agent.content_buffer import next_tweet
+from src.agent.coordination import MEDIA_QUEUE, WORKER_ID, get_lease_store
+from src.agent.firecrawl_agent import scrape_product_data
+from src.agent.image_pool import IMAGE_POOL_SIZE, refill_image_pool
+from src.agent.ledger import get_ledger
+from src.agent.media_optimizer import shutdown_process_pool
+from src.agent.media_pipeline import MEDIA_WORK_QUEUE, produce_video_assets
+from src.agent.metrics import start_metrics_server
+from src.agent.scheduler_engine import Job, Scheduler
+from src.agent.youtube_agent import get_channel_statistics
 
-async def run_agent():
-    """Run the AI marketing agent autonomously."""
-    print(f"\n[{datetime.now()}] AI Agent running autonomously...")
+logger = logging.getLogger(__name__)
+
+# Post every 1 hour 17 minutes, with up to 5 minutes of jitter
+POST_INTERVAL = int(os.getenv("POST_INTERVAL_SECONDS", (1 * 60 * 60) + (17 * 60)))
+POST_JITTER = int(os.getenv("POST_JITTER_SECONDS", 5 * 60))
+ANALYTICS_INTERVAL = int(os.getenv("ANALYTICS_INTERVAL_SECONDS", 6 * 60 * 60))
+RESCRAPE_CRON = os.getenv("RESCRAPE_CRON", "0 6 * * *")
+# Time budget of a post run; optional stages (video, uploads) are skipped to meet it
+POST_BUDGET = float(os.getenv("POST_BUDGET_SECONDS", 15 * 60))
+# Max posts in flight across all accounts in this worker
+MAX_CONCURRENT_POSTS = int(os.getenv("MAX_CONCURRENT_POSTS", "4"))
+
+# Leased media work: every worker polls, each item runs on one worker
+MEDIA_POLL_INTERVAL = int(os.getenv("MEDIA_POLL_INTERVAL_SECONDS", "30"))
+MEDIA_CONCURRENCY = int(os.getenv("MEDIA_CONCURRENCY", "2"))
+MEDIA_LEASE_TTL = int(os.getenv("MEDIA_LEASE_TTL_SECONDS", 30 * 60))
+MEDIA_MAX_ATTEMPTS = 3
+
+# Top up the pre-generated image pools this often
+IMAGE_POOL_INTERVAL = int(os.getenv("IMAGE_POOL_INTERVAL_SECONDS", 15 * 60))
+
+# Posts left in progress (a crashed run) are resumed after this long
+POST_RESUME_AFTER = int(os.getenv("POST_RESUME_AFTER_SECONDS", 10 * 60))
+# ...at most this many times and this long after they started; then failed, or done if already posted
+POST_MAX_RESUMES = int(os.getenv("POST_MAX_RESUMES", "3"))
+POST_RESUME_MAX_AGE = int(os.getenv("POST_RESUME_MAX_AGE_SECONDS", 24 * 60 * 60))
+
+_post_slots = None
+
+async def run_agent(account=None):
+    """Run the AI marketing agent autonomously for one account."""
+    global _post_slots
+    account = account or get_account()
+    if _post_slots is None:
+        _post_slots = asyncio.Semaphore(MAX_CONCURRENT_POSTS)
+    print(f"\n[{datetime.now()}] AI Agent running autonomously for {account.name}...")
     
     # UGC-style post ideas that rotate
     post_ideas = [
@@ -24,27 +72,161 @@ async def run_agent():
         "real question - why pay $100/month for credit repair when AI does it free?",
     ]
     
-    query = f"post a new tweet: {random.choice(post_ideas)}"
+    context = {"account": account.name, "budget_seconds": POST_BUDGET}
+
+    # Finish an interrupted post first; its completed steps are not repeated
+    stale = await asyncio.to_thread(
+        get_ledger().incomplete_posts, account.name, POST_RESUME_AFTER, POST_MAX_RESUMES, POST_RESUME_MAX_AGE
+    )
+    if stale and stale[0]["query"]:
+        query = stale[0]["query"]
+        context["idempotency_key"] = stale[0]["key"]
+        kind = "partial" if stale[0]["status"] == "partial" else "interrupted"
+        resumes = await asyncio.to_thread(get_ledger().record_resume, stale[0]["key"])
+        logger.info(f"Resuming {kind} post {stale[0]['key']} (attempt {resumes} of {POST_MAX_RESUMES})")
+    else:
+        # Pre-generated tweet from the content buffer; the fixed ideas are a fallback
+        tweet = await next_tweet(account)
+        query = f"post a new tweet: {tweet or random.choice(post_ideas)}"
     
     try:
-        result = await graph.ainvoke(State(query=query))
-        print(f"[{datetime.now()}] ✅ Posted successfully")
+        result = {}
+        async with _post_slots:
+            # Stream progress so the tweet URL shows up before the video stage finishes
+            async for mode, chunk in graph.astream(
+                State(query=query, account=account.name),
+                context=context,
+                stream_mode=["custom", "values"],
+            ):
+                if mode == "values":
+                    result = chunk
+                elif chunk.get("event") == "tweet_posted":
+                    logger.info(f"Tweet posted for {account.name}: {chunk['url']}")
+                else:
+                    logger.info(f"Post {chunk.get('post_key')}: {chunk}")
+        print(f"[{datetime.now()}] ✅ Posted successfully for {account.name}")
+        if result.get("degraded"):
+            logger.info(f"Skipped to stay within {POST_BUDGET:.0f}s, to finish on resume: "
+                        f"{', '.join(d['stage'] for d in result['degraded'])}")
         print(f"Result: {result.get('analysis', 'N/A')[:200]}...")
     except Exception as e:
-        print(f"[{datetime.now()}] ❌ Failed: {e}")
+        print(f"[{datetime.now()}] ❌ Failed for {account.name}: {e}")
+
+async def refresh_analytics(account=None):
+    """Refresh YouTube channel statistics for one account."""
+    account = account or get_account()
+    if not account.youtube_account_id:
+        return  # Would fall back to the default account's YouTube connection
+    result = await asyncio.to_thread(
+        get_channel_statistics, connected_account_id=account.youtube_account_id
+    )
+    if result.get("success"):
+        print(f"[{datetime.now()}] 📊 {account.name} channel stats: {result['statistics']}")
+
+async def rescrape_products():
+    """Re-scrape product sites so prompts use fresh product content."""
+    await asyncio.to_thread(scrape_product_data, True)
+
+async def prewarm_images(account=None):
+    """Top up one account's pools of pre-generated post images."""
+    account = account or get_account()
+    added = await refill_image_pool(account)
+    if added:
+        logger.info(f"Pre-generated {added} image(s) for {account.name}")
+
+async def renew_media_lease(store, key, lost):
+    """Renew a claimed work item's lease until cancelled, setting ``lost`` if another worker took it."""
+    while True:
+        await asyncio.sleep(MEDIA_LEASE_TTL / 3)
+        try:
+            renewed = await asyncio.to_thread(store.renew, MEDIA_QUEUE, key, WORKER_ID, MEDIA_LEASE_TTL)
+        except Exception as e:
+            logger.warning(f"Could not renew the lease on video work item {key}: {e}")
+            continue
+        if not renewed:
+            logger.warning(f"Lost the lease on video work item {key}")
+            lost.set()
+            return
+
+async def process_media_items():
+    """Claim and run queued video work items until the queue is empty."""
+    store = get_lease_store()
+    while True:
+        item = await asyncio.to_thread(store.claim, MEDIA_QUEUE, WORKER_ID, MEDIA_LEASE_TTL, MEDIA_MAX_ATTEMPTS)
+        if item is None:
+            return
+        payload = item["payload"]
+        lost = threading.Event()
+
+        def check_lease(event, **data):
+            # Runs in the media thread before the uploads start
+            if event == "video_ready" and lost.is_set():
+                raise RuntimeError(f"Lease on video work item {item['key']} was lost, leaving uploads to its owner")
+
+        heartbeat = asyncio.create_task(renew_media_lease(store, item["key"], lost))
+        try:
+            run = get_ledger().start(payload["post_key"]) if payload.get("post_key") else None
+            await asyncio.to_thread(
+                produce_video_assets,
+                payload["tweet_text"],
+                payload["image_path"],
+                get_account(payload["account"]),
+                run,
+                check_lease,
+            )
+            await asyncio.to_thread(store.complete, MEDIA_QUEUE, item["key"], WORKER_ID)
+            logger.info(f"Finished video work item {item['key']}")
+        except Exception as e:
+            logger.exception(f"Video work item {item['key']} failed")
+            retry = item["attempts"] < MEDIA_MAX_ATTEMPTS
+            await asyncio.to_thread(store.fail, MEDIA_QUEUE, item["key"], WORKER_ID, str(e), retry)
+        finally:
+            heartbeat.cancel()
+
+def scheduled_accounts():
+    """Get the accounts this worker posts for.
+
+    All accounts from ``accounts.json`` when it defines any, otherwise the
+    default account built from environment variables.
+    """
+    accounts = [a for name, a in load_accounts().items() if name != DEFAULT_ACCOUNT]
+    return accounts or [get_account()]
+
+def build_jobs():
+    """Build the scheduled jobs run by this worker, fanned out per account."""
+    jobs = []
+    for account in scheduled_accounts():
+        suffix = "" if account.name == DEFAULT_ACCOUNT else f":{account.name}"
+        jobs.append(Job(f"post{suffix}", partial(run_agent, account), interval=POST_INTERVAL,
+                        jitter=POST_JITTER, max_concurrency=account.max_concurrency))
+        jobs.append(Job(f"analytics{suffix}", partial(refresh_analytics, account), interval=ANALYTICS_INTERVAL))
+        if IMAGE_POOL_SIZE > 0:
+            jobs.append(Job(f"images{suffix}", partial(prewarm_images, account), interval=IMAGE_POOL_INTERVAL))
+    jobs.append(Job("rescrape", rescrape_products, cron=RESCRAPE_CRON))
+    if MEDIA_WORK_QUEUE and get_lease_store() is not None:
+        jobs.append(Job("media", process_media_items, interval=MEDIA_POLL_INTERVAL,
+                        max_concurrency=MEDIA_CONCURRENCY, leader_only=False, catch_up=False))
+    return jobs
+
+async def run_scheduler():
+    """Run all jobs on one event loop, sharing pooled clients."""
+    try:
+        await Scheduler(build_jobs(), store=get_lease_store()).run()
+    finally:
+        await close_http_session()
+        shutdown_process_pool()
 
 def main():
-    """Run agent every 1 hour 17 minutes autonomously."""
-    interval = (1 * 60 * 60) + (17 * 60)
-    
+    """Run the scheduled jobs autonomously."""
     print("🤖 AI Marketing Agent - Running Autonomously")
-    print(f"📅 Posts every {interval // 60} minutes")
+    print(f"📅 Posts every {POST_INTERVAL // 60} minutes (+ up to {POST_JITTER // 60} min jitter)")
     print("🔥 UGC-style content rotation enabled\n")
+    start_metrics_server()
     
-    while True:
-        asyncio.run(run_agent())
-        print(f"[{datetime.now()}] 😴 Sleeping for {interval // 60} minutes...\n")
-        time.sleep(interval)
+    try:
+        asyncio.run(run_scheduler())
+    except KeyboardInterrupt:
+        logger.info("Scheduler stopped")
 
 if __name__ == "__main__":
     main()
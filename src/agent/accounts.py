@@ -0,0 +1,117 @@
+"""Per-brand account settings.
+
+The ``default`` account is built from the environment variables the agent
+has always used; more accounts are read from ``accounts.json`` when it
+exists. The account to act for is chosen per invocation through the graph
+``Context`` (or ``State.account``) instead of module globals.
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, fields
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+ACCOUNTS_FILE = Path(os.getenv("ACCOUNTS_FILE", "accounts.json"))
+DEFAULT_ACCOUNT = "default"
+
+# Connection IDs and users, never inherited from the environment by file accounts
+CREDENTIAL_FIELDS = (
+    "twitter_connection_id", "twitter_account_id", "google_connection_id",
+    "googledrive_connection_id", "youtube_account_id", "uploadpost_user",
+)
+# Fields every file account needs: it posts through its own Twitter connection
+REQUIRED_FIELDS = ("name", "twitter_connection_id", "twitter_account_id")
+
+
+@dataclass(frozen=True)
+class Account:
+    """Connection IDs and settings for one brand."""
+
+    name: str = DEFAULT_ACCOUNT
+    twitter_connection_id: str = None  # Composio REST execute API
+    twitter_account_id: str = None  # Composio SDK (media upload, posting)
+    google_connection_id: str = None
+    googledrive_connection_id: str = None
+    youtube_account_id: str = None
+    uploadpost_user: str = None
+    marketing_config: str = None  # Path to this brand's marketing config
+    max_concurrency: int = 1  # Max simultaneous posts for this account
+
+
+def default_account() -> Account:
+    """Build the default account from environment variables."""
+    twitter_connection_id = os.getenv("TWITTER_CONNECTION_ID")
+    return Account(
+        twitter_connection_id=twitter_connection_id,
+        twitter_account_id=os.getenv("TWITTER_ACCOUNT_ID"),
+        google_connection_id=os.getenv("GOOGLE_CONNECTION_ID", twitter_connection_id),
+        googledrive_connection_id=os.getenv("GOOGLEDRIVE_CONNECTION_ID"),
+        youtube_account_id=os.getenv("YOUTUBE_ACCOUNT_ID"),
+        uploadpost_user=os.getenv("UPLOADPOST_USER"),
+    )
+
+
+_cache = {"mtime_ns": None, "accounts": None}
+_lock = threading.Lock()
+
+
+def load_accounts() -> dict:
+    """Load all accounts, keyed by name.
+
+    ``accounts.json`` holds ``{"accounts": [{"name": ..., ...}, ...]}`` with
+    ``Account`` field names. Each entry needs ``REQUIRED_FIELDS``; entries
+    without them are skipped with a warning. Credentials are never taken from
+    the environment, so an account without e.g. ``uploadpost_user`` skips
+    those uploads instead of using the default account's; other fields left
+    out take their ``Account`` defaults. The file is re-read when it changes.
+    """
+    try:
+        mtime_ns = os.stat(ACCOUNTS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+
+    with _lock:
+        if _cache["accounts"] is not None and _cache["mtime_ns"] == mtime_ns:
+            return _cache["accounts"]
+
+        base = default_account()
+        accounts = {base.name: base}
+        if mtime_ns is not None:
+            with open(ACCOUNTS_FILE) as f:
+                entries = json.load(f).get("accounts", [])
+            known = {f.name for f in fields(Account)}
+            loaded = 0
+            for entry in entries:
+                missing = [k for k in REQUIRED_FIELDS if not entry.get(k)]
+                if missing:
+                    logger.warning(f"Skipping account {entry.get('name')!r} in {ACCOUNTS_FILE}: missing {missing}")
+                    continue
+                unknown = set(entry) - known
+                if unknown:
+                    logger.warning(f"Ignoring unknown account fields {sorted(unknown)}")
+                values = {k: v for k, v in entry.items() if k in known}
+                values.setdefault("google_connection_id", values["twitter_connection_id"])
+                account = Account(**values)
+                accounts[account.name] = account
+                loaded += 1
+            logger.info(f"Loaded {loaded} account(s) from {ACCOUNTS_FILE}")
+
+        _cache.update(mtime_ns=mtime_ns, accounts=accounts)
+        return accounts
+
+
+def get_account(name: str = None) -> Account:
+    """Get an account by name, or the default account.
+
+    Raises:
+        ValueError: If no account with that name is configured.
+    """
+    accounts = load_accounts()
+    account = accounts.get(name or DEFAULT_ACCOUNT)
+    if account is None:
+        raise ValueError(f"Unknown account: {name}")
+    return account
@@ -0,0 +1,83 @@
+"""Coalescing of single-key lookups into batch calls.
+
+A ``BatchLoader`` collects the keys requested by concurrent callers on one
+event loop for up to ``window`` seconds, or until ``max_batch_size`` keys
+are pending, then resolves them all with one call to its batch function
+and hands each caller its own result. Callers asking for the same key in
+one window share a single slot in the batch.
+"""
+
+import asyncio
+import logging
+
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = Histogram(
+    "agent_batch_size", "Keys resolved per batch call.", ("loader",), buckets=(1, 2, 5, 10, 25, 50, 100)
+)
+
+
+class BatchLoader:
+    """DataLoader-style batcher bound to the event loop it is used on.
+
+    Args:
+        batch_fn: ``async batch_fn(keys) -> dict`` mapping each key to its
+            result. Keys it leaves out resolve to None; if it raises, every
+            caller in the batch gets the exception.
+        name: Name of the loader in metrics and logs.
+        max_batch_size: Max keys per batch call.
+        window: Seconds to wait for more keys after the first one.
+    """
+
+    def __init__(self, batch_fn, name: str, max_batch_size: int = 100, window: float = 0.005):
+        """Create a loader with no pending keys."""
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self._pending = {}  # key -> future
+        self._timer = None
+        self._tasks = set()
+
+    async def load(self, key):
+        """Get the result for ``key``, batched with other concurrent loads."""
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._dispatch)
+        # Shielded: a cancelled caller must not cancel the result others wait for
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: list) -> list:
+        """Get the results for several keys, in order."""
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict) -> None:
+        BATCH_SIZE.observe(len(batch), loader=self.name)
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as e:
+            logger.warning(f"{self.name} batch of {len(batch)} failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
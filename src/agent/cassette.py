@@ -0,0 +1,384 @@
+"""Record and replay of provider traffic.
+
+With ``CASSETTE_MODE=record``, every call to a provider (Composio over HTTP
+and through the SDK, Gemini, Veo, Hugging Face, Firecrawl and UploadPost)
+is recorded with its latency into a gzipped JSON-lines cassette at
+``CASSETTE_PATH``. With ``CASSETTE_MODE=replay``, those calls are served
+from the cassette instead of the network, sleeping each call's recorded
+latency (``CASSETTE_LATENCY=original``), none of it (``fast``), or a
+multiple of it (e.g. ``0.5``). A production trace thus becomes a
+repeatable offline benchmark.
+
+Call sites opt in by wrapping the provider function:
+``recorded("firecrawl", "scrape", app.scrape)(url)``. Replay serves the
+response recorded for the same request, or else the next unused response
+of the same provider operation (requests often differ between runs by
+random ids and timestamps). Errors are recorded and raised again, and
+files a call writes (generated videos) are stored once by hash and
+restored on replay.
+"""
+
+import asyncio
+import atexit
+import base64
+import builtins
+import functools
+import gzip
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+from langchain_core._api import suppress_langchain_beta_warning
+from langchain_core.load import dumpd, load
+from langchain_core.load.serializable import Serializable
+
+from .metrics import Counter
+from .rate_limit import RetryableError, error_status
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "")  # record, replay, or empty for off
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/agent.jsonl.gz")
+CASSETTE_LATENCY = os.getenv("CASSETTE_LATENCY", "original")  # original, fast, or a multiplier
+CASSETTE_VERSION = 1
+
+CASSETTE_CALLS = Counter(
+    "agent_cassette_calls_total", "Provider calls recorded or replayed, by how replays were matched.",
+    ("provider", "mode", "match"),
+)
+
+
+class CassetteMiss(Exception):
+    """Raised on replay for a call the cassette has no response for."""
+
+
+class ReplayedError(Exception):
+    """A recorded provider error that cannot be rebuilt as its own type."""
+
+    def __init__(self, type_name: str, message: str, status: int = None):
+        """Create an error carrying the original exception's type name and status."""
+        super().__init__(message)
+        self.type_name = type_name
+        self.status = status
+
+
+def latency_scale(latency) -> float:
+    """Get the multiplier of recorded latencies for a ``CASSETTE_LATENCY`` value."""
+    if latency in (None, "", "original"):
+        return 1.0
+    if latency == "fast":
+        return 0.0
+    return max(0.0, float(latency))
+
+
+def _type_path(value) -> str:
+    cls = type(value)
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _import_type(path: str):
+    module, _, name = path.partition(":")
+    obj = importlib.import_module(module)
+    for part in name.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+class Cassette:
+    """Recorded provider calls, in a file being written or replayed.
+
+    Args:
+        path: Cassette file.
+        mode: ``record`` (the file is overwritten) or ``replay``.
+        latency: Replay latency (see ``CASSETTE_LATENCY``).
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH, mode: str = "replay", latency=None):
+        """Open the cassette, loading it for replay or starting a new recording."""
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}; use 'record' or 'replay'")
+        self.path = Path(path)
+        self.mode = mode
+        self.scale = latency_scale(CASSETTE_LATENCY if latency is None else latency)
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._blobs = {}  # sha256 -> bytes (replay), or None once written (record)
+        self._by_key = defaultdict(list)  # request key -> entries, in recorded order
+        self._by_operation = defaultdict(list)  # (provider, operation) -> entries, in recorded order
+        self._file = None
+        if mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = gzip.open(self.path, "wt", encoding="utf-8")
+            self._write({"version": CASSETTE_VERSION, "recorded_at": time.time()})
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    entry = json.loads(line)
+                    if "blob" in entry:
+                        self._blobs[entry["blob"]] = base64.b64decode(entry["data"])
+                    elif "key" in entry:
+                        entry["used"] = False
+                        self._by_key[entry["key"]].append(entry)
+                        self._by_operation[(entry["provider"], entry["operation"])].append(entry)
+            except (EOFError, json.JSONDecodeError):
+                # Recording was cut short; every flushed call is still usable
+                logger.warning(f"Cassette {self.path} is truncated")
+        logger.info(f"Replaying {sum(len(e) for e in self._by_operation.values())} call(s) from {self.path}")
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        """Finish writing the cassette."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # Values are stored as JSON; bytes, LangChain messages, pydantic models and
+    # namespaces are tagged so they come back as the same types on replay.
+
+    def _blob(self, data: bytes, store: bool = True) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if store and self.mode == "record" and digest not in self._blobs:
+            self._blobs[digest] = None
+            self._write({"blob": digest, "data": base64.b64encode(data).decode()})
+        return digest
+
+    def encode(self, value, store: bool = True):
+        """Convert a request or response to JSON-compatible data.
+
+        Args:
+            value: Value to convert.
+            store: Whether to write bytes in it to the cassette (responses),
+                or only hash them (request keys).
+        """
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return {"__blob__": self._blob(bytes(value), store)}
+        if isinstance(value, (list, tuple)):
+            return [self.encode(v, store) for v in value]
+        if isinstance(value, dict):
+            return {str(k): self.encode(v, store) for k, v in value.items()}
+        if isinstance(value, Path):
+            return str(value)
+        if isinstance(value, SimpleNamespace):
+            return {"__namespace__": self.encode(vars(value), store)}
+        if isinstance(value, Serializable):
+            return {"__lc__": dumpd(value)}
+        if hasattr(value, "model_dump"):
+            return {"__model__": _type_path(value), "data": self.encode(value.model_dump(mode="json"), store)}
+        return {"__repr__": repr(value)}
+
+    def decode(self, value):
+        """Rebuild a value stored by ``encode``."""
+        if isinstance(value, list):
+            return [self.decode(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        if "__blob__" in value:
+            return self._blobs[value["__blob__"]]
+        if "__namespace__" in value:
+            return SimpleNamespace(**self.decode(value["__namespace__"]))
+        if "__lc__" in value:
+            with suppress_langchain_beta_warning():
+                return load(value["__lc__"], allowed_objects="messages")
+        if "__model__" in value:
+            return _import_type(value["__model__"]).model_validate(self.decode(value["data"]))
+        if "__repr__" in value:
+            return value["__repr__"]
+        return {k: self.decode(v) for k, v in value.items()}
+
+    def request_key(self, provider: str, operation: str, request) -> str:
+        """Hash a request into the key its response is stored under."""
+        data = json.dumps([provider, operation, self.encode(request, store=False)], sort_keys=True, default=repr)
+        return hashlib.sha256(data.encode()).hexdigest()[:24]
+
+    def _encode_error(self, error: Exception) -> dict:
+        return {
+            "type": _type_path(error),
+            "message": str(error),
+            "status": error_status(error),
+            "retry_after": getattr(error, "retry_after", None),
+        }
+
+    @staticmethod
+    def _decode_error(error: dict) -> Exception:
+        module, _, name = error["type"].partition(":")
+        if name == RetryableError.__qualname__:  # Retried by the rate governor, so keep its status
+            rebuilt = RetryableError(error["status"], retry_after=error["retry_after"])
+            rebuilt.args = (error["message"],)
+            return rebuilt
+        builtin = getattr(builtins, name, None) if module == "builtins" else None
+        if isinstance(builtin, type) and issubclass(builtin, Exception):
+            return builtin(error["message"])
+        return ReplayedError(error["type"], error["message"], error["status"])
+
+    def record(self, provider: str, operation: str, request, started: float, seconds: float,
+               response=None, error: Exception = None, files: bool = False) -> None:
+        """Store a completed call."""
+        entry = {
+            "provider": provider,
+            "operation": operation,
+            "key": self.request_key(provider, operation, request),
+            "start": round(started - self._started, 6),
+            "seconds": round(seconds, 6),
+        }
+        with self._lock:
+            if self._file is None:
+                return
+            if error is not None:
+                entry["error"] = self._encode_error(error)
+            else:
+                entry["response"] = self.encode(response)
+                if files and isinstance(response, str) and os.path.isfile(response):
+                    entry["files"] = {response: self._blob(Path(response).read_bytes())}
+            self._write(entry)
+            self._file.flush()
+        CASSETTE_CALLS.inc(provider=provider, mode="record", match="recorded")
+
+    def take(self, provider: str, operation: str, request) -> dict:
+        """Get the recorded call answering a request, marking it used.
+
+        Raises:
+            CassetteMiss: If no unused call of the operation is left.
+        """
+        key = self.request_key(provider, operation, request)
+        with self._lock:
+            match = "exact"
+            entry = next((e for e in self._by_key.get(key, ()) if not e["used"]), None)
+            if entry is None:
+                match = "sequence"
+                entry = next((e for e in self._by_operation.get((provider, operation), ()) if not e["used"]), None)
+            if entry is None:
+                CASSETTE_CALLS.inc(provider=provider, mode="replay", match="miss")
+                raise CassetteMiss(f"No recorded {provider} {operation} call left in {self.path}")
+            entry["used"] = True
+        CASSETTE_CALLS.inc(provider=provider, mode="replay", match=match)
+        return entry
+
+    def respond(self, entry: dict):
+        """Restore a recorded call's files and return (or raise) its outcome."""
+        for path, digest in (entry.get("files") or {}).items():
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_bytes(self._blobs[digest])
+        if "error" in entry:
+            raise self._decode_error(entry["error"])
+        return self.decode(entry["response"])
+
+    def pending(self) -> int:
+        """Count the recorded calls not replayed yet."""
+        with self._lock:
+            return sum(not e["used"] for entries in self._by_operation.values() for e in entries)
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+_override = None  # Cassette set by use_cassette, if any
+
+
+def get_cassette():
+    """Get the active cassette, or None when recording and replay are off."""
+    global _cassette
+    if _override is not None:
+        return _override
+    if not CASSETTE_MODE:
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE)
+            atexit.register(_cassette.close)
+        return _cassette
+
+
+@contextmanager
+def use_cassette(path: str, mode: str, latency=None):
+    """Record or replay provider calls made inside the block.
+
+    Yields:
+        The ``Cassette``.
+    """
+    global _override
+    cassette = Cassette(path, mode, latency)
+    previous, _override = _override, cassette
+    try:
+        yield cassette
+    finally:
+        _override = previous
+        cassette.close()
+
+
+def recorded(provider: str, operation: str, func, request=None, files: bool = False):
+    """Route a provider call through the active cassette, if any.
+
+    Args:
+        provider: Provider name, e.g. ``gemini``.
+        operation: Operation name, e.g. a tool slug or ``chat``.
+        func: Function making the call; sync or async.
+        request: What identifies the request. Defaults to the call's
+            arguments; pass it for functions that take none.
+        files: Whether ``func`` returns the path of a file it wrote, to
+            store and restore with the call.
+
+    Returns:
+        ``func`` itself when no cassette is active, or a wrapper with the
+        same signature.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return func
+
+    def request_of(args, kwargs):
+        return request if request is not None else {"args": list(args), "kwargs": kwargs}
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if cassette.mode == "replay":
+                entry = cassette.take(provider, operation, request_of(args, kwargs))
+                if cassette.scale:
+                    await asyncio.sleep(entry["seconds"] * cassette.scale)
+                return cassette.respond(entry)
+            started = time.perf_counter()
+            try:
+                response = await func(*args, **kwargs)
+            except Exception as e:
+                cassette.record(provider, operation, request_of(args, kwargs), started,
+                                time.perf_counter() - started, error=e)
+                raise
+            cassette.record(provider, operation, request_of(args, kwargs), started,
+                            time.perf_counter() - started, response, files=files)
+            return response
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if cassette.mode == "replay":
+                entry = cassette.take(provider, operation, request_of(args, kwargs))
+                if cassette.scale:
+                    time.sleep(entry["seconds"] * cassette.scale)
+                return cassette.respond(entry)
+            started = time.perf_counter()
+            try:
+                response = func(*args, **kwargs)
+            except Exception as e:
+                cassette.record(provider, operation, request_of(args, kwargs), started,
+                                time.perf_counter() - started, error=e)
+                raise
+            cassette.record(provider, operation, request_of(args, kwargs), started,
+                            time.perf_counter() - started, response, files=files)
+            return response
+    return wrapper
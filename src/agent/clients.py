@@ -0,0 +1,107 @@
+"""Shared, pooled clients for outbound calls.
+
+Graph runs and scheduler jobs in the same process reuse one aiohttp session
+per event loop and one Composio client per entity instead of building a new
+one for every call. Composio tool executions go through the rate governor
+and the ``composio`` circuit breaker.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from functools import partial
+
+import aiohttp
+from composio import Composio
+
+from . import resilience
+from .cassette import recorded
+from .metrics import Histogram
+from .rate_limit import RateLimitExceeded, RetryableError, get_governor, result_status
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+
+COMPOSIO_TOOL_SECONDS = Histogram(
+    "composio_tool_seconds", "Composio tool latency, including rate-limit waits and retries.", ("tool", "outcome")
+)
+
+_http_sessions = {}  # event loop -> aiohttp.ClientSession
+_composio_clients = {}  # entity id -> Composio
+_lock = threading.Lock()
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Get the pooled aiohttp session for the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        for other in [other for other in _http_sessions if other.is_closed()]:
+            del _http_sessions[other]
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE),
+            timeout=aiohttp.ClientTimeout(total=resilience.get_timeout("composio"), connect=10),
+        )
+        _http_sessions[loop] = session
+    return session
+
+
+async def close_http_session() -> None:
+    """Close the pooled aiohttp session of the running event loop, if any."""
+    session = _http_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def get_composio_client(entity_id: str = None) -> Composio:
+    """Get the shared Composio client for an entity, creating it on first use."""
+    with _lock:
+        client = _composio_clients.get(entity_id)
+        if client is None:
+            client = Composio(
+                api_key=os.getenv("COMPOSIO_API_KEY"),
+                entity_id=entity_id,
+                timeout=int(resilience.get_timeout("composio")),
+            )
+            _composio_clients[entity_id] = client
+        return client
+
+
+def execute_tool(client: Composio, slug: str, arguments: dict, connected_account_id: str,
+                 idempotent: bool = True) -> dict:
+    """Execute a Composio tool within its rate limit, retrying 429/5xx results.
+
+    Args:
+        client: Composio client to execute with.
+        slug: Tool slug, e.g. ``TWITTER_CREATION_OF_A_POST``.
+        arguments: Tool arguments.
+        connected_account_id: Connected account; limits are tracked per account.
+        idempotent: Whether a 5xx result may be retried (see ``RateGovernor.call``).
+
+    Returns:
+        The Composio result dict; a failed result when retries run out, the
+        rate limit cannot be met or the ``composio`` circuit is open.
+    """
+    def _execute():
+        result = recorded("composio", slug, client.tools.execute)(
+            slug, arguments, connected_account_id=connected_account_id
+        )
+        status = result_status(result)
+        if status is not None:
+            raise RetryableError(status, str(result.get("error")))
+        return result
+
+    started = time.perf_counter()
+    try:
+        result = get_governor().call_sync(
+            slug, partial(resilience.call, idempotent=idempotent), "composio", _execute,
+            scope=connected_account_id, idempotent=idempotent
+        )
+    except (RetryableError, RateLimitExceeded, resilience.CircuitOpenError) as e:
+        result = {"successful": False, "data": {}, "error": str(e)}
+    outcome = "ok" if result.get("successful") else "error"
+    COMPOSIO_TOOL_SECONDS.observe(time.perf_counter() - started, tool=slug, outcome=outcome)
+    return result
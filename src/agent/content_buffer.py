@@ -0,0 +1,228 @@
+"""Pre-generated tweet buffer for scheduled posts.
+
+Gemini writes ``CONTENT_BATCH_SIZE`` candidate tweets per account in one
+structured-output call, using the account's marketing prompt and product
+context (``graph.get_prompt``). Valid candidates are stored in SQLite; the
+posting job pops one per post, and a background refill starts when an
+account's buffer drops below ``CONTENT_LOW_WATER``.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import BaseModel, Field
+
+from . import resilience
+from .accounts import Account
+from .cassette import recorded
+from .dedup import DuplicateIndex, get_duplicate_index
+from .graph import get_prompt, post_rotation
+from .metrics import timed
+from .rate_limit import GovernedRateLimiter
+from .usage import usage_callbacks
+
+logger = logging.getLogger(__name__)
+
+CONTENT_BUFFER_DB = os.getenv("CONTENT_BUFFER_DB", "content_buffer.db")
+CONTENT_MODEL = os.getenv("CONTENT_MODEL", "gemini-2.0-flash-exp")
+CONTENT_BATCH_SIZE = int(os.getenv("CONTENT_BATCH_SIZE", "10"))
+CONTENT_LOW_WATER = int(os.getenv("CONTENT_LOW_WATER", "3"))
+MAX_TWEET_LENGTH = 240  # Leaves room for the unique id and emoji added at post time
+
+
+class TweetBatch(BaseModel):
+    """Structured output of one generation call."""
+
+    tweets: list[str] = Field(description="Ready-to-post tweets, each with one link and 1-2 hashtags.")
+
+
+def validate_tweet(text: str, url: str = None, hashtag: str = None) -> str:
+    """Check a candidate tweet, adding ``url`` or ``hashtag`` if it lacks a link or hashtag.
+
+    Returns:
+        The cleaned tweet, or None if it is empty or too long.
+    """
+    text = " ".join(str(text).strip().strip('"').split())
+    if not text:
+        return None
+    if "http" not in text and url:
+        text += f" {url}"
+    if "#" not in text and hashtag:
+        text += f" {hashtag}"
+    return text if len(text) <= MAX_TWEET_LENGTH else None
+
+
+class ContentBuffer:
+    """SQLite-backed FIFO of generated tweets per account."""
+
+    def __init__(self, path: str = CONTENT_BUFFER_DB):
+        """Open the buffer database at ``path``, creating its table if needed."""
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tweets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, account TEXT NOT NULL,
+                    text TEXT NOT NULL, created REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS tweets_account ON tweets (account, id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def push(self, account: str, tweets: list) -> None:
+        """Append tweets to an account's buffer."""
+        now = time.time()
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO tweets (account, text, created) VALUES (?, ?, ?)", [(account, t, now) for t in tweets]
+            )
+
+    def pop(self, account: str) -> str:
+        """Remove and return an account's oldest tweet, or None if empty."""
+        with self._conn() as conn:
+            row = conn.execute(
+                "DELETE FROM tweets WHERE id = (SELECT MIN(id) FROM tweets WHERE account = ?) RETURNING text",
+                (account,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def size(self, account: str) -> int:
+        """Count an account's buffered tweets."""
+        return self._conn().execute("SELECT COUNT(*) FROM tweets WHERE account = ?", (account,)).fetchone()[0]
+
+    def texts(self, account: str) -> list:
+        """List an account's buffered tweets, oldest first."""
+        rows = self._conn().execute("SELECT text FROM tweets WHERE account = ? ORDER BY id", (account,)).fetchall()
+        return [r[0] for r in rows]
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_content_buffer() -> ContentBuffer:
+    """Get the process-wide content buffer."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ContentBuffer(CONTENT_BUFFER_DB)
+        return _buffer
+
+
+_model = None
+
+
+def _get_model():
+    global _model
+    if _model is None:
+        _model = ChatGoogleGenerativeAI(
+            model=CONTENT_MODEL,
+            callbacks=usage_callbacks("content"),
+            rate_limiter=GovernedRateLimiter(CONTENT_MODEL),
+            timeout=resilience.get_timeout("gemini"),
+        ).with_structured_output(TweetBatch)
+    return _model
+
+
+@timed("content_generation")
+async def generate_tweets(account: Account, count: int = CONTENT_BATCH_SIZE, model=None) -> list:
+    """Ask Gemini for ``count`` tweets in one call and keep the valid, unique ones.
+
+    Candidates too long, repeating each other, or nearly duplicating a past
+    post or an already buffered tweet are dropped.
+
+    Args:
+        account: Account to write for (marketing config and link rotation).
+        count: Number of candidates to request.
+        model: Structured-output runnable returning ``TweetBatch``.
+    """
+    prompt = await asyncio.to_thread(get_prompt, None, account.marketing_config)
+    messages = prompt.format_messages(
+        input=(
+            f"Write {count} different tweets for this account, ready to post. Rotate the post types and "
+            f"products. Each under {MAX_TWEET_LENGTH} characters with one link and 1-2 hashtags."
+        ),
+        agent_scratchpad=[],
+    )
+    batch = await resilience.call_async("gemini", recorded("gemini", "tweet_batch", (model or _get_model()).ainvoke),
+                                        messages)
+
+    urls, hashtags = post_rotation(account)
+    history = await asyncio.to_thread(get_duplicate_index, account.name)
+    pending = DuplicateIndex()  # Already buffered, plus this batch
+    for text in await asyncio.to_thread(get_content_buffer().texts, account.name):
+        pending.add(text)
+    tweets = []
+    for i, candidate in enumerate(batch.tweets):
+        text = validate_tweet(candidate, urls[i % len(urls)], hashtags[i % len(hashtags)])
+        if text is None:
+            logger.info(f"Dropping invalid tweet candidate: {candidate!r}")
+            continue
+        if history.find(text) is not None or pending.find(text) is not None:
+            logger.info(f"Dropping duplicate tweet candidate: {candidate!r}")
+            continue
+        pending.add(text)
+        tweets.append(text)
+    logger.info(f"Generated {len(tweets)}/{count} usable tweet(s) for {account.name}")
+    return tweets
+
+
+async def refill(account: Account, count: int = CONTENT_BATCH_SIZE) -> int:
+    """Generate a batch of tweets into an account's buffer.
+
+    Returns:
+        Number of tweets added.
+    """
+    tweets = await generate_tweets(account, count)
+    await asyncio.to_thread(get_content_buffer().push, account.name, tweets)
+    return len(tweets)
+
+
+_refills = {}  # account name -> running refill task
+
+
+def _start_refill(account: Account) -> asyncio.Task:
+    task = _refills.get(account.name)
+    if task is None or task.done():
+        task = _refills[account.name] = asyncio.create_task(refill(account))
+        task.add_done_callback(_log_refill_error)
+    return task
+
+
+def _log_refill_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Content refill failed: {task.exception()}")
+
+
+async def next_tweet(account: Account) -> str:
+    """Pop the next buffered tweet, refilling the buffer as needed.
+
+    An empty buffer is refilled before popping; one that drops below
+    ``CONTENT_LOW_WATER`` is refilled in the background.
+
+    Returns:
+        Tweet text, or None if the buffer is empty and refilling failed.
+    """
+    buffer = get_content_buffer()
+    text = await asyncio.to_thread(buffer.pop, account.name)
+    if text is None:
+        try:
+            await _start_refill(account)
+        except Exception:
+            return None  # Logged by _log_refill_error
+        text = await asyncio.to_thread(buffer.pop, account.name)
+    if text is not None and await asyncio.to_thread(buffer.size, account.name) < CONTENT_LOW_WATER:
+        _start_refill(account)
+    return text
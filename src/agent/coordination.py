@@ -0,0 +1,265 @@
+"""Lease-based coordination between scaled-out workers.
+
+Workers that share a ``LeaseStore`` elect one leader to run scheduled jobs,
+so adding replicas never double-posts. They also split queued media work by
+leasing individual work items; an item whose lease expires (the worker
+died) becomes claimable again.
+
+The default store is SQLite, enabled by pointing ``COORDINATION_DB`` at a
+database file on storage every worker can reach. Other backends implement
+the ``LeaseStore`` interface.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+COORDINATION_DB = os.getenv("COORDINATION_DB")
+WORKER_ID = os.getenv("WORKER_ID") or f"{os.getenv('DYNO') or socket.gethostname()}:{os.getpid()}"
+MEDIA_QUEUE = "media"
+
+
+class LeaseStore(ABC):
+    """Interface for leases, leased work items and shared key/value state."""
+
+    @abstractmethod
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lease ``name`` for ``ttl`` seconds.
+
+        Returns:
+            True if ``owner`` holds the lease afterwards.
+        """
+
+    @abstractmethod
+    def release(self, name: str, owner: str) -> None:
+        """Give up a lease held by ``owner``."""
+
+    @abstractmethod
+    def enqueue(self, queue: str, key: str, payload: dict) -> bool:
+        """Add a work item; enqueueing an existing key is a no-op.
+
+        Returns:
+            True if the item was added.
+        """
+
+    @abstractmethod
+    def claim(self, queue: str, owner: str, ttl: float, max_attempts: int = 3) -> dict:
+        """Lease the oldest pending (or abandoned) work item.
+
+        An abandoned item whose lease expired on its last attempt is marked
+        failed instead.
+
+        Returns:
+            ``{"key", "payload", "attempts"}`` or None when nothing is claimable.
+        """
+
+    @abstractmethod
+    def renew(self, queue: str, key: str, owner: str, ttl: float) -> bool:
+        """Extend the lease on a work item ``owner`` is still running.
+
+        Returns:
+            False if the item is no longer leased to ``owner`` (its lease
+            expired and another worker claimed it).
+        """
+
+    @abstractmethod
+    def complete(self, queue: str, key: str, owner: str) -> None:
+        """Mark a leased work item done."""
+
+    @abstractmethod
+    def fail(self, queue: str, key: str, owner: str, error: str, retry: bool = True) -> None:
+        """Release a leased work item for retry, or mark it failed."""
+
+    @abstractmethod
+    def get_value(self, key: str, default=None):
+        """Read a JSON value from shared state."""
+
+    @abstractmethod
+    def set_value(self, key: str, value) -> None:
+        """Write a JSON value to shared state."""
+
+    @abstractmethod
+    def merge_max(self, key: str, values: dict) -> dict:
+        """Atomically merge ``values`` into a JSON object of numbers, keeping the max per key.
+
+        Returns:
+            The merged object.
+        """
+
+
+class SQLiteLeaseStore(LeaseStore):
+    """``LeaseStore`` backed by a SQLite database file."""
+
+    def __init__(self, path: str):
+        """Open (creating if needed) the store's tables in the database at ``path``."""
+        self.path = path
+        conn = sqlite3.connect(self.path, timeout=30)
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS work_items (
+                    queue TEXT NOT NULL, key TEXT NOT NULL, payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending', owner TEXT, lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0, error TEXT,
+                    created REAL NOT NULL, updated REAL NOT NULL,
+                    PRIMARY KEY (queue, key)
+                );
+                CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """)
+        conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew a lease; see ``LeaseStore.acquire``."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires",
+                (name, owner, now + ttl),
+            )
+            return True
+
+    def release(self, name: str, owner: str) -> None:
+        """Give up a lease held by ``owner``."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def enqueue(self, queue: str, key: str, payload: dict) -> bool:
+        """Add a work item; see ``LeaseStore.enqueue``."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO work_items (queue, key, payload, created, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (queue, key, json.dumps(payload), now, now),
+            )
+            return cursor.rowcount == 1
+
+    def claim(self, queue: str, owner: str, ttl: float, max_attempts: int = 3) -> dict:
+        """Lease the oldest claimable work item; see ``LeaseStore.claim``."""
+        now = time.time()
+        with self._transaction() as conn:
+            # The worker holding the last attempt died: nothing would ever retry it
+            dead = conn.execute(
+                "UPDATE work_items SET status = 'failed', lease_expires = NULL, "
+                "error = 'Lease expired on the last attempt', updated = ? "
+                "WHERE queue = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, queue, now, max_attempts),
+            ).rowcount
+            if dead:
+                logger.warning(f"Failed {dead} {queue} work item(s) abandoned on their last attempt")
+            row = conn.execute(
+                "SELECT key, payload, attempts FROM work_items WHERE queue = ? AND attempts < ? "
+                "AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY created LIMIT 1",
+                (queue, max_attempts, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE work_items SET status = 'leased', owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE queue = ? AND key = ?",
+                (owner, now + ttl, now, queue, row[0]),
+            )
+            return {"key": row[0], "payload": json.loads(row[1]), "attempts": row[2] + 1}
+
+    def renew(self, queue: str, key: str, owner: str, ttl: float) -> bool:
+        """Extend a work item's lease; see ``LeaseStore.renew``."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET lease_expires = ?, updated = ? "
+                "WHERE queue = ? AND key = ? AND owner = ? AND status = 'leased'",
+                (now + ttl, now, queue, key, owner),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, queue: str, key: str, owner: str) -> None:
+        """Mark a leased work item done."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE work_items SET status = 'done', lease_expires = NULL, updated = ? "
+                "WHERE queue = ? AND key = ? AND owner = ?",
+                (time.time(), queue, key, owner),
+            )
+
+    def fail(self, queue: str, key: str, owner: str, error: str, retry: bool = True) -> None:
+        """Release a leased work item for retry, or mark it failed."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE work_items SET status = ?, lease_expires = NULL, error = ?, updated = ? "
+                "WHERE queue = ? AND key = ? AND owner = ?",
+                ("pending" if retry else "failed", error, time.time(), queue, key, owner),
+            )
+
+    def get_value(self, key: str, default=None):
+        """Read a JSON value from shared state."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_value(self, key: str, value) -> None:
+        """Write a JSON value to shared state."""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO kv (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value)),
+            )
+
+    def merge_max(self, key: str, values: dict) -> dict:
+        """Merge numbers into a shared object; see ``LeaseStore.merge_max``."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            merged = json.loads(row[0]) if row else {}
+            for k, v in values.items():
+                merged[k] = max(v, merged.get(k, v))
+            conn.execute(
+                "INSERT INTO kv (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(merged)),
+            )
+        return merged
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_lease_store() -> LeaseStore:
+    """Get the configured lease store, or None when running single-instance."""
+    global _store
+    if not COORDINATION_DB:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteLeaseStore(COORDINATION_DB)
+            logger.info(f"Coordinating through {COORDINATION_DB} as worker {WORKER_ID}")
+        return _store
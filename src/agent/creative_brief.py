@@ -0,0 +1,172 @@
+"""One-call creative brief for a post's media.
+
+Instead of separate LLM round trips for the image prompt, the video prompt
+and the YouTube title (each re-sending the tweet), Gemini writes all of
+them, plus optional TikTok and Instagram captions, in one structured-output
+call validated against ``CreativeBrief``. Each field is checked on its own:
+a missing or unusable field falls back to the stage's own default without
+discarding the rest of the brief. The brief is recorded in the post ledger,
+so the image and video stages (possibly on different workers) share it.
+"""
+
+import logging
+import os
+
+from langchain_core.messages import HumanMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import BaseModel, Field
+
+from . import resilience
+from .cassette import recorded
+from .distribution import CAPTION_LENGTH
+from .image_subagent import clean_image_prompt, fallback_image_prompt
+from .metrics import timed
+from .rate_limit import GovernedRateLimiter
+from .usage import usage_callbacks
+from .video_agent import FALLBACK_VIDEO_PROMPT
+from .youtube_metadata_agent import FALLBACK_TITLE
+
+logger = logging.getLogger(__name__)
+
+BRIEF_MODEL = os.getenv("BRIEF_MODEL", "gemini-2.5-flash-lite")
+MAX_TITLE_LENGTH = 100  # YouTube's limit
+
+
+class PlatformCaptions(BaseModel):
+    """Short-form captions, when the tweet doesn't fit a platform."""
+
+    tiktok: str | None = Field(default=None, description="TikTok caption, 1-2 hashtags, no links.")
+    instagram: str | None = Field(default=None, description="Instagram Reels caption, 1-2 hashtags, no links.")
+
+
+class CreativeBrief(BaseModel):
+    """Structured output of the brief call."""
+
+    image_prompt: str = Field(description=(
+        "Visual prompt for an AI image generator: modern tech imagery (AI interfaces, credit score "
+        "dashboards, automation workflows), no hashtags, mentions or markdown, at most 200 characters."
+    ))
+    video_prompt: str = Field(description=(
+        "8-second 9:16 vertical reel prompt: [Camera movement] of [subject] [action] in [setting]. "
+        "[Visual details]. [Lighting]. Audio: [sound effects, music, ambient noise]."
+    ))
+    youtube_title: str = Field(description="Catchy YouTube title, at most 60 characters, no URLs.")
+    captions: PlatformCaptions = Field(default_factory=PlatformCaptions)
+
+
+_model = None
+
+
+def _get_model():
+    global _model
+    if _model is None:
+        _model = ChatGoogleGenerativeAI(
+            model=BRIEF_MODEL,
+            temperature=0.7,
+            callbacks=usage_callbacks("creative_brief"),
+            rate_limiter=GovernedRateLimiter(BRIEF_MODEL),
+            timeout=resilience.get_timeout("gemini"),
+        ).with_structured_output(CreativeBrief)
+    return _model
+
+
+def _brief_prompt(tweet_text: str, product_name: str = None) -> str:
+    selling_focus = f"\n- Highlight the product '{product_name}' in the image and video." if product_name else ""
+    return f"""Plan the media for this social media post about AI tools, credit repair and automation.
+
+SOCIAL MEDIA POST:
+{tweet_text}
+
+Write:
+- image_prompt: the visual theme of the post as an image generation prompt. Modern, professional, tech-forward, clean, inspiring.
+- video_prompt: a dynamic 8-second vertical (9:16) reel with camera movement, specific motion and audio cues (upbeat tech music, success sounds).
+- youtube_title: a catchy title for the video.
+- captions: TikTok and Instagram captions under {CAPTION_LENGTH} characters, only if the post itself is longer.{selling_focus}"""
+
+
+def _caption(text: str | None) -> str | None:
+    text = " ".join((text or "").split())
+    return text if text and len(text) <= CAPTION_LENGTH and "http" not in text else None
+
+
+def finalize_brief(brief: CreativeBrief | None, tweet_text: str, product_name: str = None) -> dict:
+    """Check each field of a brief, replacing unusable ones with their fallback.
+
+    Args:
+        brief: Model output, or None if the call failed.
+        tweet_text: Tweet the brief is for.
+        product_name: Product the brief highlights, if any.
+
+    Returns:
+        Dict with ``image_prompt``, ``video_prompt``, ``youtube_title``,
+        ``captions`` (platform -> caption, only the usable ones) and
+        ``fallbacks`` (the fields that fell back).
+    """
+    fallbacks = []
+    image_prompt = clean_image_prompt(brief.image_prompt) if brief else ""
+    if not image_prompt:
+        image_prompt = fallback_image_prompt(tweet_text, product_name)
+        fallbacks.append("image_prompt")
+    video_prompt = " ".join(brief.video_prompt.split()) if brief else ""
+    if not video_prompt:
+        video_prompt = FALLBACK_VIDEO_PROMPT
+        fallbacks.append("video_prompt")
+    title = brief.youtube_title.strip().strip('"') if brief else ""
+    if not title or len(title) > MAX_TITLE_LENGTH or "http" in title:
+        title = FALLBACK_TITLE
+        fallbacks.append("youtube_title")
+    captions = {}
+    if brief:
+        for platform, caption in brief.captions.model_dump().items():
+            if _caption(caption):
+                captions[platform] = _caption(caption)
+    return {
+        "image_prompt": image_prompt,
+        "video_prompt": video_prompt,
+        "youtube_title": title,
+        "captions": captions,
+        "fallbacks": fallbacks,
+    }
+
+
+@timed("creative_brief")
+def generate_creative_brief(tweet_text: str, product_name: str = None, model=None) -> dict:
+    """Write a post's image prompt, video prompt, YouTube title and captions in one call.
+
+    Args:
+        tweet_text: Tweet to plan media for.
+        product_name: Optional product to highlight.
+        model: Structured-output runnable returning ``CreativeBrief``.
+
+    Returns:
+        ``finalize_brief`` result; every field falls back if the call fails.
+    """
+    messages = [HumanMessage(content=_brief_prompt(tweet_text, product_name))]
+    try:
+        # The cached model's own timeout can't see the run's deadline; the call's is capped at it
+        brief = resilience.call("gemini", recorded("gemini", "creative_brief", (model or _get_model()).invoke),
+                                messages, timeout=resilience.get_timeout("gemini"))
+    except Exception as e:
+        logger.warning(f"Creative brief failed, using fallbacks: {e}")
+        brief = None
+    result = finalize_brief(brief, tweet_text, product_name)
+    if result["fallbacks"]:
+        logger.info(f"Creative brief fell back for {result['fallbacks']}")
+    return result
+
+
+def get_post_brief(tweet_text: str, run=None, product_name: str = None) -> dict:
+    """Get a post's creative brief from its ledger run, generating it on first use.
+
+    Args:
+        tweet_text: Tweet of the post.
+        run: Ledger run of the post, if any; the brief is recorded as its
+            ``brief`` step.
+        product_name: Optional product to highlight.
+    """
+    brief = run.get("brief") if run else None
+    if brief is None:
+        brief = generate_creative_brief(tweet_text, product_name)
+        if run:
+            run.record("brief", brief)
+    return brief
@@ -0,0 +1,116 @@
+"""Per-run time budget and graceful degradation.
+
+A graph run with ``budget_seconds`` in its context (or ``RUN_BUDGET_SECONDS``)
+gets a deadline that every stage and sub-agent can read, including on worker
+threads that copy the run's context. Optional stages (video generation and
+each upload) ask ``allows(stage)`` first: when the time left can't cover the
+stage's observed p90 latency (from ``agent_stage_seconds``), they are skipped
+and reported in the run's ``degraded`` list instead of overrunning the budget.
+Outbound calls cap their timeouts at the time left with ``cap``.
+
+Skipped steps are not recorded in the post ledger and leave the post
+``partial``, so resuming it with its idempotency key finishes them.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .metrics import STAGE_SECONDS, Counter
+
+logger = logging.getLogger(__name__)
+
+RUN_BUDGET_SECONDS = float(os.getenv("RUN_BUDGET_SECONDS", "0"))  # 0 means no deadline
+DEADLINE_QUANTILE = float(os.getenv("DEADLINE_QUANTILE", "0.9"))
+# Floor for capped timeouts, so required calls (the tweet itself) still get a chance
+DEADLINE_MIN_TIMEOUT = float(os.getenv("DEADLINE_MIN_TIMEOUT_SECONDS", "10"))
+
+DEGRADED_STAGES = Counter(
+    "agent_degraded_stages_total", "Optional stages skipped because the run's budget could not cover them.", ("stage",)
+)
+
+
+def estimate(stage: str) -> float:
+    """Get a stage's observed ``DEADLINE_QUANTILE`` latency, or None if it has never run."""
+    return STAGE_SECONDS.quantile(DEADLINE_QUANTILE, stage=stage)
+
+
+class Deadline:
+    """Point in time a run should be done by."""
+
+    def __init__(self, budget: float):
+        """Create a deadline ``budget`` seconds from now."""
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.degraded = []  # One dict per skipped stage
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def allows(self, stage: str, name: str = None) -> bool:
+        """Whether the time left covers ``stage``'s estimated latency.
+
+        Stages without observations are allowed; their calls are still bound
+        by capped timeouts. A refused stage is recorded as degraded.
+
+        Args:
+            stage: ``agent_stage_seconds`` stage to estimate from.
+            name: Name to report the stage under. Defaults to ``stage``.
+        """
+        needed = estimate(stage)
+        remaining = self.remaining()
+        if needed is None or needed <= remaining:
+            return True
+        name = name or stage
+        logger.warning(f"Skipping {name}: {remaining:.0f}s left of the run budget, p90 is {needed:.0f}s")
+        self.degraded.append({"stage": name, "remaining": round(remaining, 3), "estimate": round(needed, 3)})
+        DEGRADED_STAGES.inc(stage=name)
+        return False
+
+
+_current_deadline = ContextVar("run_deadline", default=None)
+
+
+def current_deadline():
+    """Get the ``Deadline`` of the active ``run_deadline`` block, if any."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def run_deadline(budget: float = None):
+    """Give the block a deadline ``budget`` seconds from now.
+
+    Args:
+        budget: Seconds; defaults to ``RUN_BUDGET_SECONDS``. With no budget
+            the block has no deadline and yields None.
+    """
+    budget = RUN_BUDGET_SECONDS if budget is None else budget
+    if not budget or budget <= 0:
+        yield None
+        return
+    deadline = Deadline(budget)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def allows(stage: str, name: str = None) -> bool:
+    """``Deadline.allows`` for the active deadline; always True without one."""
+    deadline = current_deadline()
+    return deadline is None or deadline.allows(stage, name)
+
+
+def cap(timeout: float) -> float:
+    """Cap a timeout at the time left before the active deadline.
+
+    Never goes below ``DEADLINE_MIN_TIMEOUT`` (or ``timeout``, if shorter).
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return timeout
+    return min(timeout, max(deadline.remaining(), DEADLINE_MIN_TIMEOUT))
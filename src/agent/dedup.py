@@ -0,0 +1,131 @@
+"""Near-duplicate detection for tweet text.
+
+Tweets are normalized (lowercased; URLs, mentions, hashtags, numbers and
+emoji stripped) and fingerprinted with a 64-bit SimHash over character
+shingles. Fingerprints are split into ``max_distance + 1`` bands; two
+fingerprints within ``max_distance`` bits of each other share at least one
+band exactly, so a lookup only compares against the few fingerprints in its
+band buckets instead of the whole history. Text that is empty once
+normalized (only links, hashtags or numbers) has no fingerprint and is
+never treated as a duplicate.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+
+from .ledger import get_ledger
+
+logger = logging.getLogger(__name__)
+
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))
+SHINGLE_SIZE = 4
+
+_STRIP_RE = re.compile(r"https?://\S+|www\.\S+|[@#]\w+|\d+")
+_NON_WORD_RE = re.compile(r"[^a-z ]+")
+
+
+def normalize(text: str) -> str:
+    """Reduce tweet text to the words that make it (non-)unique."""
+    text = _STRIP_RE.sub(" ", text.lower())
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def simhash(text: str) -> int:
+    """Get the 64-bit SimHash of normalized text, or None if nothing is left of it."""
+    text = normalize(text)
+    if not text:
+        return None
+    if len(text) <= SHINGLE_SIZE:
+        shingles = [text]
+    else:
+        shingles = [text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)]
+    bits = [
+        format(int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big"), "064b")
+        for s in shingles
+    ]
+    # Column-wise majority vote over the shingle hashes
+    half = len(bits) / 2
+    fingerprint = 0
+    for column in zip(*bits):
+        fingerprint = (fingerprint << 1) | (column.count("1") > half)
+    return fingerprint
+
+
+class DuplicateIndex:
+    """SimHash index with banded LSH lookup."""
+
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE):
+        """Create an empty index matching fingerprints up to ``max_distance`` bits apart."""
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self._width = -(-64 // self.bands)
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        self._texts = {}  # fingerprint -> first text seen with it
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of indexed fingerprints."""
+        return len(self._texts)
+
+    def _band_keys(self, fingerprint: int) -> list:
+        mask = (1 << self._width) - 1
+        return [(fingerprint >> (i * self._width)) & mask for i in range(self.bands)]
+
+    def add(self, text: str, fingerprint: int = None) -> int:
+        """Index a text and return its fingerprint (None, and not indexed, if it has none).
+
+        Args:
+            text: Tweet text.
+            fingerprint: Its ``simhash``, if already known.
+        """
+        if fingerprint is None:
+            fingerprint = simhash(text)
+        if fingerprint is None:
+            return None
+        with self._lock:
+            if fingerprint not in self._texts:
+                self._texts[fingerprint] = text
+                for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+                    bucket[key].append(fingerprint)
+        return fingerprint
+
+    def find(self, text: str) -> str:
+        """Get the closest indexed text within ``max_distance`` bits, or None."""
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return None
+        best, best_distance = None, self.max_distance + 1
+        with self._lock:
+            for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+                for candidate in bucket.get(key, ()):
+                    distance = (candidate ^ fingerprint).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            return self._texts[best] if best is not None else None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_duplicate_index(account: str) -> DuplicateIndex:
+    """Get an account's index, built from its posting history on first use.
+
+    Every post with a recorded ``tweet`` step counts, including partial
+    posts and crashed ones whose tweet was published. Fingerprints stored
+    with each post's ``compose`` step are reused, so loading a large history
+    does not re-hash every tweet.
+    """
+    with _indexes_lock:
+        index = _indexes.get(account)
+        if index is None:
+            index = DuplicateIndex()
+            for composed in get_ledger().step_outputs("compose", account=account, with_step="tweet"):
+                index.add(composed["tweet_text"], composed.get("simhash"))
+            logger.info(f"Loaded {len(index)} posted tweet(s) into the duplicate index for {account}")
+            _indexes[account] = index
+        return index
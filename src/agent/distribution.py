@@ -0,0 +1,163 @@
+"""Concurrent distribution of a video to every platform.
+
+UploadPost posts to YouTube, TikTok and Instagram from one request, so the
+video is read and sent once for all of them, with per-platform titles and
+descriptions as request overrides. The Drive upload runs at the same time.
+Up to ``DISTRIBUTION_CONCURRENCY`` uploads run at once, so distribution
+takes about as long as the slowest upload rather than the sum. Under a run
+deadline, uploads whose p90 latency no longer fits are skipped.
+"""
+
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import deadline
+from .accounts import Account
+from .googledrive_agent import upload_video_to_drive
+from .metrics import timed
+from .resilience import is_available
+from .uploadpost_agent import upload_video_multiplatform
+
+logger = logging.getLogger(__name__)
+
+UPLOADPOST_PLATFORMS = ("youtube", "tiktok", "instagram")
+VIDEO_PLATFORMS = [p.strip() for p in os.getenv("VIDEO_PLATFORMS", "youtube,tiktok,instagram").split(",") if p.strip()]
+DISTRIBUTION_CONCURRENCY = int(os.getenv("DISTRIBUTION_CONCURRENCY", "4"))
+CAPTION_LENGTH = 150  # TikTok and Instagram captions
+
+
+def platform_metadata(title: str, description: str, caption: str, captions: dict = None) -> dict:
+    """Get the title and description to upload with on each platform.
+
+    Args:
+        title: Video title (YouTube, Drive).
+        description: Long description (YouTube, Drive).
+        caption: Short text for TikTok and Instagram, e.g. the tweet.
+        captions: Platform-specific captions replacing ``caption``, e.g.
+            ``{"tiktok": ...}`` from the post's creative brief.
+    """
+    caption = caption if len(caption) <= CAPTION_LENGTH else caption[:CAPTION_LENGTH - 1].rstrip() + "…"
+    captions = captions or {}
+    return {
+        "youtube": {"title": title, "description": description},
+        "tiktok": {"title": captions.get("tiktok") or caption},
+        "instagram": {"title": captions.get("instagram") or caption},
+        "drive": {"title": title, "description": description},
+    }
+
+
+def _uploadpost_results(response: dict, platforms: list) -> dict:
+    """Split an UploadPost response into per-platform results."""
+    if not response.get("success"):
+        return {p: {"success": False, "error": response.get("error")} for p in platforms}
+    body = response.get("response") or {}
+    per_platform = body.get("results") if isinstance(body, dict) else None
+    if not per_platform:  # Async uploads only return a request id
+        return {p: {"success": True, "request_id": body.get("request_id")} for p in platforms}
+    results = {}
+    for p in platforms:
+        result = per_platform.get(p) or {"success": False, "error": "No result for platform"}
+        results[p] = {"success": bool(result.get("success")), **{k: v for k, v in result.items() if k != "success"}}
+    return results
+
+
+def _upload_uploadpost(video_path: str, metadata: dict, platforms: list, account: Account) -> dict:
+    overrides = {}
+    for p in platforms:
+        for key, value in metadata[p].items():
+            overrides[f"{p}_{key}"] = value
+    response = upload_video_multiplatform(
+        video_path,
+        title=metadata["youtube"]["title"],
+        description=metadata["youtube"]["description"],
+        platforms=platforms,
+        user=account.uploadpost_user,
+        **overrides,
+    )
+    return _uploadpost_results(response, platforms)
+
+
+def _upload_drive(video_path: str, metadata: dict, account: Account) -> dict:
+    return {"drive": upload_video_to_drive(
+        video_path,
+        title=metadata["drive"]["title"],
+        description=metadata["drive"]["description"],
+        connected_account_id=account.googledrive_connection_id,
+    )}
+
+
+@timed("distribution")
+def distribute_video(video_path: str, metadata: dict, account: Account, targets: list = None,
+                     on_result=None) -> dict:
+    """Upload a video to every target at once and aggregate the results.
+
+    Args:
+        video_path: Video to upload.
+        metadata: ``platform_metadata`` result.
+        account: Account to upload for.
+        targets: Platforms to upload to (``VIDEO_PLATFORMS`` plus
+            ``drive`` by default). Leave out ones already uploaded.
+        on_result: ``on_result(target, result)`` callback, called from the
+            upload threads as each target finishes. Targets skipped because
+            the account has no credentials for them, the target's provider
+            is unavailable, or the run's deadline is too close, fail without
+            a callback.
+
+    Returns:
+        Dict with per-target ``results`` (each with ``success`` and
+        ``seconds``), and ``seconds`` for the whole distribution.
+    """
+    targets = VIDEO_PLATFORMS + ["drive"] if targets is None else targets
+    uploadpost = [t for t in targets if t in UPLOADPOST_PLATFORMS]
+    results = {t: {"success": False, "error": f"Unknown target {t!r}", "seconds": 0.0}
+               for t in targets if t not in UPLOADPOST_PLATFORMS and t != "drive"}
+
+    jobs = []
+    if uploadpost and not account.uploadpost_user:
+        logger.warning(f"Skipping {uploadpost} uploads: account {account.name} has no UploadPost user")
+        results.update({p: {"success": False, "error": "No UploadPost user", "seconds": 0.0} for p in uploadpost})
+    elif uploadpost and not is_available("uploadpost"):
+        logger.warning(f"Skipping {uploadpost} uploads: UploadPost is unavailable")
+        results.update({p: {"success": False, "error": "UploadPost is unavailable", "seconds": 0.0} for p in uploadpost})
+    elif uploadpost and not deadline.allows("uploadpost_upload", "uploadpost"):
+        results.update({p: {"success": False, "error": "Not enough run budget left", "seconds": 0.0} for p in uploadpost})
+    elif uploadpost:
+        jobs.append((uploadpost, _upload_uploadpost, video_path, metadata, uploadpost, account))
+    if "drive" in targets and not account.googledrive_connection_id:
+        logger.warning(f"Skipping Google Drive upload: account {account.name} has no Drive connection")
+        results["drive"] = {"success": False, "error": "No Google Drive connection", "seconds": 0.0}
+    elif "drive" in targets and not is_available("composio"):
+        logger.warning("Skipping Google Drive upload: Composio is unavailable")
+        results["drive"] = {"success": False, "error": "Composio is unavailable", "seconds": 0.0}
+    elif "drive" in targets and not deadline.allows("drive_upload", "drive"):
+        results["drive"] = {"success": False, "error": "Not enough run budget left", "seconds": 0.0}
+    elif "drive" in targets:
+        jobs.append((["drive"], _upload_drive, video_path, metadata, account))
+
+    def run(job):
+        names, upload, *args = job
+        job_started = time.perf_counter()
+        try:
+            outcome = upload(*args)
+        except Exception as e:
+            logger.warning(f"Upload to {names} failed: {e}")
+            outcome = {name: {"success": False, "error": str(e)} for name in names}
+        seconds = time.perf_counter() - job_started
+        for name in names:
+            result = results[name] = {**outcome[name], "seconds": seconds}
+            if on_result:
+                on_result(name, result)
+
+    started = time.perf_counter()
+    if jobs:
+        # Each upload gets the caller's context, so callbacks can use the run's stream writer
+        contexts = [contextvars.copy_context() for _ in jobs]
+        with ThreadPoolExecutor(max_workers=max(1, DISTRIBUTION_CONCURRENCY), thread_name_prefix="distribute") as pool:
+            list(pool.map(lambda context, job: context.run(run, job), contexts, jobs))
+    seconds = time.perf_counter() - started
+    succeeded = [t for t, r in results.items() if r["success"]]
+    logger.info(f"Distributed {video_path} to {len(succeeded)}/{len(results)} target(s) in {seconds:.1f}s")
+    return {"results": results, "seconds": seconds}
@@ -7,6 +7,11 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from firecrawl import FirecrawlApp
 from dotenv import load_dotenv
+from .cassette import recorded
+from .marketing_prompt import load_marketing_config
+from .metrics import timed
+from .product_index import ProductIndex
+from .resilience import call, get_timeout
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -14,13 +19,29 @@ logger = logging.getLogger(__name__)
 CACHE_FILE = Path("product_data_cache.json")
 CACHE_DURATION = timedelta(days=1)
 
+# Snippet selection limits for prompt context
+CONTEXT_TOP_K = int(os.getenv("PRODUCT_CONTEXT_TOP_K", "5"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("PRODUCT_CONTEXT_TOKEN_BUDGET", "400"))
+
+_product_index = ProductIndex()
+_cache_file = {"version": None, "cache": None}  # Last parsed cache file, by (path, mtime, size)
+_synced_data = None  # Product data the index was last updated from
+
 def load_cached_data():
-    """Load cached product data if fresh."""
+    """Load cached product data if fresh.
+
+    The file is only parsed again when it changes; the returned data is
+    shared, so don't modify it.
+    """
     if not CACHE_FILE.exists():
         return None
     
-    with open(CACHE_FILE, 'r') as f:
-        cache = json.load(f)
+    stat = CACHE_FILE.stat()
+    version = (str(CACHE_FILE), stat.st_mtime_ns, stat.st_size)
+    if _cache_file["version"] != version:
+        with open(CACHE_FILE, 'r') as f:
+            _cache_file.update(version=version, cache=json.load(f))
+    cache = _cache_file["cache"]
     
     cached_time = datetime.fromisoformat(cache['timestamp'])
     if datetime.now() - cached_time < CACHE_DURATION:
@@ -39,9 +60,14 @@ def save_cached_data(data):
         json.dump(cache, f, indent=2)
     logger.info("Saved product data to cache")
 
-def scrape_product_data():
-    """Scrape product data from all URLs once daily."""
-    cached = load_cached_data()
+@timed("product_scrape")
+def scrape_product_data(force: bool = False):
+    """Scrape product data from all URLs once daily.
+
+    Args:
+        force: Re-scrape even if the cached data is still fresh.
+    """
+    cached = None if force else load_cached_data()
     if cached:
         return cached
     
@@ -54,12 +80,12 @@ def scrape_product_data():
         "https://linktr.ee/omniai"
     ]
     
-    app = FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
+    app = FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"), timeout=get_timeout("firecrawl"))
     product_data = {}
     
     for url in urls:
         try:
-            result = app.scrape(url, formats=['markdown'])
+            result = call("firecrawl", recorded("firecrawl", "scrape", app.scrape), url, formats=['markdown'])
             product_data[url] = {
                 'content': result.get('markdown', ''),
                 'title': result.get('metadata', {}).get('title', ''),
@@ -69,19 +95,57 @@ def scrape_product_data():
         except Exception as e:
             logger.warning(f"Failed to scrape {url}: {e}")
             product_data[url] = {'content': '', 'title': '', 'description': ''}
+
+    # Firecrawl down: keep serving the stale cache rather than empty content
+    if not any(page['content'] for page in product_data.values()) and CACHE_FILE.exists():
+        logger.warning("No product pages scraped; keeping the stale cache")
+        with open(CACHE_FILE, 'r') as f:
+            return json.load(f)['data']
     
     save_cached_data(product_data)
     return product_data
 
-def get_product_context():
-    """Get product context for AI agent."""
+def get_product_index() -> ProductIndex:
+    """Get the product index, synced with the latest scraped data and keywords."""
+    global _synced_data
+    keywords = {}
+    try:
+        for product in load_marketing_config().get("products", []):
+            keywords[product["url"]] = product.get("keywords", [])
+    except Exception as e:
+        logger.warning(f"Failed to load product keywords: {e}")
+    _product_index.set_keywords(keywords)
     data = scrape_product_data()
-    
+    if data is not _synced_data:  # Same parsed cache file: nothing to re-hash
+        _product_index.update(data)
+        _synced_data = data
+    return _product_index
+
+@timed("product_context")
+def get_product_context(query: str = None, top_k: int = CONTEXT_TOP_K, token_budget: int = CONTEXT_TOKEN_BUDGET):
+    """Get product context for AI agent.
+
+    Args:
+        query: Tweet text or query to select relevant snippets for. Defaults
+            to the product keywords from the marketing config.
+        top_k: Maximum number of snippets to include.
+        token_budget: Maximum estimated tokens of snippet text.
+
+    Returns:
+        Context block with the most relevant scraped snippets, or an empty
+        string when nothing relevant was found.
+    """
+    index = get_product_index()
+    if not query:
+        query = index.keyword_query()
+
+    snippets = index.search(query, top_k=top_k, token_budget=token_budget)
+    if not snippets:
+        return ""
+
     context = "PRODUCT KNOWLEDGE (scraped from our sites):\n\n"
-    for url, info in data.items():
-        context += f"URL: {url}\n"
-        context += f"Title: {info['title']}\n"
-        context += f"Description: {info['description']}\n"
-        context += f"Content Preview: {info['content'][:500]}...\n\n"
-    
+    for snippet in snippets:
+        context += f"URL: {snippet['url']}\n"
+        context += f"{snippet['text']}\n\n"
+
     return context
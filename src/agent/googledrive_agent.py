@@ -3,29 +3,31 @@
 import logging
 import os
 from dotenv import load_dotenv
-from composio import Composio
+from .clients import execute_tool, get_composio_client
+from .metrics import timed
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-composio_client = Composio(
-    api_key=os.getenv("COMPOSIO_API_KEY"),
-    entity_id=os.getenv("GOOGLEDRIVE_ENTITY_ID")
-)
+composio_client = get_composio_client(os.getenv("GOOGLEDRIVE_ENTITY_ID"))
 
 
-def upload_video_to_drive(video_path: str, title: str, description: str) -> dict:
+@timed("drive_upload")
+def upload_video_to_drive(video_path: str, title: str, description: str, connected_account_id: str = None) -> dict:
     """Upload video to Google Drive using Composio.
     
     Args:
         video_path: Local path to video file.
         title: Video title.
         description: Video description.
+        connected_account_id: Drive connection to upload with. Defaults to env
+            `GOOGLEDRIVE_CONNECTION_ID`.
         
     Returns:
         Upload response.
     """
     logger.info("---UPLOADING VIDEO TO GOOGLE DRIVE---")
+    connected_account_id = connected_account_id or os.getenv("GOOGLEDRIVE_CONNECTION_ID")
     
     if not os.path.exists(video_path):
         logger.error(f"Video file not found: {video_path}")
@@ -37,10 +39,11 @@ def upload_video_to_drive(video_path: str, title: str, description: str) -> dict
     try:
         # Find "AI Video" folder
         logger.info("Finding AI Video folder...")
-        folder_result = composio_client.tools.execute(
+        folder_result = execute_tool(
+            composio_client,
             "GOOGLEDRIVE_FIND_FOLDER",
             {"name_exact": "AI Video"},
-            connected_account_id=os.getenv("GOOGLEDRIVE_CONNECTION_ID")
+            connected_account_id=connected_account_id
         )
         
         folder_id = None
@@ -54,10 +57,12 @@ def upload_video_to_drive(video_path: str, title: str, description: str) -> dict
         logger.info("Uploading to Google Drive...")
         upload_params = {"file_to_upload": video_path, "folder_to_upload_to": folder_id}
         
-        result = composio_client.tools.execute(
+        result = execute_tool(
+            composio_client,
             "GOOGLEDRIVE_UPLOAD_FILE",
             upload_params,
-            connected_account_id=os.getenv("GOOGLEDRIVE_CONNECTION_ID")
+            connected_account_id=connected_account_id,
+            idempotent=False
         )
         
         if result.get("successful"):
@@ -2,31 +2,48 @@ from __future__ import annotations
 
 import logging
 import os
+import random
+import time
+import uuid
+from functools import partial
 from pathlib import Path
 from typing import Any, Dict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from langgraph.graph import StateGraph
 from langgraph.runtime import Runtime
 from typing_extensions import TypedDict
 
-from langchain_google_genai import ChatGoogleGenerativeAI, Modality
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage
 import asyncio
 from langsmith import configure
 from dotenv import load_dotenv
 import requests
-import aiohttp
 import json
-from .image_subagent import enhance_prompt_for_image
-from .video_agent import generate_video_from_tweet
+from .image_pool import take_pooled_image
+from .image_subagent import generate_image
 from .youtube_agent import get_channel_statistics, get_channel_id_by_handle
-from .uploadpost_agent import upload_video_multiplatform
-from .youtube_metadata_agent import generate_youtube_metadata
-from .googledrive_agent import upload_video_to_drive
-from .marketing_prompt import get_marketing_prompt
-from .firecrawl_agent import get_product_context
+from .marketing_prompt import get_compiled_prompt, get_marketing_prompt, load_marketing_config
+from .firecrawl_agent import get_product_context, get_product_index
+from .usage import format_usage, track_usage, usage_callbacks
+from .clients import COMPOSIO_TOOL_SECONDS, execute_tool, get_composio_client, get_http_session
+from .accounts import Account, get_account
+from .creative_brief import get_post_brief
+from .deadline import current_deadline, run_deadline
+from .media_optimizer import optimize_image
+from .media_pipeline import enqueue_video_assets, produce_video_assets
+from .ledger import get_ledger
+from .streaming import afile_sha256
+from . import resilience
+from .batching import BatchLoader
+from .cassette import recorded
+from .engagement import ENGAGEMENT_SEARCH_PAGES, TopK, page_arrays, score
+from .metrics import stage_timer, timed
+from .profiling import maybe_profile, profiling_enabled
+from .rate_limit import RETRYABLE_STATUSES, GovernedRateLimiter, RetryableError, get_governor, result_status
+from .dedup import get_duplicate_index, simhash
 
 # Load environment variables
 load_dotenv()
@@ -39,24 +56,23 @@ configure(project_name="twitter-composio-agent")
 
 # Initialize Google AI LLM with error handling
 try:
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp")
+    llm = ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash-exp",
+        callbacks=usage_callbacks("agent"),
+        rate_limiter=GovernedRateLimiter("gemini-2.0-flash-exp"),
+        timeout=resilience.get_timeout("gemini"),
+    )
 except Exception as e:
     print(f"Warning: Could not initialize Google AI LLM: {e}")
     print("Please set your GOOGLE_API_KEY in the .env file")
     llm = None
 
-# Initialize Composio API configuration
+# Initialize Composio API configuration (connection IDs live on each Account)
 COMPOSIO_API_KEY = os.getenv("COMPOSIO_API_KEY")
-CONNECTION_ID = os.getenv("TWITTER_CONNECTION_ID")
-GOOGLE_CONNECTION_ID = os.getenv("GOOGLE_CONNECTION_ID", CONNECTION_ID)
-COMPOSIO_BASE_URL = "https://backend.composio.dev/api/v3/tools/execute"
-
-# Initialize Composio client
-from composio import Composio
-composio_client = Composio(
-    api_key=COMPOSIO_API_KEY,
-    entity_id=os.getenv("TWITTER_ENTITY_ID")
-)
+COMPOSIO_BASE_URL = os.getenv("COMPOSIO_BASE_URL", "https://backend.composio.dev/api/v3/tools/execute")
+
+# Initialize Composio client (shared with the other agents)
+composio_client = get_composio_client(os.getenv("TWITTER_ENTITY_ID"))
 
 def _download_image_from_url(image_url: str) -> str:
     """Download image from URL and save locally.
@@ -114,14 +130,23 @@ TWITTER_TOOLS = {
     "get_media_upload_status": "TWITTER_GET_MEDIA_UPLOAD_STATUS",
 }
 
+# Tools whose requests must not be repeated after a server error
+NON_IDEMPOTENT_TOOLS = {"post_tweet", "creation_of_a_post", "send_dm_conversation", "send_dm_user"}
+
 print(f"Initialized Twitter tools: {list(TWITTER_TOOLS.keys())}")
 
 
-async def call_composio_tool(tool_name: str, query: str = None, params: dict = None) -> dict:
+async def call_composio_tool(tool_name: str, query: str = None, params: dict = None, account: Account = None) -> dict:
     """Call a Composio tool for the connected account.
 
     This is a lightweight wrapper that mirrors the previous Composio usage.
     Do NOT commit API keys or connection IDs into source control; use environment variables.
+
+    Args:
+        tool_name: Key into ``TWITTER_TOOLS``.
+        query: Optional natural-language input for the tool.
+        params: Optional tool arguments.
+        account: Account to act for. Defaults to the default account.
     """
     if tool_name not in TWITTER_TOOLS:
         return {"error": f"Unknown tool: {tool_name}"}
@@ -132,7 +157,8 @@ async def call_composio_tool(tool_name: str, query: str = None, params: dict = N
     }
 
     # Use Google connection for image generation
-    connected_account_id = GOOGLE_CONNECTION_ID if tool_name == "generate_image" else CONNECTION_ID
+    account = account or get_account()
+    connected_account_id = account.google_connection_id if tool_name == "generate_image" else account.twitter_connection_id
 
     if params:
         payload = {
@@ -147,30 +173,205 @@ async def call_composio_tool(tool_name: str, query: str = None, params: dict = N
     else:
         payload = {"connected_account_id": connected_account_id}
 
+    slug = TWITTER_TOOLS[tool_name]
+    governor = get_governor()
+    idempotent = tool_name not in NON_IDEMPOTENT_TOOLS
+
+    async def _request():
+        session = get_http_session()
+        async with session.post(f"{COMPOSIO_BASE_URL}/{slug}", json=payload, headers=headers) as response:
+            limits = governor.observe(slug, response.headers, scope=connected_account_id)
+            if response.status in RETRYABLE_STATUSES:
+                raise RetryableError(response.status, await response.text(), limits["retry_after"])
+            result = await response.json()
+        status = result_status(result)
+        if status is not None:
+            raise RetryableError(status, str(result.get("error")))
+        return result
+
+    started = time.perf_counter()
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"{COMPOSIO_BASE_URL}/{TWITTER_TOOLS[tool_name]}"
-            async with session.post(url, json=payload, headers=headers) as response:
-                result = await response.json()
-                return result
+        result = await governor.call(
+            slug, partial(resilience.call_async, idempotent=idempotent), "composio",
+            recorded("composio", slug, _request, request=payload), scope=connected_account_id, idempotent=idempotent
+        )
     except Exception as e:
-        return {"error": str(e)}
+        result = {"error": str(e)}
+    outcome = "ok" if result.get("successful") else "error"
+    COMPOSIO_TOOL_SECONDS.observe(time.perf_counter() - started, tool=slug, outcome=outcome)
+    return result
+
+
+# Single tweet lookups are coalesced into TWITTER_POST_LOOKUP_BY_POST_IDS calls
+LOOKUP_BATCH_SIZE = 100  # Max IDs per request
+LOOKUP_BATCH_WINDOW = float(os.getenv("LOOKUP_BATCH_WINDOW_MS", "5")) / 1000
+
+_lookup_loaders = {}  # (event loop, connection id) -> BatchLoader
+
+
+def _lookup_loader(account: Account) -> BatchLoader:
+    """Get the tweet lookup batcher of an account on the running event loop."""
+    loop = asyncio.get_running_loop()
+    key = (loop, account.twitter_connection_id)
+    loader = _lookup_loaders.get(key)
+    if loader is None:
+        for other in [k for k in _lookup_loaders if k[0].is_closed()]:
+            del _lookup_loaders[other]
+
+        async def lookup_batch(ids: list) -> dict:
+            result = await call_composio_tool("post_lookup_by_post_ids", params={"ids": ids}, account=account)
+            if not result.get("successful"):
+                return {i: {"successful": False, "data": {}, "error": result.get("error")} for i in ids}
+            data = result.get("data") or {}
+            tweets = {str(t.get("id")): t for t in data.get("data") or []}
+            errors = {str(e.get("value") or e.get("resource_id")): e for e in data.get("errors") or []}
+            results = {}
+            for i in ids:
+                if i in tweets:
+                    results[i] = {"successful": True, "data": {"data": tweets[i]}, "error": None}
+                else:
+                    error = errors.get(i, {}).get("detail") or f"Tweet {i} not found"
+                    results[i] = {"successful": False, "data": {}, "error": error}
+            return results
+
+        loader = _lookup_loaders[key] = BatchLoader(
+            lookup_batch, "tweet_lookup", max_batch_size=LOOKUP_BATCH_SIZE, window=LOOKUP_BATCH_WINDOW
+        )
+    return loader
+
+
+async def lookup_posts(ids: list, account: Account = None) -> dict:
+    """Look up tweets by ID, batched with concurrent lookups of the same account.
+
+    Args:
+        ids: Tweet IDs.
+        account: Account to act for. Defaults to the default account.
+
+    Returns:
+        Composio-style result: for one ID, shaped like
+        ``TWITTER_POST_LOOKUP_BY_POST_ID``; for several, like
+        ``TWITTER_POST_LOOKUP_BY_POST_IDS`` (found tweets, plus ``errors``).
+    """
+    account = account or get_account()
+    results = await _lookup_loader(account).load_many([str(i) for i in ids])
+    if len(results) == 1:
+        return results[0]
+    tweets = [r["data"]["data"] for r in results if r["successful"]]
+    errors = [{"value": i, "detail": r["error"]} for i, r in zip(ids, results) if not r["successful"]]
+    data = {"data": tweets, **({"errors": errors} if errors else {})}
+    return {"successful": bool(tweets), "data": data, "error": None if tweets else errors[0]["detail"]}
+
+
+SEARCH_PAGE_SIZE = 100  # Max results per recent search request
+
+
+async def search_engagement_candidates(search_term: str, account: Account = None, pages: int = None,
+                                       k: int = None) -> dict:
+    """Search recent tweets and rank them as reply or like candidates.
+
+    Result pages are scored as they arrive and only the running top K is
+    kept (see ``engagement``).
+
+    Args:
+        search_term: Recent search query.
+        account: Account to act for. Defaults to the default account.
+        pages: Max result pages to scan. Defaults to ``ENGAGEMENT_SEARCH_PAGES``.
+        k: Number of candidates. Defaults to ``ENGAGEMENT_TOP_K``.
+
+    Returns:
+        Composio-style result whose ``data`` holds the ranked ``data``
+        (tweets with their ``engagement_score``) and ``meta`` with the
+        number of tweets and pages scanned.
+    """
+    top = TopK() if k is None else TopK(k)
+    params = {
+        "query": search_term,
+        "max_results": SEARCH_PAGE_SIZE,
+        "tweet_fields": "created_at,public_metrics,text"
+    }
+    scanned = 0
+    for _ in range(max(1, ENGAGEMENT_SEARCH_PAGES if pages is None else pages)):
+        result = await call_composio_tool("recent_search", params=params, account=account)
+        if not result.get("successful"):
+            if not scanned:
+                return result
+            logger.warning(f"Stopped search for {search_term!r} after {scanned} page(s): {result.get('error')}")
+            break
+        scanned += 1
+        data = result.get("data") or {}
+        tweets = data.get("data") or []
+        if tweets:
+            top.push(tweets, score(page_arrays(tweets)))
+        next_token = (data.get("meta") or {}).get("next_token")
+        if not next_token:
+            break
+        params = {**params, "next_token": next_token}
+    meta = {"result_count": top.seen, "pages": scanned}
+    return {"successful": True, "data": {"data": top.items(), "meta": meta}, "error": None}
 
 # Define the marketing-focused prompt template with product context
-def get_system_prompt():
-    """Get system prompt with fresh product context."""
+def get_system_prompt(query: str = None, config_path: str = None):
+    """Get system prompt with fresh product context.
+
+    Args:
+        query: Optional tweet text or query used to pick the relevant product
+            snippets. Defaults to the configured product keywords.
+        config_path: Marketing config of the account. Defaults to
+            ``marketing_config.json``.
+    """
     try:
-        product_context = get_product_context()
-        return get_marketing_prompt() + "\n\n" + product_context
+        product_context = get_product_context(query)
+        return get_marketing_prompt(config_path) + "\n\n" + product_context
     except Exception as e:
         logger.warning(f"Failed to load product context: {e}")
-        return get_marketing_prompt()
+        return get_marketing_prompt(config_path)
+
+_prompt_cache = {}  # marketing config path -> (query, config hash, index version, ChatPromptTemplate)
+
 
-prompt = ChatPromptTemplate.from_messages([
-    ("system", get_system_prompt()),
-    ("human", "{input}"),
-    ("placeholder", "{agent_scratchpad}"),
-])
+def get_prompt(query: str = None, config_path: str = None) -> ChatPromptTemplate:
+    """Get the agent prompt template, rebuilt only when its inputs change.
+
+    The marketing prompt is hot-reloaded from ``marketing_config.json`` (or
+    the account's own config), so config edits are picked up here without
+    restarting the graph. The product context is searched again only when
+    the query, the config or the product index changes.
+    """
+    config_hash = get_compiled_prompt(config_path).content_hash
+    try:
+        index_version = get_product_index().version
+    except Exception:
+        index_version = None  # get_system_prompt falls back to no product context
+    cached = _prompt_cache.get(config_path)
+    if cached and cached[:3] == (query, config_hash, index_version):
+        return cached[3]
+    template = ChatPromptTemplate.from_messages([
+        ("system", get_system_prompt(query, config_path)),
+        ("human", "{input}"),
+        ("placeholder", "{agent_scratchpad}"),
+    ])
+    _prompt_cache[config_path] = (query, config_hash, index_version, template)
+    return template
+
+
+# Link and hashtag rotation for accounts without their own marketing config
+DEFAULT_POST_URLS = [
+    "https://consumerai.info",
+    "https://disputeai.xyz",
+    "https://fdwa.site",
+    "https://linktr.ee/omniai"
+]
+DEFAULT_POST_HASHTAGS = ["#CreditRepair", "#AITools", "#DisputeAI", "#ConsumerAI"]
+
+
+def post_rotation(account: Account) -> tuple:
+    """Get the (urls, hashtags) an account's posts rotate through."""
+    if not account.marketing_config:
+        return DEFAULT_POST_URLS, DEFAULT_POST_HASHTAGS
+    config = load_marketing_config(account.marketing_config)
+    urls = [p["url"] for p in config["products"]] + list(config["links"].values())[:1]
+    hashtags = [p["hashtags"][0] for p in config["products"] if p["hashtags"]]
+    return urls or DEFAULT_POST_URLS, hashtags or DEFAULT_POST_HASHTAGS
 
 # Placeholder for agent
 # agent = initialize_agent(tools, llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=True)
@@ -185,6 +386,10 @@ class Context(TypedDict):
     """
 
     my_configurable_param: str
+    account: str  # Name of the account (brand) to act for; see accounts.py
+    idempotency_key: str  # Resume key for posts; see ledger.py
+    profile: bool  # Write a CPU profile of this run; see profiling.py
+    budget_seconds: float  # Time budget of the run; optional stages are skipped to meet it, see deadline.py
 
 
 @dataclass
@@ -197,16 +402,368 @@ class State:
 
     query: str = "Analyze my website traffic and provide insights."
     twitter_account_id: str = ""  # Twitter account identifier (connected account)
+    account: str = ""  # Account (brand) name; overridden by Context["account"]
+    idempotency_key: str = ""  # Post ledger key; reuse it to resume an interrupted post
     date_range: str = "last_7_days"  # Optional: retained for temporal queries
     analysis: str = ""  # Analysis result
     video_path: str = ""  # Generated video path
+    usage: dict = field(default_factory=dict)  # LLM token/cost accounting for the run
+    degraded: list = field(default_factory=list)  # Optional stages skipped to meet the run's budget
 
 
+@timed("call_model")
 async def call_model(state: State, runtime: Runtime[Context]) -> Dict[str, Any]:
     """Process input and execute Twitter Composio tools.
 
-    Can use runtime context to alter behavior.
+    Can use runtime context to alter behavior. Token usage and estimated cost
+    of every LLM call made for the query is returned under ``usage``, and the
+    optional stages skipped to meet ``budget_seconds`` under ``degraded``.
+    """
+    context = getattr(runtime, "context", None) or {}
+    profile = context.get("profile") or profiling_enabled("graph")
+    budget = context.get("budget_seconds")
+    with maybe_profile(_intent(state), profile), track_usage() as usage, run_deadline(budget) as deadline:
+        result = await _run_query(state, runtime)
+    summary = usage.summary()
+    if summary["calls"]:
+        logger.info(f"Run usage: {format_usage(summary)}")
+    degraded = deadline.degraded if deadline else []
+    if degraded:
+        logger.info(f"Run degraded to meet its {deadline.budget:.0f}s budget: {[d['stage'] for d in degraded]}")
+    return {**result, "usage": summary, "degraded": degraded}
+
+
+def _compose_tweet(query: str, ids: list, account: Account) -> dict:
+    """Build the tweet text and post params for a post, reply or poll query.
+
+    Returns:
+        Dict with ``tweet_text``, ``params``, ``is_poll`` and ``unique_id``.
+    """
+    query_lower = query.lower()
+    # Parse tweet text: remove prefixes like "post a new tweet:" or "reply:" or "create a poll:"
+    tweet_text = query
+    is_poll = "poll" in query_lower
+    if "post a new tweet:" in query_lower:
+        tweet_text = query.split("post a new tweet:", 1)[1].strip()
+    elif "create a poll:" in query_lower:
+        tweet_text = query.split("create a poll:", 1)[1].strip()
+        is_poll = True
+    elif "reply" in query_lower and ids:
+        # For replies, remove "reply <id>" prefix if present
+        parts = query.split()
+        # Find the id and remove up to it
+        for i, part in enumerate(parts):
+            if part.isdigit() and part in ids:
+                tweet_text = " ".join(parts[i+1:]).strip()
+                break
+
+    # Ensure new content: add random number
+    unique_id = random.randint(1000, 9999)
+    if not str(unique_id) in tweet_text:
+        tweet_text += f" {unique_id}"
+
+    # Add URL if not present (rotate between products)
+    urls, hashtags = post_rotation(account)
+    if "http" not in tweet_text:
+        tweet_text += f" {random.choice(urls)}"
+
+    # Add emoji if not present
+    emojis = ["🚀", "🤖", "💡", "🔥", "⚡", "🎯", "🎄", "❄️"]
+    if not any(emoji in tweet_text for emoji in emojis):
+        tweet_text += " 🚀"
+
+    # Add hashtag if not present
+    if "#" not in tweet_text:
+        tweet_text += f" {random.choice(hashtags)}"
+
+    # Ensure under 280 chars
+    if len(tweet_text) > 280:
+        tweet_text = tweet_text[:277] + "..."
+
+    params = {"text": tweet_text}
+    if ids:
+        params["reply_in_reply_to_tweet_id"] = ids[0]
+
+    # Handle polls
+    if is_poll:
+        # Parse poll options: assume format "Question? Option1, Option2, Option3"
+        if "?" in tweet_text:
+            question, options_str = tweet_text.split("?", 1)
+            options = [opt.strip() for opt in options_str.split(",") if opt.strip()]
+            if len(options) >= 2:
+                params["poll"] = {
+                    "options": options[:4],  # Max 4 options
+                    "duration_minutes": 1440  # 1 day
+                }
+                params["text"] = question + "?" + f" {unique_id}"  # Remove options from text
+
+    return {"tweet_text": tweet_text, "params": params, "is_poll": is_poll, "unique_id": unique_id}
+
+
+DEDUP_REWRITE_ATTEMPTS = int(os.getenv("DEDUP_REWRITE_ATTEMPTS", "2"))
+
+
+@timed("rewrite")
+async def _rewrite_tweet(tweet_text: str, similar: str) -> str:
+    """Ask the LLM for a fresh take on a tweet that repeats an earlier post."""
+    message = HumanMessage(content=(
+        "This tweet is too similar to one we already posted.\n"
+        f"New tweet: {tweet_text}\n"
+        f"Earlier post: {similar}\n"
+        "Rewrite the new tweet with a different angle and wording but the same "
+        "casual voice and topic. Under 200 characters, no links or hashtags. "
+        "Reply with the tweet text only."
+    ))
+    response = await recorded("gemini", "rewrite", llm.ainvoke)([message])
+    return response.content.strip().strip('"')
+
+
+@timed("compose")
+async def _compose_unique_tweet(query: str, ids: list, account: Account) -> dict:
+    """Compose a tweet, rewriting it while it nearly duplicates a past post.
+
+    Replies and polls are composed as-is. A new post is rewritten up to
+    ``DEDUP_REWRITE_ATTEMPTS`` times before any image or video is generated.
+    It is only checked here; ``_post_tweet`` indexes it once it is posted.
+
+    Returns:
+        The ``_compose_tweet`` result, or None if the post is still a near
+        duplicate after every rewrite.
+    """
+    composed = _compose_tweet(query, ids, account)
+    if ids or composed["is_poll"]:
+        return composed
+
+    index = await asyncio.to_thread(get_duplicate_index, account.name)
+    for attempt in range(DEDUP_REWRITE_ATTEMPTS + 1):
+        similar = index.find(composed["tweet_text"])
+        if similar is None:
+            composed["simhash"] = simhash(composed["tweet_text"])
+            return composed
+        logger.info(f"Tweet nearly duplicates an earlier post: {similar!r}")
+        if attempt == DEDUP_REWRITE_ATTEMPTS or llm is None:
+            break
+        rewritten = await _rewrite_tweet(composed["tweet_text"], similar)
+        composed = _compose_tweet(f"post a new tweet: {rewritten}", ids, account)
+    return None
+
+
+@timed("media_upload")
+def _upload_media(image_path: str, account: Account) -> str:
+    """Upload an image to Twitter.
+
+    Returns:
+        The media ID, or None if the upload did not return one.
+    """
+    upload_result = execute_tool(
+        composio_client,
+        "TWITTER_UPLOAD_MEDIA",
+        {"media": image_path, "media_category": "tweet_image"},
+        connected_account_id=account.twitter_account_id
+    )
+    if not upload_result.get("successful"):
+        return None
+    nested_data = upload_result.get("data", {})
+    media_data = nested_data.get("data", {}) if isinstance(nested_data, dict) else {}
+    media_id = media_data.get("id")
+    return str(media_id) if media_id else None
+
+
+TWEET_URL = "https://x.com/i/web/status/{}"
+
+
+def _progress_emitter(writer, post_key: str):
+    """Get a ``progress(event, **data)`` callback writing custom stream events.
+
+    Events are dicts with ``event`` (``image_ready``, ``media_uploaded``,
+    ``tweet_posted``, ``reply_posted``, ``video_queued``, ``video_ready``,
+    ``video_failed``, ``video_skipped`` or ``upload_done``), ``post_key`` and event data. They
+    reach callers streaming with ``stream_mode="custom"``. LangGraph's
+    writer is thread-safe, so the video stage can report from its thread.
+    """
+    def progress(event: str, **data) -> None:
+        if writer is not None:
+            writer({"event": event, "post_key": post_key, **data})
+    return progress
+
+
+@timed("post")
+async def _post_tweet(query: str, account: Account, post_key: str, writer=None) -> dict:
+    """Run the post pipeline, resuming any steps already in the ledger.
+
+    The tweet is posted as soon as its image is uploaded; the video stage
+    runs after it (off the event loop), so progress events carry the tweet
+    URL without waiting for video generation and uploads.
+
+    Args:
+        query: Post, reply or poll query.
+        account: Account to post for.
+        post_key: Idempotency key of the post.
+        writer: LangGraph stream writer for progress events.
+
+    Returns:
+        Composio-style result of creating the tweet.
     """
+    progress = _progress_emitter(writer, post_key)
+    run = get_ledger().start(post_key, account=account.name, query=query)
+    # Attempt a simple post: if original tweet id present, treat as reply
+    ids = [t for t in query.lower().split() if t.isdigit()]
+
+    composed = run.get("compose")
+    if composed is None:
+        composed = await _compose_unique_tweet(query, ids, account)
+        if composed is None:
+            run.finish("duplicate")
+            return {"successful": False, "error": "Tweet is a near duplicate of an earlier post, even after rewriting."}
+        run.record("compose", composed)
+    tweet_text = composed["tweet_text"]
+    params = dict(composed["params"])
+
+    # Take a pre-generated image for non-poll posts, or generate one
+    image = run.get("image")
+    media = run.get("media_upload")
+    if not composed["is_poll"] and run.get("tweet") is None:
+        try:
+            if image is None or not os.path.exists(image["image_path"]):
+                image_path = await asyncio.to_thread(take_pooled_image, tweet_text, account)
+                pooled = image_path is not None
+                if not pooled:
+                    brief = await asyncio.to_thread(get_post_brief, tweet_text, run)
+                    image_path = await asyncio.to_thread(
+                        generate_image, tweet_text, composed["unique_id"], image_prompt=brief["image_prompt"]
+                    )
+                if image_path:
+                    image = {"image_path": image_path, "sha256": await afile_sha256(image_path), "pooled": pooled}
+                    run.record("image", image)
+                else:
+                    image = None
+
+            if image:
+                image_path = image["image_path"]
+                progress("image_ready", image_path=image_path, pooled=bool(image.get("pooled")))
+                # Upload to Twitter
+                try:
+                    if media is None:
+                        upload = await optimize_image(image_path, "twitter")
+                        media_id = await asyncio.to_thread(_upload_media, upload["path"], account)
+                        if media_id:
+                            media = {"media_id": media_id, "sha256": upload.get("sha256"), "bytes": upload.get("bytes")}
+                            run.record("media_upload", media)
+                    if media:
+                        params["media_media_ids"] = [media["media_id"]]
+                        logger.info(f"Uploaded media ID: {media['media_id']}")
+                        progress("media_uploaded", media_id=media["media_id"])
+                except Exception as e:
+                    logger.error(f"Media upload failed: {e}")
+            else:
+                logger.error("No image generated from Gemini")
+        except Exception as e:
+            logger.warning(f"Failed to generate/upload image: {e}")
+
+    result = run.get("tweet")
+    if result is None:
+        with stage_timer("tweet"):
+            # Off the event loop: the governor may wait for rate-limit capacity
+            result = await asyncio.to_thread(
+                execute_tool,
+                composio_client,
+                "TWITTER_CREATION_OF_A_POST",
+                params,
+                connected_account_id=account.twitter_account_id,
+                idempotent=False
+            )
+        result = {"successful": result.get("successful"), "data": result.get("data"), "error": result.get("error")}
+        if result.get("successful"):
+            run.record("tweet", result)
+            if "simhash" in composed:  # Checked for duplicates; block repeats of it from now on
+                index = await asyncio.to_thread(get_duplicate_index, account.name)
+                index.add(tweet_text, composed["simhash"])
+    tweet_id = (result.get("data") or {}).get("id") if result.get("successful") else None
+    if tweet_id:
+        progress("tweet_posted", tweet_id=str(tweet_id), url=TWEET_URL.format(tweet_id))
+
+    # After posting, reply with additional content or DM the link
+    if result.get("successful") and not ids and run.get("reply") is None:  # Only for new posts
+        if tweet_id:
+            # Reply with link or extra value
+            reply_options = [
+                f"Check out all our tools: https://linktr.ee/omniai 🔗",
+                f"Need help? Hit me up: https://buymeacoffee.com/coinvest 💬",
+                f"More info here: https://fdwa.site 💯",
+                f"DM me if you got questions! 👀"
+            ]
+            reply_text = random.choice(reply_options)
+            reply_params = {
+                "text": reply_text,
+                "reply_in_reply_to_tweet_id": str(tweet_id)
+            }
+            with stage_timer("reply"):
+                reply_result = await call_composio_tool("creation_of_a_post", params=reply_params, account=account)
+            run.record("reply", {"successful": reply_result.get("successful")})
+            progress("reply_posted", successful=bool(reply_result.get("successful")))
+
+    # Generate video from tweet and image (or queue it for any worker), last
+    # because it is the slowest stage and the tweet does not depend on it
+    if tweet_id and image and media:
+        try:
+            if enqueue_video_assets(post_key, tweet_text, image["image_path"], account):
+                progress("video_queued")
+            else:
+                await asyncio.to_thread(produce_video_assets, tweet_text, image["image_path"], account, run, progress)
+        except Exception as video_e:
+            logger.warning(f"Video generation failed: {video_e}")
+
+    if not result.get("successful"):
+        run.finish("failed")
+    else:
+        # Stages skipped for the deadline are not in the ledger; resuming the post finishes them.
+        # The degraded step lists them in case the post runs out of resumes first.
+        deadline = current_deadline()
+        degraded = deadline.degraded if deadline else []
+        if degraded or run.get("degraded"):
+            run.record("degraded", degraded)
+        run.finish("partial" if degraded else "done")
+    return result
+
+
+def _idempotency_key(state: State, runtime: Runtime[Context]) -> str:
+    """Get the post's ledger key from the context or state, or create a new one."""
+    context = getattr(runtime, "context", None) or {}
+    return context.get("idempotency_key") or state.idempotency_key or f"post-{uuid.uuid4().hex}"
+
+
+def _resolve_account(state: State, runtime: Runtime[Context]) -> Account:
+    """Get the account for this invocation from the context, then the state."""
+    context = getattr(runtime, "context", None) or {}
+    return get_account(context.get("account") or state.account or None)
+
+
+def _intent(state: State) -> str:
+    """Get the intent a query routes to: search, lookup, retweet, post, like, dm, profile or unknown."""
+    query_lower = state.query.lower()
+    # Basic intent routing for Twitter-related queries, checked in order
+    if "search" in query_lower or "find" in query_lower:
+        return "search"
+    if any(token.isdigit() for token in query_lower.split()):
+        return "lookup"
+    if "retweet" in query_lower:
+        return "retweet"
+    if "reply" in query_lower or ("comment" in query_lower and "tweet" in query_lower) or ("post" in query_lower and "tweet" in query_lower) or "poll" in query_lower:
+        return "post"
+    if "like" in query_lower or "favorite" in query_lower:
+        return "like"
+    if "dm" in query_lower or "direct message" in query_lower or "message user" in query_lower:
+        return "dm"
+    return "profile" if state.twitter_account_id else "unknown"
+
+
+async def _run_query(state: State, runtime: Runtime[Context]) -> Dict[str, Any]:
+    """Route the query to the matching Twitter intent and execute it."""
+    try:
+        account = _resolve_account(state, runtime)
+    except ValueError as e:
+        return {"analysis": f"Query: {state.query}. {e}"}
+
     # Check if LLM is available
     if llm is None:
         return {
@@ -214,16 +771,17 @@ async def call_model(state: State, runtime: Runtime[Context]) -> Dict[str, Any]:
         }
     
     # Check if we have API keys
-    if not COMPOSIO_API_KEY or not CONNECTION_ID:
+    if not COMPOSIO_API_KEY or not account.twitter_connection_id:
         return {
-            "analysis": f"Query: {state.query}. Missing Composio API key or Twitter connection ID (env `COMPOSIO_API_KEY` or `TWITTER_CONNECTION_ID`)."
+            "analysis": f"Query: {state.query}. Missing Composio API key or Twitter connection ID for account '{account.name}' (env `COMPOSIO_API_KEY` or `TWITTER_CONNECTION_ID`)."
         }
     
     try:
         query_lower = state.query.lower()
-        # Basic intent routing for Twitter-related queries
+        extra = {}  # Additional state updates from the chosen intent
+        intent = _intent(state)
         # 1) Recent search (last 7 days)
-        if "search" in query_lower or "find" in query_lower:
+        if intent == "search":
             # Extract search term: assume after "search for" or "find"
             if "search for" in query_lower:
                 search_term = state.query.split("search for", 1)[1].strip()
@@ -231,248 +789,55 @@ async def call_model(state: State, runtime: Runtime[Context]) -> Dict[str, Any]:
                 search_term = state.query.split("find", 1)[1].strip()
             else:
                 search_term = state.query  # fallback
-            params = {
-                "query": search_term,
-                "max_results": 50,
-                "tweet_fields": "created_at,public_metrics,text"
-            }
-            result = await call_composio_tool("recent_search", params=params)
+            result = await search_engagement_candidates(search_term, account)
 
         # 2) Lookup by one or more post IDs (exact IDs provided in query)
-        elif any(token.isdigit() for token in query_lower.split()):
+        elif intent == "lookup":
             # Extract numeric tokens as candidate tweet IDs
             ids = [t for t in query_lower.split() if t.isdigit()]
-            if len(ids) == 1:
-                result = await call_composio_tool("post_lookup_by_post_id", params={"id": ids[0]})
-            else:
-                result = await call_composio_tool("post_lookup_by_post_ids", params={"ids": ids})
+            result = await lookup_posts(ids, account)
 
         # 3) Retweet
-        elif "retweet" in query_lower:
+        elif intent == "retweet":
             # Expect format like: 'retweet <tweet_id>' or similar
             ids = [t for t in query_lower.split() if t.isdigit()]
             if not ids:
                 return {"analysis": "Retweet requested but no tweet ID was found in the query."}
             tweet_id = ids[0]
             # Get authenticated user ID
-            user_result = await call_composio_tool("user_lookup_me")
+            user_result = await call_composio_tool("user_lookup_me", account=account)
             if not user_result.get("successful"):
                 return {"analysis": f"Failed to get authenticated user: {user_result.get('error')}"}
             user_id = user_result.get("data", {}).get("id")
             if not user_id:
                 return {"analysis": "Could not retrieve authenticated user ID."}
             params = {"id": user_id, "tweet_id": tweet_id}
-            result = await call_composio_tool("retweet_post", params=params)
+            result = await call_composio_tool("retweet_post", params=params, account=account)
 
         # 4) Post a tweet, reply, or poll
-        elif "reply" in query_lower or ("comment" in query_lower and "tweet" in query_lower) or ("post" in query_lower and "tweet" in query_lower) or "poll" in query_lower:
-            # Attempt a simple post: if original tweet id present, treat as reply
-            ids = [t for t in query_lower.split() if t.isdigit()]
-            # Parse tweet text: remove prefixes like "post a new tweet:" or "reply:" or "create a poll:"
-            tweet_text = state.query
-            is_poll = "poll" in query_lower
-            if "post a new tweet:" in query_lower:
-                tweet_text = state.query.split("post a new tweet:", 1)[1].strip()
-            elif "create a poll:" in query_lower:
-                tweet_text = state.query.split("create a poll:", 1)[1].strip()
-                is_poll = True
-            elif "reply" in query_lower and ids:
-                # For replies, remove "reply <id>" prefix if present
-                parts = state.query.split()
-                # Find the id and remove up to it
-                for i, part in enumerate(parts):
-                    if part.isdigit() and part in ids:
-                        tweet_text = " ".join(parts[i+1:]).strip()
-                        break
-            
-            # Ensure new content: add random number
-            import random
-            unique_id = random.randint(1000, 9999)
-            if not str(unique_id) in tweet_text:
-                tweet_text += f" {unique_id}"
-            
-            # Add URL if not present (rotate between products)
-            if "http" not in tweet_text:
-                urls = [
-                    "https://consumerai.info",
-                    "https://disputeai.xyz",
-                    "https://fdwa.site",
-                    "https://linktr.ee/omniai"
-                ]
-                tweet_text += f" {random.choice(urls)}"
-            
-            # Add emoji if not present
-            emojis = ["🚀", "🤖", "💡", "🔥", "⚡", "🎯", "🎄", "❄️"]
-            if not any(emoji in tweet_text for emoji in emojis):
-                tweet_text += " 🚀"
-            
-            # Add hashtag if not present
-            if "#" not in tweet_text:
-                hashtags = ["#CreditRepair", "#AITools", "#DisputeAI", "#ConsumerAI"]
-                tweet_text += f" {random.choice(hashtags)}"
-            
-            # Ensure under 280 chars
-            if len(tweet_text) > 280:
-                tweet_text = tweet_text[:277] + "..."
-            
-            params = {"text": tweet_text}
-            if ids:
-                params["reply_in_reply_to_tweet_id"] = ids[0]
-            
-            # Handle polls
-            if is_poll:
-                # Parse poll options: assume format "Question? Option1, Option2, Option3"
-                if "?" in tweet_text:
-                    question, options_str = tweet_text.split("?", 1)
-                    options = [opt.strip() for opt in options_str.split(",") if opt.strip()]
-                    if len(options) >= 2:
-                        params["poll"] = {
-                            "options": options[:4],  # Max 4 options
-                            "duration_minutes": 1440  # 1 day
-                        }
-                        params["text"] = question + "?" + f" {unique_id}"  # Remove options from text
-            
-            # Generate image for non-poll posts
-            if not is_poll:
-                try:
-                    image_prompt = enhance_prompt_for_image(tweet_text)
-                    logger.info(f"Generated image prompt: {image_prompt}")
-                    
-                    # Generate image using Google Gemini
-                    image_llm = ChatGoogleGenerativeAI(model="models/gemini-2.5-flash-image")
-                    message = {
-                        "role": "user",
-                        "content": image_prompt,
-                    }
-                    response = image_llm.invoke([message], response_modalities=[Modality.TEXT, Modality.IMAGE])
-                    
-                    # Extract image base64
-                    image_base64 = None
-                    for block in response.content:
-                        if isinstance(block, dict) and block.get("image_url"):
-                            image_url = block["image_url"]["url"]
-                            if image_url.startswith("data:image"):
-                                image_base64 = image_url.split(",")[-1]
-                                break
-                    
-                    if image_base64:
-                        # Decode and save image
-                        import base64
-                        image_data = base64.b64decode(image_base64)
-                        temp_dir = Path("temp_images")
-                        temp_dir.mkdir(exist_ok=True)
-                        image_path = temp_dir / f"generated_{unique_id}.png"
-                        image_path = os.path.abspath(str(image_path))
-                        with open(image_path, "wb") as f:
-                            f.write(image_data)
-                        logger.info(f"Saved generated image to {image_path}")
-                        
-                        # Upload to Twitter
-                        try:
-                            upload_result = composio_client.tools.execute(
-                                "TWITTER_UPLOAD_MEDIA",
-                                {"media": image_path, "media_category": "tweet_image"},
-                                connected_account_id=os.getenv("TWITTER_ACCOUNT_ID")
-                            )
-                            
-                            if upload_result.get("successful"):
-                                nested_data = upload_result.get("data", {})
-                                media_data = nested_data.get("data", {}) if isinstance(nested_data, dict) else {}
-                                media_id = media_data.get("id")
-                                if media_id:
-                                    params["media_media_ids"] = [str(media_id)]
-                                    logger.info(f"Uploaded media ID: {media_id}")
-                                    
-                                    # Generate video from tweet and image
-                                    try:
-                                        video_path = generate_video_from_tweet(tweet_text, image_path)
-                                        if video_path:
-                                            logger.info(f"Video generated: {video_path}")
-                                            
-                                            # Generate YouTube metadata
-                                            try:
-                                                metadata = generate_youtube_metadata(tweet_text)
-                                            except Exception as meta_e:
-                                                logger.warning(f"Metadata generation failed: {meta_e}")
-                                                metadata = {"title": "Santa Spot Video", "description": tweet_text}
-                                            
-                                            # Try YouTube upload (optional)
-                                            try:
-                                                upload_result = upload_video_multiplatform(
-                                                    video_path,
-                                                    title=metadata["title"],
-                                                    description=metadata["description"],
-                                                    platforms=["youtube"]
-                                                )
-                                                if upload_result.get("success"):
-                                                    logger.info("Video uploaded to YouTube")
-                                            except Exception as yt_e:
-                                                logger.warning(f"YouTube upload failed: {yt_e}")
-                                            
-                                            # Always upload to Google Drive
-                                            try:
-                                                drive_result = upload_video_to_drive(
-                                                    video_path,
-                                                    title=metadata["title"],
-                                                    description=metadata["description"]
-                                                )
-                                                if drive_result.get("success"):
-                                                    logger.info("Video uploaded to Google Drive")
-                                            except Exception as drive_e:
-                                                logger.warning(f"Google Drive upload failed: {drive_e}")
-                                    except Exception as video_e:
-                                        logger.warning(f"Video generation failed: {video_e}")
-                        except Exception as e:
-                            logger.error(f"Media upload failed: {e}")
-                    else:
-                        logger.error("No image generated from Gemini")
-                except Exception as e:
-                    logger.warning(f"Failed to generate/upload image: {e}")
-            
-            result = composio_client.tools.execute(
-                "TWITTER_CREATION_OF_A_POST",
-                params,
-                connected_account_id=os.getenv("TWITTER_ACCOUNT_ID")
-            )
-            result = {"successful": result.get("successful"), "data": result.get("data"), "error": result.get("error")}
-            
-            # After posting, reply with additional content or DM the link
-            if result.get("successful") and not ids:  # Only for new posts
-                data = result.get("data", {})
-                tweet_id = data.get("id")
-                if tweet_id:
-                    # Reply with link or extra value
-                    reply_options = [
-                        f"Check out all our tools: https://linktr.ee/omniai 🔗",
-                        f"Need help? Hit me up: https://buymeacoffee.com/coinvest 💬",
-                        f"More info here: https://fdwa.site 💯",
-                        f"DM me if you got questions! 👀"
-                    ]
-                    reply_text = random.choice(reply_options)
-                    reply_params = {
-                        "text": reply_text,
-                        "reply_in_reply_to_tweet_id": str(tweet_id)
-                    }
-                    await call_composio_tool("creation_of_a_post", params=reply_params)
+        elif intent == "post":
+            post_key = _idempotency_key(state, runtime)
+            extra["idempotency_key"] = post_key
+            result = await _post_tweet(state.query, account, post_key, getattr(runtime, "stream_writer", None))
 
         # 5) Like a tweet
-        elif "like" in query_lower or "favorite" in query_lower:
+        elif intent == "like":
             ids = [t for t in query_lower.split() if t.isdigit()]
             if not ids:
                 return {"analysis": "Like requested but no tweet ID was found in the query."}
             tweet_id = ids[0]
             # Get authenticated user ID
-            user_result = await call_composio_tool("user_lookup_me")
+            user_result = await call_composio_tool("user_lookup_me", account=account)
             if not user_result.get("successful"):
                 return {"analysis": f"Failed to get authenticated user: {user_result.get('error')}"}
             user_id = user_result.get("data", {}).get("id")
             if not user_id:
                 return {"analysis": "Could not retrieve authenticated user ID."}
             params = {"id": user_id, "tweet_id": tweet_id}
-            result = await call_composio_tool("user_like_post", params=params)
+            result = await call_composio_tool("user_like_post", params=params, account=account)
 
         # 6) Send DM to a user
-        elif "dm" in query_lower or "direct message" in query_lower or "message user" in query_lower:
+        elif intent == "dm":
             # Expect format: 'dm <recipient_id> <message text>' — parsing here is minimal
             parts = state.query.split()
             # find first numeric-ish token for recipient id
@@ -492,22 +857,22 @@ async def call_model(state: State, runtime: Runtime[Context]) -> Dict[str, Any]:
             if not text:
                 return {"analysis": "DM requested but no message text provided."}
             params = {"participant_id": recipient, "text": text}
-            result = await call_composio_tool("send_dm_user", params=params)
+            result = await call_composio_tool("send_dm_user", params=params, account=account)
 
         else:
             # Default: attempt to fetch user/profile info using the lookup by id if provided
-            if state.twitter_account_id:
-                result = await call_composio_tool("post_lookup_by_post_id", params={"id": state.twitter_account_id})
+            if intent == "profile":
+                result = await lookup_posts([state.twitter_account_id], account)
             else:
                 return {"analysis": "Could not determine intent. Please ask to 'search', 'lookup <id>', 'retweet <id>', 'like <id>', 'dm <user_id> <message>' or 'reply <tweet_id> <text>'."}
         
         if result.get("successful"):
             data = result.get("data", {})
             analysis_text = f"Query: {state.query}\n\nTwitter Results:\n{json.dumps(data, indent=2)}"
-            return {"analysis": analysis_text}
+            return {"analysis": analysis_text, **extra}
         else:
             error_text = f"Query: {state.query}\n\nError: {result.get('error', 'Unknown error')}"
-            return {"analysis": error_text}
+            return {"analysis": error_text, **extra}
             
     except Exception as e:
         return {
@@ -0,0 +1,176 @@
+"""Pool of pre-generated images per product theme.
+
+Image generation is the slowest step before a tweet goes out. Each product
+in an account's marketing config is a theme; a background job keeps up to
+``IMAGE_POOL_SIZE`` images per theme in
+``<IMAGE_POOL_DIR>/<account>/<theme>/``, generating at most
+``IMAGE_POOL_CONCURRENCY`` at once. The post path takes an image for the
+theme its tweet mentions, and generates one on demand when the pool has
+none.
+
+Images are written to a staging directory and renamed into place, and are
+taken by renaming them out, so a partial file is never used and an image is
+never used twice, even by several workers sharing the directory.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+
+from .accounts import Account
+from .image_subagent import generate_image
+from .marketing_prompt import load_marketing_config
+
+logger = logging.getLogger(__name__)
+
+IMAGE_POOL_DIR = Path(os.getenv("IMAGE_POOL_DIR", "image_pool"))
+IMAGE_POOL_SIZE = int(os.getenv("IMAGE_POOL_SIZE", "3"))  # Per theme; 0 disables the pool
+IMAGE_POOL_CONCURRENCY = int(os.getenv("IMAGE_POOL_CONCURRENCY", "2"))
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^\w-]+", "_", name.lower()).strip("_") or "default"
+
+
+def pool_themes(account: Account) -> dict:
+    """Get an account's image themes, as theme name -> product.
+
+    Themes are the products in the account's marketing config.
+    """
+    config = load_marketing_config(account.marketing_config)
+    return {product["name"]: product for product in config["products"]}
+
+
+def match_theme(tweet_text: str, account: Account) -> str:
+    """Get the theme a tweet is about: the first product whose URL or name it mentions.
+
+    Returns:
+        Theme name, or None if the tweet mentions no product.
+    """
+    text = tweet_text.lower()
+    themes = pool_themes(account)
+    for name, product in themes.items():
+        if product["url"].lower().split("://")[-1].rstrip("/") in text:
+            return name
+    for name in themes:
+        if name.lower() in text:
+            return name
+    return None
+
+
+def theme_dir(account: Account, theme: str) -> Path:
+    """Get the directory holding a theme's pooled images."""
+    return IMAGE_POOL_DIR / _slug(account.name) / _slug(theme)
+
+
+def pool_size(account: Account, theme: str) -> int:
+    """Count a theme's pooled images."""
+    directory = theme_dir(account, theme)
+    return len(list(directory.glob("*.png"))) if directory.is_dir() else 0
+
+
+def _mtime(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def take(account: Account, theme: str, directory: str = "temp_images") -> str:
+    """Move the oldest pooled image of a theme out of the pool.
+
+    The image keeps its pool name (a uuid) as ``pooled_<uuid>.png``, so it
+    can't overwrite the image of another post in flight.
+
+    Args:
+        account: Account whose pool to take from.
+        theme: Theme name.
+        directory: Directory to move the image to.
+
+    Returns:
+        Absolute path of the claimed image, or None if the pool is empty.
+    """
+    source_dir = theme_dir(account, theme)
+    if not source_dir.is_dir():
+        return None
+    target = Path(directory)
+    target.mkdir(parents=True, exist_ok=True)
+    for candidate in sorted(source_dir.glob("*.png"), key=_mtime):
+        image_path = os.path.abspath(str(target / f"pooled_{candidate.name}"))
+        try:
+            os.replace(candidate, image_path)
+        except FileNotFoundError:
+            continue  # Taken by another worker
+        logger.info(f"Took pooled {theme} image for {account.name}: {image_path}")
+        return image_path
+    return None
+
+
+def take_pooled_image(tweet_text: str, account: Account) -> str:
+    """Take a pooled image for the theme a tweet is about.
+
+    Returns:
+        Absolute path of the image, or None if the pool is disabled, the
+        tweet matches no theme, or the theme's pool is empty.
+    """
+    if IMAGE_POOL_SIZE <= 0:
+        return None
+    try:
+        theme = match_theme(tweet_text, account)
+        return take(account, theme) if theme else None
+    except Exception as e:
+        logger.warning(f"Image pool unavailable: {e}")
+        return None
+
+
+def _generate_pooled(account: Account, theme: str, product: dict) -> str:
+    """Generate one image for a theme and move it into the pool."""
+    staging = IMAGE_POOL_DIR / ".staging"
+    image_id = uuid.uuid4().hex
+    image_path = generate_image(
+        f"{product['name']}: {product['description']}", image_id, directory=str(staging), product_name=product["name"]
+    )
+    if not image_path:
+        return None
+    destination = theme_dir(account, theme)
+    destination.mkdir(parents=True, exist_ok=True)
+    pooled = destination / f"{image_id}.png"
+    os.replace(image_path, pooled)
+    return str(pooled)
+
+
+async def refill_image_pool(account: Account, size: int = None, concurrency: int = None) -> int:
+    """Generate the images missing from each of an account's theme pools.
+
+    Args:
+        account: Account whose pools to fill.
+        size: Images to keep per theme (default ``IMAGE_POOL_SIZE``).
+        concurrency: Max images generated at once (default
+            ``IMAGE_POOL_CONCURRENCY``).
+
+    Returns:
+        Number of images added.
+    """
+    size = IMAGE_POOL_SIZE if size is None else size
+    slots = asyncio.Semaphore(concurrency or IMAGE_POOL_CONCURRENCY)
+    themes = await asyncio.to_thread(pool_themes, account)
+
+    async def generate(theme, product):
+        async with slots:
+            try:
+                return await asyncio.to_thread(_generate_pooled, account, theme, product)
+            except Exception as e:
+                logger.warning(f"Failed to pre-generate {theme} image for {account.name}: {e}")
+                return None
+
+    tasks = []
+    for theme, product in themes.items():
+        missing = size - await asyncio.to_thread(pool_size, account, theme)
+        tasks += [generate(theme, product) for _ in range(max(0, missing))]
+    added = sum(1 for path in await asyncio.gather(*tasks) if path)
+    if tasks:
+        logger.info(f"Added {added}/{len(tasks)} image(s) to {account.name}'s image pool")
+    return added
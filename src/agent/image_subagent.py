@@ -1,18 +1,47 @@
 """Image Prompt Enhancement Sub-Agent.
 
-Converts social media text into clean, visual prompts for AI image generation.
+Converts social media text into clean, visual prompts for AI image generation,
+and generates the images with Gemini.
 """
 
+import base64
 import logging
 import os
 import re
+from pathlib import Path
 
-from langchain_google_genai import GoogleGenerativeAI
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAI, Modality
 from langsmith import traceable
 
+from . import resilience
+from .cassette import recorded
+from .metrics import timed
+from .rate_limit import GovernedRateLimiter, get_governor
+from .resilience import budget_timeout
+from .usage import usage_callbacks
+
+IMAGE_MODEL = "models/gemini-2.5-flash-image"
+
 logger = logging.getLogger(__name__)
 
 
+def clean_image_prompt(text: str) -> str:
+    """Strip hashtags, mentions, markdown and quotes from an image prompt."""
+    text = re.sub(r"[*#@\[\]{}()\'\"\\]", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def fallback_image_prompt(text: str, product_name: str = None, product_price: str = None) -> str:
+    """Build an image prompt from the post text itself, without the LLM."""
+    fallback_prompt = f"Modern AI and credit repair tech image: {clean_image_prompt(text)[:150]}"
+    if product_name:
+        fallback_prompt += f" Featuring '{product_name}'."
+    if product_price:
+        fallback_prompt += f" Price: {product_price}."
+    return fallback_prompt
+
+
+@timed("image_prompt")
 @traceable(name="enhance_image_prompt")
 def enhance_prompt_for_image(text: str, product_name: str = None, product_price: str = None) -> str:
     """Convert social media text into a clean visual prompt for image generation with a selling focus.
@@ -31,6 +60,8 @@ def enhance_prompt_for_image(text: str, product_name: str = None, product_price:
         model="gemini-2.0-flash-exp",
         temperature=0.7,
         google_api_key=os.getenv("GOOGLE_API_KEY"),
+        callbacks=usage_callbacks("image_prompt"),
+        timeout=budget_timeout("gemini"),
     )
 
     selling_focus = ""
@@ -61,24 +92,70 @@ Return ONLY the clean image prompt. No explanations.
 """
 
     try:
-        response = llm.invoke(prompt)
-        visual_prompt = response.strip()
-
-        # Additional cleanup
-        visual_prompt = re.sub(r"[*#@\[\]{}()\'\"\\]", "", visual_prompt)
-        visual_prompt = re.sub(r"\s+", " ", visual_prompt).strip()
+        get_governor().acquire_sync("gemini-2.0-flash-exp")
+        response = recorded("gemini", "image_prompt", llm.invoke)(prompt)
+        visual_prompt = clean_image_prompt(response)
 
         logger.info("Enhanced prompt: %s", visual_prompt)
         return visual_prompt
 
     except Exception as e:
         logger.exception("Error enhancing prompt: %s", e)
-        # Fallback: basic cleanup
-        fallback = re.sub(r"[*#@\[\]{}()\'\"\\]", "", text)
-        fallback = re.sub(r"\s+", " ", fallback).strip()
-        fallback_prompt = f"Modern AI and credit repair tech image: {fallback[:150]}"
-        if product_name:
-            fallback_prompt += f" Featuring '{product_name}'."
-        if product_price:
-            fallback_prompt += f" Price: {product_price}."
-        return fallback_prompt
\ No newline at end of file
+        return fallback_image_prompt(text, product_name, product_price)
+
+
+@timed("image_generation")
+def generate_image(text: str, unique_id, directory: str = "temp_images", product_name: str = None,
+                   image_prompt: str = None) -> str:
+    """Generate an image for a tweet (or theme) with Gemini and save it locally.
+
+    Args:
+        text: Tweet text or theme description to illustrate.
+        unique_id: Id used in the file name, ``generated_<unique_id>.png``.
+        directory: Directory to save the image in.
+        product_name: Optional product to highlight.
+        image_prompt: Ready image prompt, e.g. from the post's creative
+            brief. Derived from ``text`` with an extra LLM call if omitted.
+
+    Returns:
+        Absolute path of the saved image, or None if Gemini returned no image.
+    """
+    image_prompt = image_prompt or enhance_prompt_for_image(text, product_name=product_name)
+    logger.info(f"Generated image prompt: {image_prompt}")
+
+    # Generate image using Google Gemini
+    image_llm = ChatGoogleGenerativeAI(
+        model=IMAGE_MODEL,
+        callbacks=usage_callbacks("image_generation"),
+        rate_limiter=GovernedRateLimiter(IMAGE_MODEL),
+        timeout=budget_timeout("gemini"),
+    )
+    message = {
+        "role": "user",
+        "content": image_prompt,
+    }
+    response = resilience.call(
+        "gemini", recorded("gemini", "image", image_llm.invoke), [message], response_modalities=[Modality.TEXT, Modality.IMAGE]
+    )
+
+    # Extract image base64
+    image_base64 = None
+    for block in response.content:
+        if isinstance(block, dict) and block.get("image_url"):
+            image_url = block["image_url"]["url"]
+            if image_url.startswith("data:image"):
+                image_base64 = image_url.split(",")[-1]
+                break
+
+    if not image_base64:
+        return None
+
+    # Decode and save image
+    image_data = base64.b64decode(image_base64)
+    temp_dir = Path(directory)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    image_path = os.path.abspath(str(temp_dir / f"generated_{unique_id}.png"))
+    with open(image_path, "wb") as f:
+        f.write(image_data)
+    logger.info(f"Saved generated image to {image_path}")
+    return image_path
@@ -0,0 +1,189 @@
+"""Durable ledger of posting pipeline steps.
+
+Every post runs under an idempotency key. Each side-effecting step (image,
+media upload, video, uploads, tweet, reply) records its output under that
+key in SQLite (WAL mode). A run interrupted by a crash is resumed with the
+same key: completed steps are read back from the ledger instead of being
+repeated.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LEDGER_DB = os.getenv("POST_LEDGER_DB", "post_ledger.db")
+
+
+class PostRun:
+    """Steps of one post, bound to its idempotency key."""
+
+    def __init__(self, ledger: "PostLedger", key: str):
+        """Bind ``ledger`` to the post ``key``."""
+        self.ledger = ledger
+        self.key = key
+
+    def get(self, step: str):
+        """Get the recorded output of a step, or None if it has not completed."""
+        return self.ledger.get_step(self.key, step)
+
+    def record(self, step: str, output) -> None:
+        """Record a completed step."""
+        self.ledger.record_step(self.key, step, output)
+
+    def finish(self, status: str = "done") -> None:
+        """Mark the post finished so it is not resumed again."""
+        self.ledger.set_status(self.key, status)
+
+
+class PostLedger:
+    """SQLite-backed store of posts and their completed steps."""
+
+    def __init__(self, path: str = LEDGER_DB):
+        """Open (creating if needed) the ledger database at ``path``."""
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS posts (
+                    key TEXT PRIMARY KEY, account TEXT, query TEXT,
+                    status TEXT NOT NULL DEFAULT 'in_progress',
+                    created REAL NOT NULL, updated REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS steps (
+                    key TEXT NOT NULL, step TEXT NOT NULL, output TEXT NOT NULL,
+                    created REAL NOT NULL, PRIMARY KEY (key, step)
+                );
+                CREATE INDEX IF NOT EXISTS posts_status ON posts (status, account, updated);
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(posts)")}
+            if "resumes" not in columns:
+                conn.execute("ALTER TABLE posts ADD COLUMN resumes INTEGER NOT NULL DEFAULT 0")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def start(self, key: str, account: str = None, query: str = None) -> PostRun:
+        """Register a post (no-op if the key exists) and return its run."""
+        now = time.time()
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO posts (key, account, query, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (key, account, query, now, now),
+            )
+        if cursor.rowcount == 0:
+            logger.info(f"Resuming post {key}")
+        return PostRun(self, key)
+
+    def get_step(self, key: str, step: str):
+        """Get the recorded output of a step, or None."""
+        row = self._conn().execute(
+            "SELECT output FROM steps WHERE key = ? AND step = ?", (key, step)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record_step(self, key: str, step: str, output) -> None:
+        """Record a completed step's output."""
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO steps (key, step, output, created) VALUES (?, ?, ?, ?)",
+                (key, step, json.dumps(output, default=str), now),
+            )
+            conn.execute("UPDATE posts SET updated = ? WHERE key = ?", (now, key))
+
+    def set_status(self, key: str, status: str) -> None:
+        """Set a post's status (``in_progress``, ``done``, ``partial``, ``failed`` or ``duplicate``).
+
+        ``partial`` posts were posted, but optional stages were skipped to meet
+        the run's deadline; like ``in_progress`` ones, they are resumed.
+        """
+        with self._conn() as conn:
+            conn.execute("UPDATE posts SET status = ?, updated = ? WHERE key = ?", (status, time.time(), key))
+
+    def record_resume(self, key: str) -> int:
+        """Count a resume of a post, which also restarts its ``stale_after`` clock.
+
+        Returns:
+            How many times the post has been resumed, including this one.
+        """
+        with self._conn() as conn:
+            conn.execute("UPDATE posts SET resumes = resumes + 1, updated = ? WHERE key = ?", (time.time(), key))
+            row = conn.execute("SELECT resumes FROM posts WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def step_outputs(self, step: str, account: str = None, with_step: str = None) -> list:
+        """List the recorded outputs of one step across posts, oldest first.
+
+        With ``with_step``, only posts that also recorded that step are
+        listed, whatever their status.
+        """
+        sql = "SELECT s.output FROM steps s JOIN posts p ON p.key = s.key WHERE s.step = ?"
+        args = [step]
+        if account is not None:
+            sql += " AND p.account = ?"
+            args.append(account)
+        if with_step is not None:
+            sql += " AND EXISTS (SELECT 1 FROM steps w WHERE w.key = s.key AND w.step = ?)"
+            args.append(with_step)
+        rows = self._conn().execute(sql + " ORDER BY p.created", args).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def incomplete_posts(self, account: str = None, stale_after: float = 0, max_resumes: int = None,
+                         max_age: float = None) -> list:
+        """List in-progress and partial posts not updated for ``stale_after`` seconds, oldest first.
+
+        Posts already resumed ``max_resumes`` times, or created more than
+        ``max_age`` seconds ago, are closed instead of listed, so a post that
+        keeps failing can't take every scheduled slot: in-progress ones are
+        marked ``failed``, and partial ones (already posted) ``done``, keeping
+        the stages they skipped in their ``degraded`` step.
+        """
+        now = time.time()
+        scope, scope_args = ("", []) if account is None else (" AND account = ?", [account])
+        limits, limit_args = [], []
+        if max_resumes is not None:
+            limits.append("resumes >= ?")
+            limit_args.append(max_resumes)
+        if max_age is not None:
+            limits.append("created < ?")
+            limit_args.append(now - max_age)
+        if limits:
+            with self._conn() as conn:
+                given_up = conn.execute(
+                    "UPDATE posts SET status = CASE status WHEN 'partial' THEN 'done' ELSE 'failed' END, updated = ? "
+                    f"WHERE status IN ('in_progress', 'partial') AND ({' OR '.join(limits)})" + scope,
+                    [now] + limit_args + scope_args,
+                ).rowcount
+            if given_up:
+                logger.warning(f"Gave up on {given_up} post(s) past their resume limits")
+        sql = ("SELECT key, account, query, created, status, resumes FROM posts "
+               "WHERE status IN ('in_progress', 'partial') AND updated <= ?" + scope)
+        rows = self._conn().execute(sql + " ORDER BY created", [now - stale_after] + scope_args).fetchall()
+        return [
+            {"key": r[0], "account": r[1], "query": r[2], "created": r[3], "status": r[4], "resumes": r[5]}
+            for r in rows
+        ]
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> PostLedger:
+    """Get the process-wide post ledger."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = PostLedger(LEDGER_DB)
+        return _ledger
@@ -1,39 +1,126 @@
-"""UGC-style marketing prompt for AI agent."""
+"""UGC-style marketing prompt for AI agent.
 
+The prompt is compiled once per version of ``marketing_config.json`` and
+cached. Each access only stats the file, so config edits are picked up
+without a restart while steady-state access stays cheap.
+"""
+
+import copy
+import hashlib
 import json
-import random
+import logging
+import os
+import threading
+from dataclasses import dataclass, replace
 from pathlib import Path
 
-def load_marketing_config():
-    """Load marketing configuration."""
-    config_path = Path(__file__).parent.parent.parent / "marketing_config.json"
-    with open(config_path, 'r') as f:
-        return json.load(f)
+logger = logging.getLogger(__name__)
 
-def get_marketing_prompt():
-    """Generate UGC-style conversational prompt."""
-    config = load_marketing_config()
-    
-    products_list = "\n".join([
-        f"- {p['name']}: {p['description']} → {p['url']}"
-        for p in config['products']
-    ])
-    
-    all_links = "\n".join([f"- {name}: {url}" for name, url in config['links'].items()])
-    
-    prompt = f"""Yo! You're a real person running social media for {config['company']['name']}.
+CONFIG_PATH = Path(__file__).parent.parent.parent / "marketing_config.json"
+
+# Keys the prompt template reads, as (section, key) paths
+REQUIRED_FIELDS = [
+    ("company", "name"),
+    ("company", "description"),
+    ("content_strategy", "tone"),
+    ("content_strategy", "style"),
+    ("content_strategy", "post_types"),
+    ("content_strategy", "emojis"),
+    ("target_audience", "primary"),
+    ("target_audience", "pain_points"),
+]
+REQUIRED_LISTS = ["products", "value_propositions", "call_to_actions"]
+REQUIRED_PRODUCT_FIELDS = ["name", "description", "url", "hashtags"]
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """Marketing prompt compiled from one version of the config file."""
+
+    path: str
+    mtime_ns: int
+    size: int
+    content_hash: str
+    config: dict
+    sections: dict  # section name -> rendered text
+    product_fragments: dict  # product name -> rendered product line
+    text: str
+
+
+_compiled = {}  # resolved config path -> CompiledPrompt
+_failed = {}  # resolved config path -> (mtime_ns, size, content hash) of a version that failed to compile
+_lock = threading.Lock()
+
+
+def validate_marketing_config(config: dict) -> list:
+    """Check that a marketing config has everything the prompt needs.
+
+    Args:
+        config: Parsed marketing config.
+
+    Returns:
+        List of problems; empty when the config is valid.
+    """
+    errors = []
+    if not isinstance(config, dict):
+        return ["config must be a JSON object"]
+    for section, key in REQUIRED_FIELDS:
+        if key not in (config.get(section) or {}):
+            errors.append(f"missing '{section}.{key}'")
+    for key in REQUIRED_LISTS:
+        if not isinstance(config.get(key), list):
+            errors.append(f"'{key}' must be a list")
+    if not isinstance(config.get("links"), dict):
+        errors.append("'links' must be an object")
+    for i, product in enumerate(config.get("products") or []):
+        for key in REQUIRED_PRODUCT_FIELDS:
+            if key not in product:
+                errors.append(f"product {i} is missing '{key}'")
+    return errors
+
+
+def _bullets(items) -> str:
+    return "\n".join([f"- {item}" for item in items])
+
+
+def compile_marketing_prompt(config: dict) -> tuple:
+    """Render the prompt sections, per-product fragments and full prompt text.
+
+    Args:
+        config: Parsed marketing config.
+
+    Returns:
+        Tuple of ``(sections, product_fragments, text)``.
+    """
+    product_fragments = {
+        p["name"]: f"- {p['name']}: {p['description']} → {p['url']}"
+        for p in config["products"]
+    }
+    strategy = config["content_strategy"]
+    sections = {
+        "products": "\n".join(product_fragments.values()),
+        "links": "\n".join([f"- {name}: {url}" for name, url in config["links"].items()]),
+        "pain_points": _bullets(config["target_audience"]["pain_points"]),
+        "value_propositions": _bullets(config["value_propositions"]),
+        "post_types": _bullets(strategy["post_types"]),
+        "emojis": " ".join(strategy["emojis"]),
+        "hashtags": " ".join([h for p in config["products"] for h in p["hashtags"][:2]]),
+        "call_to_actions": _bullets(config["call_to_actions"]),
+    }
+
+    text = f"""Yo! You're a real person running social media for {config['company']['name']}.
 
 {config['company']['description']}
 
 🎯 WHAT YOU'RE PROMOTING:
-{products_list}
+{sections['products']}
 
 🔗 OTHER IMPORTANT LINKS:
-{all_links}
+{sections['links']}
 
 💬 HOW YOU TALK:
-{config['content_strategy']['tone']}
-{config['content_strategy']['style']}
+{strategy['tone']}
+{strategy['style']}
 
 Think like you're making a TikTok or Instagram story - casual, authentic, no corporate speak.
 
@@ -48,27 +135,27 @@ Examples of your vibe:
 {config['target_audience']['primary']}
 
 Their problems:
-{chr(10).join([f"- {pp}" for pp in config['target_audience']['pain_points']])}
+{sections['pain_points']}
 
 💡 WHAT YOU OFFER:
-{chr(10).join([f"- {vp}" for vp in config['value_propositions']])}
+{sections['value_propositions']}
 
 📝 POST TYPES (rotate these):
-{chr(10).join([f"- {pt}" for pt in config['content_strategy']['post_types']])}
+{sections['post_types']}
 
 🎨 CONTENT RULES:
 1. Talk like a real person, not a brand
-2. Use emojis naturally: {' '.join(config['content_strategy']['emojis'])}
+2. Use emojis naturally: {sections['emojis']}
 3. Keep it under 280 characters
 4. ALWAYS include a link (rotate between products and other links)
-5. Use hashtags sparingly (1-2 max): {' '.join([h for p in config['products'] for h in p['hashtags'][:2]])}
+5. Use hashtags sparingly (1-2 max): {sections['hashtags']}
 6. Ask questions to get engagement
 7. Share real experiences and tips
 8. Reply to your own tweets with extra value or a link
 9. POST AUTONOMOUSLY - don't ask for permission, just do it
 
 💬 CALL-TO-ACTIONS (use these naturally):
-{chr(10).join([f"- {cta}" for cta in config['call_to_actions']])}
+{sections['call_to_actions']}
 
 🔄 POST ROTATION:
 Mix it up! Don't just promote - educate, engage, entertain.
@@ -81,5 +168,91 @@ Mix it up! Don't just promote - educate, engage, entertain.
 - Questions to spark conversation
 
 IMPORTANT: You run AUTONOMOUSLY. When asked to post, just post it. No asking for permission, no confirmation needed. You're in charge of this account and you know what to do. Be authentic, be helpful, be real. 💯"""
-    
-    return prompt
+
+    return sections, product_fragments, text
+
+
+def get_compiled_prompt(config_path=None, validate: bool = True) -> CompiledPrompt:
+    """Get the compiled prompt for a config file, recompiling only when it changed.
+
+    A file whose mtime changed but whose content hash did not is not
+    recompiled. When a reloaded config fails validation the previously
+    compiled prompt keeps being served, and the failed version is not
+    re-read until the file changes again.
+
+    Args:
+        config_path: Marketing config file. Defaults to ``marketing_config.json``.
+        validate: Whether to validate the config before compiling it.
+
+    Returns:
+        The compiled prompt for the current version of the file.
+    """
+    path = os.path.abspath(config_path or CONFIG_PATH)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _compiled.get(path)
+    if cached and (version == (cached.mtime_ns, cached.size) or version == _failed.get(path, ())[:2]):
+        return cached
+
+    with _lock:
+        cached = _compiled.get(path)
+        if cached and (version == (cached.mtime_ns, cached.size) or version == _failed.get(path, ())[:2]):
+            return cached
+
+        raw = Path(path).read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        if cached and cached.content_hash == digest:
+            cached = replace(cached, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            _compiled[path] = cached
+            _failed.pop(path, None)
+            return cached
+        if cached and path in _failed and _failed[path][2] == digest:
+            _failed[path] = (*version, digest)  # Touched, still the same broken content
+            return cached
+
+        try:
+            config = json.loads(raw)
+            errors = validate_marketing_config(config) if validate else []
+            if errors:
+                raise ValueError(f"Invalid marketing config {path}: {'; '.join(errors)}")
+            sections, product_fragments, text = compile_marketing_prompt(config)
+        except Exception as e:
+            if not cached:
+                raise
+            logger.error(f"Keeping previous marketing prompt, reload failed: {e}")
+            _failed[path] = (*version, digest)
+            return cached
+
+        compiled = CompiledPrompt(
+            path=path,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            content_hash=digest,
+            config=config,
+            sections=sections,
+            product_fragments=product_fragments,
+            text=text,
+        )
+        _compiled[path] = compiled
+        _failed.pop(path, None)
+        logger.info(f"Compiled marketing prompt from {path} ({digest[:12]})")
+        return compiled
+
+
+def load_marketing_config(config_path=None):
+    """Load marketing configuration.
+
+    Returns a copy, so callers can't change the config the cached prompt was
+    compiled from.
+    """
+    return copy.deepcopy(get_compiled_prompt(config_path).config)
+
+
+def get_marketing_prompt(config_path=None):
+    """Generate UGC-style conversational prompt."""
+    return get_compiled_prompt(config_path).text
+
+
+def get_product_fragment(product_name: str, config_path=None) -> str:
+    """Get the prompt line describing a single product, or an empty string."""
+    return get_compiled_prompt(config_path).product_fragments.get(product_name, "")
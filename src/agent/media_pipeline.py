@@ -0,0 +1,145 @@
+"""Video stage of the posting pipeline.
+
+Turns a posted tweet and its image into a video and distributes it. Runs
+inline from ``call_model`` (within the run's deadline, see ``deadline.py``)
+or, with ``MEDIA_WORK_QUEUE`` enabled, as a leased work item picked up by
+any worker sharing the coordination store.
+"""
+
+import logging
+import os
+
+from . import deadline
+from .accounts import Account, get_account
+from .coordination import MEDIA_QUEUE, get_lease_store
+from .creative_brief import get_post_brief
+from .distribution import VIDEO_PLATFORMS, distribute_video, platform_metadata
+from .ledger import PostRun
+from .media_optimizer import hash_file, optimize_image_sync
+from .metrics import timed
+from .video_agent import generate_video_from_tweet
+from .youtube_metadata_agent import generate_youtube_metadata
+
+logger = logging.getLogger(__name__)
+
+MEDIA_WORK_QUEUE = os.getenv("MEDIA_WORK_QUEUE", "").lower() in ("1", "true", "yes")
+
+
+def _no_progress(event: str, **data) -> None:
+    pass
+
+
+@timed("video_assets")
+def produce_video_assets(tweet_text: str, image_path: str, account: Account = None, run: PostRun = None,
+                         progress=None) -> dict:
+    """Generate a video from a tweet and its image, then upload it.
+
+    Args:
+        tweet_text: Posted tweet text.
+        image_path: Image generated for the tweet.
+        account: Account to upload for. Defaults to the default account.
+        run: Ledger run of the post. Steps it already recorded (creative
+            brief, video and one per upload target, e.g. youtube or drive)
+            are reused instead of repeated.
+        progress: ``progress(event, **data)`` callback for ``video_ready``,
+            ``video_failed``, ``video_skipped`` and ``upload_done`` events. ``upload_done`` is
+            sent from the upload threads, once per target as it finishes.
+
+    Returns:
+        Dict with ``video_path`` (None if generation failed or was skipped
+        for the run's deadline),
+        ``thumbnail_path``, per-target ``uploads`` results (see
+        ``distribution.distribute_video``) and ``distribution_seconds``.
+    """
+    account = account or get_account()
+    progress = progress or _no_progress
+    result = {"video_path": None, "thumbnail_path": None, "uploads": {}, "distribution_seconds": 0.0}
+
+    video = run.get("video") if run else None
+    if video and not os.path.exists(video["video_path"]):
+        video = None
+    metadata = run.get("video_metadata") if run else None
+    # One LLM call for the video prompt, title and captions (shared with the image stage)
+    brief = run.get("brief") if run else None
+    if brief is None and (video is None or metadata is None):
+        brief = get_post_brief(tweet_text, run)
+    brief = brief or {}
+
+    if video:
+        video_path = video["video_path"]
+        result["thumbnail_path"] = video.get("thumbnail_path")
+    elif not deadline.allows("video_generation", "video"):
+        progress("video_skipped")
+        return result
+    else:
+        source = optimize_image_sync(image_path, "video_source")["path"] if image_path else None
+        video_path = generate_video_from_tweet(tweet_text, source, brief.get("video_prompt"))
+        if not video_path:
+            progress("video_failed")
+            return result
+        logger.info(f"Video generated: {video_path}")
+        if image_path:
+            thumbnail = optimize_image_sync(image_path, "youtube_thumbnail")
+            result["thumbnail_path"] = thumbnail["path"] if thumbnail["optimized"] else None
+        if run:
+            run.record("video", {
+                "video_path": video_path,
+                "sha256": hash_file(video_path),
+                "bytes": os.path.getsize(video_path),
+                "thumbnail_path": result["thumbnail_path"],
+            })
+    result["video_path"] = video_path
+    progress("video_ready", video_path=video_path)
+
+    # Generate YouTube metadata
+    if metadata is None:
+        try:
+            metadata = generate_youtube_metadata(tweet_text, brief.get("youtube_title"))
+            if run:
+                run.record("video_metadata", metadata)
+        except Exception as meta_e:
+            logger.warning(f"Metadata generation failed: {meta_e}")
+            metadata = {"title": "Santa Spot Video", "description": tweet_text}
+
+    # Upload everywhere at once, skipping targets a resumed run already reached
+    metadata = platform_metadata(metadata["title"], metadata["description"], tweet_text, brief.get("captions"))
+    targets = VIDEO_PLATFORMS + ["drive"]
+    done = {t: run.get(t) for t in targets} if run else {}
+    result["uploads"] = {t: r for t, r in done.items() if r is not None}
+
+    def on_result(target, upload):
+        if upload["success"]:
+            logger.info(f"Video uploaded to {target} in {upload['seconds']:.1f}s")
+            if run:
+                run.record(target, upload)
+        progress("upload_done", target=target, success=upload["success"])
+
+    pending = [t for t in targets if t not in result["uploads"]]
+    if pending:
+        distribution = distribute_video(video_path, metadata, account, pending, on_result)
+        result["uploads"].update(distribution["results"])
+        result["distribution_seconds"] = distribution["seconds"]
+
+    return result
+
+
+def enqueue_video_assets(key: str, tweet_text: str, image_path: str, account: Account) -> bool:
+    """Queue the video stage as a leased work item for any worker to run.
+
+    ``key`` is the post's ledger key. ``image_path`` (and the post ledger,
+    to resume partially done items) must be on storage shared by the workers.
+
+    Returns:
+        True if the queue owns the work (including when ``key`` was already
+        queued); False if the queue is disabled and the caller should run
+        the stage inline.
+    """
+    store = get_lease_store()
+    if not MEDIA_WORK_QUEUE or store is None:
+        return False
+    payload = {"tweet_text": tweet_text, "image_path": image_path, "account": account.name, "post_key": key}
+    if store.enqueue(MEDIA_QUEUE, key, payload):
+        logger.info(f"Queued video work item {key}")
+    else:
+        logger.info(f"Video work item {key} is already queued")
+    return True
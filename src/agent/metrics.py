@@ -0,0 +1,346 @@
+"""In-process metrics with a Prometheus text-format endpoint.
+
+Counters and histograms aggregate per thread: each thread updates its own
+shard without taking a lock, and shards are only merged when ``/metrics`` is
+scraped. When a thread exits, its shard is folded into a shared base shard,
+so thread-pool churn does not grow the scrape cost. Gauges hold a single
+last-set value, or are computed at scrape time from a callback.
+
+``start_metrics_server`` serves ``/metrics`` from a daemon thread for the
+scheduler; the LangGraph app serves the same registry from ``webapp.py``.
+"""
+
+import asyncio
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+METRICS_ADDR = os.getenv("METRICS_ADDR", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))  # 0 disables the server
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans Composio calls (~0.1s) up to Veo generations (minutes)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Registry:
+    """Set of metrics rendered together."""
+
+    def __init__(self):
+        """Create an empty registry."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric) -> None:
+        """Add a metric, raising ``ValueError`` if its name is taken."""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _ShardOwner:
+    """Thread-local marker collected when its thread exits."""
+
+    __slots__ = ("__weakref__",)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._shards = []  # One dict per live thread: label values -> value
+        self._base = {}  # Shards of exited threads, folded together
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            # Thread-local values are dropped when the thread exits
+            self._local.owner = _ShardOwner()
+            weakref.finalize(self._local.owner, self._retire, shard)
+        return shard
+
+    def _retire(self, shard: dict) -> None:
+        with self._lock:
+            self._shards = [s for s in self._shards if s is not shard]
+            for key, value in shard.items():
+                self._base[key] = self._add(self._base.get(key), value)
+
+    @staticmethod
+    def _add(total, value):
+        return value if total is None else total + value
+
+    def _snapshots(self) -> list:
+        with self._lock:
+            shards = [self._base] + self._shards
+            return [dict(shard) for shard in shards]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Add ``amount`` to the count of a label set."""
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Get the total count of a label set."""
+        key = self._key(labels)
+        return sum(snapshot.get(key, 0) for snapshot in self._snapshots())
+
+    def samples(self) -> list:
+        """Render the metric's lines in the text exposition format."""
+        totals = {}
+        for snapshot in self._snapshots():
+            for key, value in snapshot.items():
+                totals[key] = totals.get(key, 0) + value
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in sorted(totals.items())]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS,
+                 registry: Registry = REGISTRY):
+        """Create a histogram with upper bounds ``buckets`` (an implicit +Inf bucket is added)."""
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    @staticmethod
+    def _add(total, value):
+        return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+    def observe(self, value: float, **labels) -> None:
+        """Count ``value`` in its bucket for a label set."""
+        shard = self._shard()
+        key = self._key(labels)
+        data = shard.get(key)
+        # Per-bucket counts (last is +Inf), then sum and count
+        data = [0] * (len(self.buckets) + 1) + [0.0, 0] if data is None else data.copy()
+        data[bisect.bisect_left(self.buckets, value)] += 1
+        data[-2] += value
+        data[-1] += 1
+        # Swapped in whole: a scrape copying the shard never sees a half-applied observation
+        shard[key] = data
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def merged(self, **labels) -> list:
+        """Get merged ``[bucket counts..., sum, count]`` for one label set."""
+        return self._merge(self._key(labels))
+
+    def quantile(self, q: float, **labels) -> float:
+        """Estimate the ``q`` quantile (0-1) of one label set from its buckets.
+
+        Interpolates within the bucket holding the quantile, like Prometheus'
+        ``histogram_quantile``; values past the last bucket count as its bound.
+
+        Returns:
+            The estimate, or None if nothing was observed.
+        """
+        data = self.merged(**labels)
+        count = data[-1]
+        if not count:
+            return None
+        rank = q * count
+        cumulative, lower = 0, 0.0
+        for bound, observed in zip(self.buckets, data):
+            if observed and cumulative + observed >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / observed
+            cumulative += observed
+            lower = bound
+        return self.buckets[-1]
+
+    def totals(self) -> dict:
+        """Get ``(sum, count)`` of every label set, keyed by label-value tuple."""
+        keys = {key for snapshot in self._snapshots() for key in snapshot}
+        return {key: tuple(self._merge(key)[-2:]) for key in keys}
+
+    def _merge(self, key: tuple) -> list:
+        total = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        for snapshot in self._snapshots():
+            data = snapshot.get(key)
+            if data is not None:
+                total = [a + b for a, b in zip(total, list(data))]
+        return total
+
+    def samples(self) -> list:
+        """Render the metric's lines in the text exposition format."""
+        keys = sorted({key for snapshot in self._snapshots() for key in snapshot})
+        lines = []
+        for key in keys:
+            data = self._merge(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), data):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {data[-1]}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that goes up and down.
+
+    With ``func``, values are read at scrape time from ``func()``, a dict of
+    label-value tuples to values.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), func=None, registry: Registry = REGISTRY):
+        """Create a gauge, computed at scrape time when ``func`` is given."""
+        super().__init__(name, help, labelnames, registry)
+        self.func = func
+        self._values = {}
+
+    def set(self, value: float, **labels) -> None:
+        """Set the value of a label set."""
+        self._values[self._key(labels)] = value
+
+    def samples(self) -> list:
+        """Render the metric's lines in the text exposition format."""
+        values = dict(self._values)
+        if self.func is not None:
+            try:
+                values.update(self.func())
+            except Exception as e:
+                logger.warning(f"Gauge {self.name} callback failed: {e}")
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in sorted(values.items())]
+
+
+STAGE_SECONDS = Histogram("agent_stage_seconds", "Latency of pipeline stages and sub-agent calls.", ("stage",))
+STAGE_ERRORS = Counter("agent_stage_errors_total", "Pipeline stages and sub-agent calls that raised.", ("stage",))
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time a block as ``stage``, counting it as an error if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+def timed(stage: str):
+    """Decorate a sync or async function to time it as ``stage``."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the logs
+
+
+def start_metrics_server(port: int = METRICS_PORT, addr: str = METRICS_ADDR) -> ThreadingHTTPServer:
+    """Serve ``/metrics`` from a daemon thread.
+
+    Returns:
+        The server, or None if disabled (port 0) or the port is taken.
+    """
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Metrics server not started on {addr}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on http://{addr}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,223 @@
+"""BM25 retrieval index over scraped product content.
+
+Selects the few product snippets relevant to a tweet or query instead of
+dumping every scraped page into the system prompt.
+"""
+
+import hashlib
+import logging
+import math
+import re
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or our "
+    "that the this to was we what when with you your".split()
+)
+
+
+def tokenize(text: str) -> list:
+    """Lowercase text and split it into index terms, dropping stopwords."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def chunk_markdown(markdown: str, max_chars: int = 600) -> list:
+    """Split markdown into paragraph-sized chunks of at most ``max_chars``.
+
+    Args:
+        markdown: Scraped page content.
+        max_chars: Upper bound on the size of a merged chunk.
+
+    Returns:
+        List of chunk strings.
+    """
+    chunks = []
+    current = ""
+    for block in re.split(r"\n\s*\n", markdown):
+        block = block.strip()
+        if not block:
+            continue
+        while len(block) > max_chars:
+            cut = block.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(block[:cut].strip())
+            block = block[cut:].strip()
+        if current and len(current) + len(block) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{block}" if current else block
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def content_hash(info: dict) -> str:
+    """Hash the indexed fields of a scraped page."""
+    digest = hashlib.sha256()
+    for field in ("title", "description", "content"):
+        digest.update((info.get(field) or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ProductIndex:
+    """Incremental BM25 index over scraped product pages.
+
+    Pages are re-chunked and re-indexed only when their content hash changes.
+    Snippets from pages whose product keywords appear in the query get a score
+    boost.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, keyword_boost: float = 0.5):
+        """Create an empty index with BM25 parameters ``k1`` and ``b``."""
+        self.k1 = k1
+        self.b = b
+        self.keyword_boost = keyword_boost
+        self._lock = threading.Lock()
+        self._pages = {}  # url -> {"hash": str, "chunk_ids": list}
+        self._chunks = {}  # chunk_id -> {"url", "text", "tf", "length"}
+        self._df = Counter()
+        self._total_length = 0
+        self._next_id = 0
+        self._keywords = {}  # url -> list of keyword phrases
+        self.version = 0  # Bumped whenever search results may change
+
+    def __len__(self) -> int:
+        """Get the number of indexed chunks."""
+        return len(self._chunks)
+
+    def set_keywords(self, keywords_by_url: dict) -> None:
+        """Set the boosting keyword phrases for each product URL."""
+        keywords = {
+            url.rstrip("/"): [k.lower() for k in keywords]
+            for url, keywords in keywords_by_url.items()
+        }
+        with self._lock:
+            if keywords != self._keywords:
+                self._keywords = keywords
+                self.version += 1
+
+    def keyword_query(self) -> str:
+        """Build a query from every product keyword, for when no tweet is given."""
+        with self._lock:
+            return " ".join(k for keywords in self._keywords.values() for k in keywords)
+
+    def update(self, pages: dict) -> int:
+        """Sync the index with a ``{url: {"title", "description", "content"}}`` mapping.
+
+        Args:
+            pages: Scraped product data as returned by ``scrape_product_data``.
+
+        Returns:
+            Number of pages (re)indexed.
+        """
+        reindexed = removed = 0
+        with self._lock:
+            for url in list(self._pages):
+                if url not in pages:
+                    self._remove_page(url)
+                    removed += 1
+            for url, info in pages.items():
+                digest = content_hash(info)
+                page = self._pages.get(url)
+                if page and page["hash"] == digest:
+                    continue
+                if page:
+                    self._remove_page(url)
+                self._add_page(url, info, digest)
+                reindexed += 1
+            if reindexed or removed:
+                self.version += 1
+        if reindexed:
+            logger.info(f"Indexed {reindexed} product page(s), {len(self._chunks)} snippets total")
+        return reindexed
+
+    def search(self, query: str, top_k: int = 5, token_budget: int = 400) -> list:
+        """Return the most relevant snippets for ``query`` within a token budget.
+
+        Args:
+            query: Tweet text or free-form query.
+            top_k: Maximum number of snippets to return.
+            token_budget: Maximum estimated tokens across returned snippets.
+
+        Returns:
+            List of ``{"url", "text", "score"}`` dicts, best first.
+        """
+        terms = Counter(tokenize(query))
+        if not terms:
+            return []
+        query_lower = query.lower()
+        with self._lock:
+            if not self._chunks:
+                return []
+            n_chunks = len(self._chunks)
+            avg_length = self._total_length / n_chunks
+            scored = []
+            for chunk_id, chunk in self._chunks.items():
+                score = 0.0
+                for term, q_count in terms.items():
+                    tf = chunk["tf"].get(term)
+                    if not tf:
+                        continue
+                    df = self._df[term]
+                    idf = math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+                    norm = 1 - self.b + self.b * chunk["length"] / avg_length
+                    score += q_count * idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                if score <= 0:
+                    continue
+                keywords = self._keywords.get(chunk["url"].rstrip("/"), [])
+                hits = sum(1 for k in keywords if k in query_lower)
+                if hits:
+                    score *= 1 + self.keyword_boost * hits
+                scored.append((score, chunk_id))
+            scored.sort(reverse=True)
+
+            results = []
+            used = 0
+            for score, chunk_id in scored:
+                if len(results) >= top_k:
+                    break
+                chunk = self._chunks[chunk_id]
+                cost = estimate_tokens(chunk["text"])
+                if used + cost > token_budget:
+                    continue
+                used += cost
+                results.append({"url": chunk["url"], "text": chunk["text"], "score": score})
+            return results
+
+    def _add_page(self, url: str, info: dict, digest: str) -> None:
+        header = " - ".join(p for p in (info.get("title"), info.get("description")) if p)
+        texts = ([header] if header else []) + chunk_markdown(info.get("content") or "")
+        chunk_ids = []
+        for text in texts:
+            terms = tokenize(text)
+            if not terms:
+                continue
+            tf = Counter(terms)
+            chunk_id = self._next_id
+            self._next_id += 1
+            self._chunks[chunk_id] = {"url": url, "text": text, "tf": tf, "length": len(terms)}
+            self._df.update(tf.keys())
+            self._total_length += len(terms)
+            chunk_ids.append(chunk_id)
+        self._pages[url] = {"hash": digest, "chunk_ids": chunk_ids}
+
+    def _remove_page(self, url: str) -> None:
+        page = self._pages.pop(url)
+        for chunk_id in page["chunk_ids"]:
+            chunk = self._chunks.pop(chunk_id)
+            self._df.subtract(chunk["tf"].keys())
+            self._total_length -= chunk["length"]
+        self._df += Counter()  # drop zero counts
@@ -0,0 +1,83 @@
+"""Opt-in CPU profiling of graph invocations and scheduler jobs.
+
+Set ``AGENT_PROFILE`` to ``graph`` (or ``1``), ``jobs`` or ``all``, or pass
+``"profile": True`` in the graph ``Context``, to run under cProfile. Each
+run writes ``<PROFILE_DIR>/<timestamp>-<tag>-<id>.pstats``, tagged with the
+intent (e.g. ``post``) or ``job-<name>``. Inspect it with
+``python -m pstats``, snakeviz, or flameprof for a flamegraph SVG. When
+profiling is off, nothing is wrapped.
+
+cProfile follows the thread it was started on. For a graph run that is the
+event loop thread: other runs on the same loop are included while it is
+active, and work done in worker threads (``asyncio.to_thread``, blocking
+calls with a timeout in ``resilience.call``) shows up only as waiting. Only
+one profile is taken at a time; runs starting while one is active are not
+profiled.
+"""
+
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODE = os.getenv("AGENT_PROFILE", "").lower()  # graph/1, jobs or all
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+
+_active = threading.Lock()
+
+
+def profiling_enabled(kind: str) -> bool:
+    """Whether ``AGENT_PROFILE`` turns on profiling of ``graph`` runs or ``jobs``."""
+    if PROFILE_MODE in ("1", "true", "yes"):
+        return kind == "graph"
+    return PROFILE_MODE in ("all", kind)
+
+
+def profile_path(tag: str, directory: Path = None) -> Path:
+    """Get a new stats file path for a run tagged ``tag``."""
+    safe_tag = re.sub(r"[^\w.-]+", "_", tag) or "run"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return Path(directory or PROFILE_DIR) / f"{stamp}-{safe_tag}-{uuid.uuid4().hex[:8]}.pstats"
+
+
+@contextmanager
+def profile_run(tag: str, directory: Path = None):
+    """Profile the ``with`` block and write its stats file.
+
+    Yields:
+        The stats file path the profile will be written to, or None if
+        another profile is already running.
+    """
+    if not _active.acquire(blocking=False):
+        logger.info(f"Not profiling {tag}: another profile is running")
+        yield None
+        return
+    path = profile_path(tag, directory)
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+    finally:
+        _active.release()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(path))
+            logger.info(f"Profiled {tag} ({time.perf_counter() - started:.2f}s wall) to {path}")
+        except OSError as e:
+            logger.warning(f"Failed to write profile for {tag}: {e}")
+
+
+def maybe_profile(tag: str, enabled: bool):
+    """``profile_run(tag)`` if ``enabled``, else a no-op context manager."""
+    return profile_run(tag) if enabled else nullcontext()
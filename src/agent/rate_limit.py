@@ -0,0 +1,369 @@
+"""Client-side rate limiting for Twitter, Composio and Gemini calls.
+
+Every outbound call takes a token from the bucket of its endpoint (a
+Composio tool slug or a model name), optionally scoped per connected
+account since provider limits are per user. Buckets shrink to what the
+provider reports in rate-limit response headers, and 429/5xx responses are
+retried with jittered exponential backoff.
+
+In ``queue`` mode (the default) callers wait for capacity; in ``fail`` mode
+they get ``RateLimitExceeded`` immediately. Limits are overridden per
+endpoint in ``rate_limits.json``:
+
+    {"TWITTER_CREATION_OF_A_POST": {"requests": 100, "per_seconds": 900}}
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from .metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITS_FILE = Path(os.getenv("RATE_LIMITS_FILE", "rate_limits.json"))
+RATE_LIMIT_MODE = os.getenv("RATE_LIMIT_MODE", "queue")  # "queue" or "fail"
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", 15 * 60))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# (requests, per_seconds). Twitter values follow the X API v2 per-user
+# 15-minute windows of the Basic tier; Gemini values the free tier RPM.
+DEFAULT_LIMITS = {
+    "default": (60, 60),
+    "TWITTER_CREATION_OF_A_POST": (100, 15 * 60),
+    "TWITTER_POST_TWEET": (100, 15 * 60),
+    "TWITTER_RETWEET_POST": (50, 15 * 60),
+    "TWITTER_USER_LIKE_POST": (50, 15 * 60),
+    "TWITTER_RECENT_SEARCH": (60, 15 * 60),
+    "TWITTER_USER_LOOKUP_ME": (75, 15 * 60),
+    "TWITTER_POST_LOOKUP_BY_POST_ID": (900, 15 * 60),
+    "TWITTER_POST_LOOKUP_BY_POST_IDS": (900, 15 * 60),
+    "TWITTER_SEND_A_NEW_MESSAGE_TO_A_DM_CONVERSATION": (15, 15 * 60),
+    "TWITTER_SEND_A_NEW_MESSAGE_TO_A_USER": (15, 15 * 60),
+    "TWITTER_UPLOAD_MEDIA": (500, 15 * 60),
+    "TWITTER_GET_MEDIA_UPLOAD_STATUS": (500, 15 * 60),
+    "gemini-2.0-flash-exp": (10, 60),
+    "gemini-2.5-flash-lite": (15, 60),
+    "models/gemini-2.5-flash-image": (10, 60),
+    "veo-3.1-generate-preview": (2, 60),
+}
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+RATE_LIMIT_WAIT = Histogram("rate_limit_wait_seconds", "Time callers waited for endpoint capacity.", ("endpoint",))
+RATE_LIMIT_RETRIES = Counter("rate_limit_retries_total", "Retried 429/5xx responses.", ("endpoint", "status"))
+
+
+class RateLimitExceeded(Exception):
+    """Raised when an endpoint has no capacity and the caller may not wait."""
+
+    def __init__(self, endpoint: str, wait: float):
+        """Create the error for ``endpoint``, which has capacity again in ``wait`` seconds."""
+        super().__init__(f"Rate limit for {endpoint} exceeded; capacity in {wait:.0f}s")
+        self.endpoint = endpoint
+        self.wait = wait
+
+
+class RetryableError(Exception):
+    """A response that failed with a retryable status (429 or 5xx)."""
+
+    def __init__(self, status: int, message: str = "", retry_after: float = None):
+        """Create the error for ``status``, with the provider's ``Retry-After`` if given."""
+        super().__init__(f"HTTP {status}: {message}" if message else f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def error_status(error: Exception) -> int:
+    """Get the HTTP status of an exception raised by a provider client, if any."""
+    for attr in ("status", "status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    if isinstance(value, int):
+        return value
+    text = f"{type(error).__name__} {error}"
+    if "ResourceExhausted" in text or "RESOURCE_EXHAUSTED" in text or re.search(r"\b429\b", text):
+        return 429
+    if "ServiceUnavailable" in text or "UNAVAILABLE" in text:
+        return 503
+    return None
+
+
+def result_status(result: dict) -> int:
+    """Get a retryable status from a failed Composio result dict, if any."""
+    if not isinstance(result, dict) or result.get("successful", True):
+        return None
+    error = str(result.get("error") or "").lower()
+    if re.search(r"\b429\b", error) or "rate limit" in error or "too many requests" in error:
+        return 429
+    match = re.search(r"\b(500|502|503|504)\b", error)
+    return int(match.group(1)) if match else None
+
+
+def _header_seconds(value: str, now: float) -> float:
+    """Parse a reset/retry header: delta seconds, epoch seconds or HTTP date."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+        except (TypeError, ValueError):
+            return None
+    return max(0.0, number - now) if number > 1e9 else number
+
+
+def parse_rate_headers(headers) -> dict:
+    """Read remaining capacity and reset delays from response headers.
+
+    Understands Twitter's ``x-rate-limit-*``, the common
+    ``x-ratelimit-*`` variants and ``Retry-After``.
+
+    Returns:
+        Dict with ``remaining``, ``reset_after`` and ``retry_after`` (each
+        None when not reported).
+    """
+    headers = {k.lower(): v for k, v in dict(headers or {}).items()}
+    now = time.time()
+    remaining = None
+    for name in ("x-rate-limit-remaining", "x-ratelimit-remaining", "x-ratelimit-remaining-requests"):
+        if name in headers:
+            try:
+                remaining = int(float(headers[name]))
+            except ValueError:
+                pass
+            break
+    reset_after = None
+    for name in ("x-rate-limit-reset", "x-ratelimit-reset", "x-ratelimit-reset-requests"):
+        if name in headers:
+            reset_after = _header_seconds(headers[name], now)
+            break
+    retry_after = _header_seconds(headers["retry-after"], now) if "retry-after" in headers else None
+    return {"remaining": remaining, "reset_after": reset_after, "retry_after": retry_after}
+
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """Get the delay before retry ``attempt`` (0-based), with full jitter."""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt + 1)))
+
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out reservations."""
+
+    def __init__(self, requests: int, per_seconds: float):
+        """Create a full bucket allowing ``requests`` per ``per_seconds``."""
+        self.capacity = float(requests)
+        self.rate = requests / per_seconds
+        self.tokens = self.capacity
+        self.blocked_until = 0.0  # monotonic time the provider told us to wait for
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float = None) -> float:
+        """Take a token and return how long to wait before using it.
+
+        Returns:
+            Seconds to wait, or -1 (nothing taken) if that exceeds ``max_wait``.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (1 - self.tokens) / self.rate, self.blocked_until - now)
+            if max_wait is not None and wait > max_wait:
+                return -1
+            self.tokens -= 1
+            return wait
+
+    def observe(self, remaining: int = None, reset_after: float = None, retry_after: float = None) -> None:
+        """Shrink the bucket to what the provider reports."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+                if remaining <= 0 and reset_after is not None:
+                    self.blocked_until = max(self.blocked_until, now + reset_after)
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+class RateGovernor:
+    """Token buckets per endpoint (and scope) with retrying call wrappers."""
+
+    def __init__(self, limits: dict = None, mode: str = RATE_LIMIT_MODE,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT, max_retries: int = RATE_LIMIT_MAX_RETRIES):
+        """Create a governor with ``limits`` overriding ``DEFAULT_LIMITS``."""
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.mode = mode
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, endpoint: str, scope: str = None) -> TokenBucket:
+        """Get the bucket of an endpoint, per scope (e.g. connected account)."""
+        key = (endpoint, scope)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(*self.limits.get(endpoint, self.limits["default"]))
+                self._buckets[key] = bucket
+            return bucket
+
+    def _reserve(self, endpoint: str, scope: str) -> float:
+        max_wait = 0.0 if self.mode == "fail" else self.max_wait
+        wait = self.bucket(endpoint, scope).reserve(max_wait)
+        if wait < 0:
+            raise RateLimitExceeded(endpoint, max_wait)
+        if wait > 0:
+            logger.info(f"Waiting {wait:.1f}s for {endpoint} capacity")
+        RATE_LIMIT_WAIT.observe(wait, endpoint=endpoint)
+        return wait
+
+    async def acquire(self, endpoint: str, scope: str = None) -> None:
+        """Wait for capacity on an endpoint."""
+        wait = self._reserve(endpoint, scope)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, endpoint: str, scope: str = None) -> None:
+        """Block until an endpoint has capacity, for synchronous clients.
+
+        Sleeps the calling thread, possibly for up to ``max_wait``; never
+        call it on the event loop (use ``acquire``, or ``asyncio.to_thread``).
+        """
+        wait = self._reserve(endpoint, scope)
+        if wait > 0:
+            time.sleep(wait)
+
+    def observe(self, endpoint: str, headers, scope: str = None) -> dict:
+        """Update an endpoint's bucket from response headers."""
+        info = parse_rate_headers(headers)
+        self.bucket(endpoint, scope).observe(**info)
+        return info
+
+    def _retry_delay(self, endpoint: str, scope: str, error: Exception, attempt: int, idempotent: bool) -> float:
+        """Get the backoff before retrying ``error``, or None to give up."""
+        status = error.status if isinstance(error, RetryableError) else error_status(error)
+        if status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+            return None
+        if status != 429 and not idempotent:
+            return None  # The request may have been applied
+        retry_after = getattr(error, "retry_after", None)
+        if status == 429:
+            self.bucket(endpoint, scope).observe(remaining=0, retry_after=retry_after)
+        delay = backoff_delay(attempt, retry_after)
+        RATE_LIMIT_RETRIES.inc(endpoint=endpoint, status=status)
+        logger.warning(f"{endpoint} returned {status}; retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    async def call(self, endpoint: str, func, *args, scope: str = None, idempotent: bool = True, **kwargs):
+        """Await ``func(*args, **kwargs)`` within the endpoint's limit, retrying 429/5xx.
+
+        Args:
+            endpoint: Tool slug or model name.
+            func: Async callable making one request.
+            scope: Bucket scope, such as the connected account ID.
+            idempotent: Whether 5xx responses may be retried. 429s are
+                always retried since the request was not processed.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(endpoint, scope)
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(endpoint, scope, e, attempt, idempotent)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def call_sync(self, endpoint: str, func, *args, scope: str = None, idempotent: bool = True, **kwargs):
+        """Call a blocking client (Composio SDK, google-genai) like ``call``.
+
+        Waits and backs off by sleeping the calling thread, so async code
+        must run it through ``asyncio.to_thread``.
+        """
+        attempt = 0
+        while True:
+            self.acquire_sync(endpoint, scope)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(endpoint, scope, e, attempt, idempotent)
+                if delay is None:
+                    raise
+            attempt += 1
+            time.sleep(delay)
+
+
+class GovernedRateLimiter(BaseRateLimiter):
+    """LangChain rate limiter drawing from a governor bucket.
+
+    Pass as ``rate_limiter=`` to chat models; their own ``max_retries``
+    already backs off on 429s.
+    """
+
+    def __init__(self, endpoint: str, governor: RateGovernor = None):
+        """Draw from ``endpoint``'s bucket of ``governor`` (default: the process-wide one)."""
+        self.endpoint = endpoint
+        self.governor = governor
+
+    def _governor(self) -> RateGovernor:
+        return self.governor or get_governor()
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        """Take a token, sleeping for capacity when ``blocking``."""
+        if not blocking:
+            return self._governor().bucket(self.endpoint).reserve(0.0) >= 0
+        self._governor().acquire_sync(self.endpoint)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        """Take a token, awaiting capacity when ``blocking``."""
+        if not blocking:
+            return self._governor().bucket(self.endpoint).reserve(0.0) >= 0
+        await self._governor().acquire(self.endpoint)
+        return True
+
+
+def load_rate_limits(path: Path = RATE_LIMITS_FILE) -> dict:
+    """Read per-endpoint limit overrides, if the file exists."""
+    if not Path(path).exists():
+        return {}
+    with open(path) as f:
+        entries = json.load(f)
+    return {name: (limit["requests"], limit["per_seconds"]) for name, limit in entries.items()}
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> RateGovernor:
+    """Get the process-wide rate governor."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = RateGovernor(load_rate_limits())
+        return _governor
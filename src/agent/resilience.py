@@ -0,0 +1,280 @@
+"""Timeouts and circuit breakers for external dependencies.
+
+Each provider (``composio``, ``gemini``, ``veo``, ``huggingface``,
+``uploadpost``, ``firecrawl``) has a timeout and a circuit breaker. After
+``BREAKER_FAILURE_THRESHOLD`` consecutive failures the breaker opens and
+calls fail fast with ``CircuitOpenError``; after
+``BREAKER_RECOVERY_SECONDS`` one trial call is let through (half-open) and
+its outcome closes or re-opens the breaker.
+
+Rate limiting (429) and client errors (4xx) do not count as failures: the
+provider is up.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from . import deadline
+from .metrics import Counter, Gauge, Histogram
+from .rate_limit import RateLimitExceeded, RetryableError, error_status
+
+logger = logging.getLogger(__name__)
+
+# Seconds; override with <DEPENDENCY>_TIMEOUT_SECONDS, e.g. VEO_TIMEOUT_SECONDS
+DEFAULT_TIMEOUTS = {
+    "composio": 120,  # Includes video uploads to YouTube/Drive
+    "gemini": 60,
+    "veo": 600,  # Whole generate-and-poll cycle
+    "huggingface": 300,
+    "uploadpost": 600,
+    "firecrawl": 60,
+}
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RECOVERY_SECONDS = float(os.getenv("BREAKER_RECOVERY_SECONDS", "60"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+DEPENDENCY_SECONDS = Histogram(
+    "dependency_call_seconds", "Latency of calls to external dependencies.", ("dependency", "outcome")
+)
+BREAKER_OPENS = Counter("circuit_breaker_opens_total", "Times a dependency's circuit opened.", ("dependency",))
+BREAKER_STATE = Gauge(
+    "circuit_breaker_state", "Circuit state per dependency: 0 closed, 1 half-open, 2 open.", ("dependency",),
+    func=lambda: {(name,): _STATE_VALUES[s["state"]] for name, s in breaker_states().items()},
+)
+
+# Runs blocking calls whose clients have no timeout of their own
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RESILIENCE_THREADS", "16")),
+                               thread_name_prefix="resilience")
+
+
+def get_timeout(dependency: str) -> float:
+    """Get the timeout in seconds for a dependency."""
+    value = os.getenv(f"{dependency.upper()}_TIMEOUT_SECONDS")
+    return float(value) if value else float(DEFAULT_TIMEOUTS.get(dependency, 60))
+
+
+def budget_timeout(dependency: str, timeout: float = None) -> float:
+    """Get the timeout for a call starting now.
+
+    ``timeout`` (default: the dependency's timeout), capped at the time left
+    before the run's deadline, if any; see ``deadline.cap``.
+    """
+    return deadline.cap(timeout or get_timeout(dependency))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, dependency: str, retry_in: float):
+        """Create the error for ``dependency``, which allows a trial call in ``retry_in`` seconds."""
+        super().__init__(f"{dependency} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.dependency = dependency
+        self.retry_in = retry_in
+
+
+def is_failure(error: BaseException) -> bool:
+    """Whether an error means the dependency is unhealthy."""
+    if isinstance(error, (RateLimitExceeded, CircuitOpenError)):
+        return False
+    status = error.status if isinstance(error, RetryableError) else error_status(error)
+    return status is None or status >= 500 or status == 408
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for one dependency."""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 recovery_time: float = BREAKER_RECOVERY_SECONDS):
+        """Create a closed breaker for the dependency ``name``."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = CLOSED
+        self.failures = 0  # Consecutive failures
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str) -> None:
+        if state == self.state:
+            return
+        if state == OPEN:
+            logger.warning(f"Circuit for {self.name} opened after {self.failures} failure(s)")
+        else:
+            logger.info(f"Circuit for {self.name} is now {state}")
+        self.state = state
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker allows a trial call."""
+        return max(0.0, self.opened_at + self.recovery_time - time.monotonic())
+
+    def available(self) -> bool:
+        """Whether a call would be let through right now (without taking a trial)."""
+        with self._lock:
+            if self.state == OPEN:
+                return self.retry_in() == 0
+            return not (self.state == HALF_OPEN and self.trial_in_flight)
+
+    def before_call(self) -> None:
+        """Admit a call or raise ``CircuitOpenError``."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_in() > 0:
+                    raise CircuitOpenError(self.name, self.retry_in())
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self.trial_in_flight:
+                    raise CircuitOpenError(self.name, self.recovery_time)
+                self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the breaker."""
+        with self._lock:
+            self.failures = 0
+            self.trial_in_flight = False
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the breaker at the threshold or on a failed trial."""
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                BREAKER_OPENS.inc(dependency=self.name)
+                self._set_state(OPEN)
+
+    def release(self) -> None:
+        """Forget an admitted call that ended without an outcome (cancelled)."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record(self, error: BaseException = None) -> None:
+        """Record a call's outcome; errors that aren't failures count as success."""
+        if error is not None and is_failure(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def snapshot(self) -> dict:
+        """Get the breaker's state for metrics."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "times_opened": self.times_opened,
+                "retry_in": self.retry_in() if self.state == OPEN else 0.0,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    """Get the process-wide breaker of a dependency."""
+    with _breakers_lock:
+        breaker = _breakers.get(dependency)
+        if breaker is None:
+            breaker = _breakers[dependency] = CircuitBreaker(dependency)
+        return breaker
+
+
+def is_available(dependency: str) -> bool:
+    """Whether a dependency may be called; optional stages skip it otherwise."""
+    return get_breaker(dependency).available()
+
+
+def breaker_states() -> dict:
+    """Get every known dependency's breaker snapshot, keyed by dependency."""
+    with _breakers_lock:
+        names = set(DEFAULT_TIMEOUTS) | set(_breakers)
+    return {name: get_breaker(name).snapshot() for name in sorted(names)}
+
+
+def call(dependency: str, func, *args, timeout: float = None, idempotent: bool = True, **kwargs):
+    """Call a blocking function through the dependency's breaker.
+
+    Args:
+        dependency: Dependency name, e.g. ``uploadpost``.
+        func: Function making the call.
+        timeout: Seconds to wait for ``func``, for clients without a timeout
+            of their own, capped at the time left before the run's deadline.
+            The call keeps running in a worker thread after timing out, but
+            the caller is released.
+        idempotent: Whether the call is safe to repeat. Non-idempotent calls
+            (uploads, posts) get their full timeout instead of one capped at
+            the deadline: abandoning one could leave it done upstream but
+            unrecorded, so it would be repeated on resume.
+
+    Raises:
+        CircuitOpenError: If the breaker is open.
+        TimeoutError: If ``timeout`` elapsed.
+    """
+    breaker = get_breaker(dependency)
+    breaker.before_call()
+    started = time.perf_counter()
+    try:
+        if timeout is None:
+            result = func(*args, **kwargs)
+        else:
+            if idempotent:
+                timeout = deadline.cap(timeout)
+            context = contextvars.copy_context()  # Keeps the run's usage tracking and deadline
+            try:
+                result = _executor.submit(context.run, func, *args, **kwargs).result(timeout)
+            except FutureTimeoutError:
+                raise TimeoutError(f"{dependency} call timed out after {timeout:.0f}s") from None
+    except BaseException as e:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - started, dependency=dependency, outcome="error")
+        breaker.record(e)
+        raise
+    DEPENDENCY_SECONDS.observe(time.perf_counter() - started, dependency=dependency, outcome="ok")
+    breaker.record_success()
+    return result
+
+
+async def call_async(dependency: str, func, *args, timeout: float = None, idempotent: bool = True, **kwargs):
+    """Await ``func(*args, **kwargs)`` through the dependency's breaker.
+
+    Args:
+        dependency: Dependency name, e.g. ``composio``.
+        func: Async function making the call.
+        timeout: Seconds before the call is cancelled. Defaults to the
+            dependency's timeout; either is capped at the time left before
+            the run's deadline.
+        idempotent: Whether the call is safe to repeat; see ``call``.
+
+    Raises:
+        CircuitOpenError: If the breaker is open.
+        TimeoutError: If the timeout elapsed.
+    """
+    breaker = get_breaker(dependency)
+    breaker.before_call()
+    started = time.perf_counter()
+    try:
+        timeout = budget_timeout(dependency, timeout) if idempotent else timeout or get_timeout(dependency)
+        result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+    except asyncio.CancelledError:
+        breaker.release()  # Cancelled by the caller, not a provider outcome
+        raise
+    except BaseException as e:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - started, dependency=dependency, outcome="error")
+        breaker.record(e)
+        raise
+    DEPENDENCY_SECONDS.observe(time.perf_counter() - started, dependency=dependency, outcome="ok")
+    breaker.record_success()
+    return result
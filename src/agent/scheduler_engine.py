@@ -0,0 +1,281 @@
+"""Long-lived asyncio job scheduler.
+
+Runs several named jobs on one event loop with interval or cron schedules,
+random jitter, per-job concurrency limits and catch-up of runs missed while
+the process was down (based on persisted last-run timestamps).
+
+When given a ``LeaseStore``, schedulers on several workers elect a leader:
+only the leader runs ``leader_only`` jobs, and their last-run timestamps live
+in the shared store so a new leader picks up where the old one stopped. Jobs
+every worker runs keep their timestamps in the worker's own state file.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from .coordination import WORKER_ID, LeaseStore
+from .metrics import Counter, Gauge, Histogram
+from .profiling import maybe_profile, profiling_enabled
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = Path(os.getenv("SCHEDULER_STATE_FILE", "scheduler_state.json"))
+LEADER_LEASE = "scheduler-leader"
+LEADER_TTL = float(os.getenv("SCHEDULER_LEADER_TTL", "60"))
+
+JOB_SECONDS = Histogram("scheduler_job_seconds", "Duration of scheduled job runs.", ("job", "outcome"))
+JOB_SKIPPED = Counter("scheduler_job_skipped_total", "Scheduled runs skipped (not leader or still running).",
+                      ("job", "reason"))
+IS_LEADER = Gauge("scheduler_is_leader", "1 if this worker runs leader-only jobs.")
+
+_CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> set:
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            step = int(step_str)
+            if step < 1:
+                raise ValueError(f"Invalid cron step: {field}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field out of range {low}-{high}: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSpec:
+    """Standard five-field cron expression (minute hour day month weekday)."""
+
+    def __init__(self, expression: str):
+        """Parse ``expression``, raising ``ValueError`` if it is invalid."""
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_cron_field(f, low, high) for f, (low, high) in zip(fields, _CRON_RANGES)
+        )
+        self.weekdays = {d % 7 for d in weekdays}  # 0 and 7 are both Sunday
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, t: datetime) -> bool:
+        day_ok = t.day in self.days
+        weekday_ok = (t.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """Get the first matching minute strictly after ``after``."""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t.year + 5
+        while t.year <= limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+@dataclass
+class Job:
+    """A named, recurring async job.
+
+    Exactly one of ``interval`` (seconds) or ``cron`` must be set.
+    """
+
+    name: str
+    func: Callable[[], Awaitable]
+    interval: float = None
+    cron: str = None
+    jitter: float = 0.0  # Max random delay in seconds added to each run
+    max_concurrency: int = 1  # Max overlapping runs; 1 prevents overlap
+    catch_up: bool = True  # Run once at startup if a run was missed while down
+    leader_only: bool = True  # With a lease store, run only on the elected leader
+
+    def __post_init__(self):
+        """Check the schedule and parse its cron expression."""
+        if (self.interval is None) == (self.cron is None):
+            raise ValueError(f"Job {self.name!r} needs exactly one of interval or cron")
+        self._cron = CronSpec(self.cron) if self.cron else None
+
+    def next_run(self, after: float) -> float:
+        """Get the next scheduled timestamp after ``after``, without jitter."""
+        if self._cron:
+            return self._cron.next_after(datetime.fromtimestamp(after)).timestamp()
+        return after + self.interval
+
+
+class Scheduler:
+    """Runs jobs on the current event loop until cancelled."""
+
+    def __init__(self, jobs: list, state_file: Path = STATE_FILE, store: LeaseStore = None,
+                 owner: str = WORKER_ID, leader_ttl: float = LEADER_TTL):
+        """Create a scheduler for ``jobs``, with leader election when ``store`` is set."""
+        self.jobs = {job.name: job for job in jobs}
+        self.state_file = Path(state_file)
+        self.store = store
+        self.owner = owner
+        self.leader_ttl = leader_ttl
+        self.is_leader = store is None
+        self._last_runs = {}  # job name -> timestamp of the last run's scheduled time
+        self._running = {name: set() for name in self.jobs}
+
+    async def _check_leadership(self) -> None:
+        """Take or renew the leader lease, loading shared state on takeover."""
+        try:
+            leader = await asyncio.to_thread(self.store.acquire, LEADER_LEASE, self.owner, self.leader_ttl)
+        except Exception as e:
+            logger.warning(f"Leader lease check failed: {e}")
+            leader = False
+        IS_LEADER.set(1 if leader else 0)
+        if leader != self.is_leader:
+            logger.info(f"Worker {self.owner} {'is now' if leader else 'is no longer'} the scheduler leader")
+            if leader:
+                await asyncio.to_thread(self._load_state)
+        self.is_leader = leader
+
+    async def _hold_leadership(self) -> None:
+        """Keep renewing the leader lease while running."""
+        try:
+            while True:
+                await asyncio.sleep(self.leader_ttl / 3)
+                await self._check_leadership()
+        finally:
+            if self.is_leader:
+                await asyncio.to_thread(self.store.release, LEADER_LEASE, self.owner)
+                self.is_leader = False
+                IS_LEADER.set(0)
+
+    def _is_shared(self, name: str) -> bool:
+        """Whether a job's last run lives in the lease store rather than this worker's state file."""
+        return self.store is not None and name in self.jobs and self.jobs[name].leader_only
+
+    def _load_state(self) -> None:
+        loaded = {}
+        if self.state_file.exists():
+            try:
+                with open(self.state_file) as f:
+                    stored = json.load(f).get("last_runs", {})
+                loaded.update({k: float(v) for k, v in stored.items() if not self._is_shared(k)})
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable scheduler state {self.state_file}: {e}")
+        if self.store is not None:
+            stored = self.store.get_value("scheduler:last_runs", {})
+            loaded.update({k: v for k, v in stored.items() if self._is_shared(k)})
+        self._last_runs.update({k: max(v, self._last_runs.get(k, v)) for k, v in loaded.items()})
+
+    def _save_state(self, name: str, last_runs: dict) -> None:
+        if self._is_shared(name):
+            # Merge just this job's run: a whole-dict write could undo another leader's newer runs
+            self.store.merge_max("scheduler:last_runs", {name: last_runs[name]})
+            return
+        tmp = self.state_file.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"last_runs": {k: v for k, v in last_runs.items() if not self._is_shared(k)}}, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    def _first_run(self, job: Job, now: float) -> float:
+        last = self._last_runs.get(job.name)
+        if last is None:
+            return now if job.interval is not None else job.next_run(now)
+        due = job.next_run(last)
+        if due <= now:
+            if job.catch_up:
+                logger.info(f"Job {job.name} missed a run at {datetime.fromtimestamp(due)}, catching up")
+                return now
+            return job.next_run(now)
+        return due
+
+    async def run(self) -> None:
+        """Run every job until cancelled, then wait for in-flight runs."""
+        await asyncio.to_thread(self._load_state)
+        if self.store is not None:
+            await self._check_leadership()
+        IS_LEADER.set(1 if self.is_leader else 0)
+        now = time.time()
+        loops = [
+            asyncio.create_task(self._job_loop(job, self._first_run(job, now)), name=f"job:{job.name}")
+            for job in self.jobs.values()
+        ]
+        if self.store is not None:
+            loops.append(asyncio.create_task(self._hold_leadership(), name="leadership"))
+        try:
+            await asyncio.gather(*loops)
+        finally:
+            for task in loops:
+                task.cancel()
+            in_flight = [t for tasks in self._running.values() for t in tasks]
+            if in_flight:
+                logger.info(f"Waiting for {len(in_flight)} in-flight job run(s)")
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def _job_loop(self, job: Job, scheduled: float) -> None:
+        while True:
+            delay = scheduled - time.time() + random.uniform(0, job.jitter)
+            if delay > 0:
+                logger.info(f"Next {job.name} run at {datetime.fromtimestamp(time.time() + delay)}")
+                await asyncio.sleep(delay)
+            await self._start_run(job, scheduled)
+            now = time.time()
+            scheduled = job.next_run(scheduled)
+            while scheduled <= now:
+                scheduled = job.next_run(scheduled)
+
+    async def _start_run(self, job: Job, scheduled: float) -> None:
+        if job.leader_only and not self.is_leader:
+            logger.debug(f"Skipping {job.name} run: not the leader")
+            JOB_SKIPPED.inc(job=job.name, reason="not_leader")
+            return
+        running = self._running[job.name]
+        if len(running) >= job.max_concurrency:
+            logger.warning(f"Skipping {job.name} run: {len(running)} run(s) still in progress")
+            JOB_SKIPPED.inc(job=job.name, reason="overlap")
+            return
+        self._last_runs[job.name] = scheduled
+        try:
+            await asyncio.to_thread(self._save_state, job.name, dict(self._last_runs))
+        except Exception as e:
+            logger.warning(f"Could not save scheduler state: {e}")
+        task = asyncio.create_task(self._run_job(job), name=f"run:{job.name}")
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+    async def _run_job(self, job: Job) -> None:
+        started = time.perf_counter()
+        logger.info(f"Running job {job.name}")
+        try:
+            with maybe_profile(f"job-{job.name}", profiling_enabled("jobs")):
+                await job.func()
+            logger.info(f"Job {job.name} finished in {time.perf_counter() - started:.1f}s")
+            JOB_SECONDS.observe(time.perf_counter() - started, job=job.name, outcome="ok")
+        except Exception:
+            logger.exception(f"Job {job.name} failed after {time.perf_counter() - started:.1f}s")
+            JOB_SECONDS.observe(time.perf_counter() - started, job=job.name, outcome="error")
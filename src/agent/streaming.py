@@ -0,0 +1,147 @@
+"""Chunked, bounded-memory reads and writes of media files.
+
+Videos are read and written ``STREAM_CHUNK_BYTES`` at a time instead of as
+one bytes object: reads go through ``mmap`` (pages are file-backed and
+reclaimable, not a private copy), writes go to a ``.part`` file that is
+renamed into place when complete, and downloads and multipart uploads
+stream through those chunks. ``afile_sha256`` hashes in a worker thread,
+off the event loop.
+"""
+
+import asyncio
+import hashlib
+import mmap
+import os
+import uuid
+from pathlib import Path
+
+import requests
+
+STREAM_CHUNK_BYTES = int(os.getenv("STREAM_CHUNK_BYTES", str(1 << 20)))
+
+
+def iter_file_chunks(path, chunk_size: int = None):
+    """Yield a file's contents in chunks of at most ``chunk_size`` bytes.
+
+    Chunks are memoryviews of an mmap of the file; use each before asking
+    for the next, or copy it with ``bytes()``.
+    """
+    chunk_size = chunk_size or STREAM_CHUNK_BYTES
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return  # Empty files cannot be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for start in range(0, len(view), chunk_size):
+                    chunk = view[start:start + chunk_size]
+                    try:
+                        yield chunk
+                    finally:
+                        chunk.release()
+            finally:
+                view.release()
+
+
+def iter_bytes_chunks(data, chunk_size: int = None):
+    """Yield an in-memory buffer in chunks, without copying it."""
+    chunk_size = chunk_size or STREAM_CHUNK_BYTES
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+def file_sha256(path, chunk_size: int = None) -> str:
+    """Hash a file chunk by chunk."""
+    digest = hashlib.sha256()
+    for chunk in iter_file_chunks(path, chunk_size):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_chunks(path, chunks) -> int:
+    """Write chunks to ``path`` atomically: readers never see a partial file.
+
+    Returns:
+        Number of bytes written.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.part")
+    written = 0
+    try:
+        with open(partial, "wb") as f:
+            for chunk in chunks:
+                written += f.write(chunk)
+        os.replace(partial, path)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    return written
+
+
+def download_to_file(url: str, path, headers: dict = None, timeout: float = None, chunk_size: int = None) -> int:
+    """Stream a URL's body to ``path`` (atomically) without buffering it.
+
+    Returns:
+        Number of bytes written.
+    """
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        return write_chunks(path, response.iter_content(chunk_size or STREAM_CHUNK_BYTES))
+
+
+class MultipartStream:
+    """A ``multipart/form-data`` body generated chunk by chunk.
+
+    Pass it as ``data=`` to ``requests`` with its ``content_type`` header:
+    it has a length, so it is sent with ``Content-Length``, and file parts
+    are read from disk as they are sent.
+
+    Args:
+        fields: ``(name, value)`` form fields.
+        files: ``(name, (filename, file object or path))`` file parts.
+        chunk_size: Bytes read per file chunk.
+    """
+
+    def __init__(self, fields: list, files: list, chunk_size: int = None):
+        """Create the body's parts; files are not opened until it is sent."""
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.chunk_size = chunk_size or STREAM_CHUNK_BYTES
+        self._parts = []  # (header bytes, value bytes or file path)
+        for name, value in fields or []:
+            header = f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+            self._parts.append((header.encode(), str(value).encode()))
+        for name, (filename, source) in files or []:
+            header = (
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n"
+            )
+            self._parts.append((header.encode(), getattr(source, "name", source)))
+        self._trailer = f"--{self.boundary}--\r\n".encode()
+
+    def __len__(self) -> int:
+        """Get the body's size in bytes, without reading any file."""
+        total = len(self._trailer)
+        for header, value in self._parts:
+            size = len(value) if isinstance(value, bytes) else os.path.getsize(value)
+            total += len(header) + size + 2
+        return total
+
+    def __iter__(self):
+        """Yield the body in chunks, reading files as they are reached."""
+        for header, value in self._parts:
+            yield header
+            if isinstance(value, bytes):
+                yield value
+            else:
+                for chunk in iter_file_chunks(value, self.chunk_size):
+                    yield bytes(chunk)  # The transport may hold on to it
+            yield b"\r\n"
+        yield self._trailer
+
+
+async def afile_sha256(path, chunk_size: int = None) -> str:
+    """``file_sha256`` in a worker thread."""
+    return await asyncio.to_thread(file_sha256, path, chunk_size)
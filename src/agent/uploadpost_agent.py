@@ -2,14 +2,50 @@
 
 import logging
 import os
-from upload_post import UploadPostClient
+import requests
+from upload_post import UploadPostClient, UploadPostError
 from dotenv import load_dotenv
+from .cassette import recorded
+from .metrics import timed
+from .resilience import call, get_timeout
+from .streaming import MultipartStream
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 
-def upload_video_multiplatform(video_path: str, title: str, description: str, platforms: list = ["youtube"]) -> dict:
+class StreamingUploadPostClient(UploadPostClient):
+    """UploadPost client that streams file uploads from disk.
+
+    ``requests`` builds a multipart body with files in memory; this sends
+    it as a ``MultipartStream`` instead, so memory use does not grow with
+    the video size.
+    """
+
+    def _request(self, endpoint: str, method: str = "GET", data=None, files=None, json_data=None, params=None):
+        if method != "POST" or not files:
+            return super()._request(endpoint, method, data, files, json_data, params)
+        body = MultipartStream(data, files)
+        try:
+            response = self.session.post(
+                f"{self.BASE_URL}{endpoint}", data=body, headers={"Content-Type": body.content_type}
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            error_msg = str(e)
+            if e.response is not None:
+                try:
+                    error_data = e.response.json()
+                    error_msg = error_data.get("message") or error_data.get("detail") or str(error_data)
+                except ValueError:
+                    pass
+            raise UploadPostError(f"API request failed: {error_msg}") from e
+
+
+@timed("uploadpost_upload")
+def upload_video_multiplatform(video_path: str, title: str, description: str, platforms: list = ["youtube"], user: str = None,
+                               **overrides) -> dict:
     """Upload video to multiple platforms using UploadPost.
     
     Args:
@@ -17,6 +53,9 @@ def upload_video_multiplatform(video_path: str, title: str, description: str, pl
         title: Video title.
         description: Video description.
         platforms: List of platforms (youtube, tiktok, instagram).
+        user: UploadPost user to upload as. Defaults to env `UPLOADPOST_USER`.
+        **overrides: Per-platform fields such as `tiktok_title` or
+            `youtube_description`.
         
     Returns:
         Upload result.
@@ -32,14 +71,19 @@ def upload_video_multiplatform(video_path: str, title: str, description: str, pl
     logger.info(f"Video file: {video_path} ({file_size} bytes)")
     
     try:
-        client = UploadPostClient(api_key=os.getenv("UPLOADPOST_API_KEY"))
+        client = StreamingUploadPostClient(api_key=os.getenv("UPLOADPOST_API_KEY"))
         
-        response = client.upload_video(
+        response = call(
+            "uploadpost",
+            recorded("uploadpost", "upload_video", client.upload_video),
+            timeout=get_timeout("uploadpost"),
+            idempotent=False,
             video_path=video_path,
             title=title,
             description=description,
-            user=os.getenv("UPLOADPOST_USER"),
-            platforms=platforms
+            user=user or os.getenv("UPLOADPOST_USER"),
+            platforms=platforms,
+            **overrides
         )
         
         logger.info(f"Upload response: {response}")
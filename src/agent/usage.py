@@ -0,0 +1,255 @@
+"""Token and cost accounting for LLM calls.
+
+Every LangChain model in the pipeline is created with ``usage_callbacks(stage)``.
+Calls made while a ``track_usage()`` block is active are aggregated into that
+block's ``RunUsage``, so one graph invocation reports the tokens, latency and
+estimated cost of all of its sub-agents. Veo generations, which are billed
+per second of video rather than per token, are recorded with
+``record_video_generation``. Replayed cassette calls are not accounted.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Estimated USD price per 1M (input, output) tokens. Unknown models cost 0.
+MODEL_PRICES = {
+    "gemini-2.0-flash-exp": (0.10, 0.40),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-image": (0.30, 30.00),
+}
+
+# Estimated USD price per second of generated video
+VIDEO_PRICES = {
+    "veo-3.1-generate-preview": 0.40,
+}
+
+
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens by model, stage and kind (prompt/completion).",
+                     ("model", "stage", "kind"))
+LLM_COST = Counter("llm_cost_usd_total", "Estimated LLM cost in USD.", ("model", "stage"))
+LLM_SECONDS = Histogram("llm_call_seconds", "LLM call latency.", ("model", "stage", "outcome"))
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate the USD cost of a call from the ``MODEL_PRICES`` table."""
+    name = (model or "").removeprefix("models/")
+    input_price, output_price = MODEL_PRICES.get(name, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+@dataclass
+class LLMCall:
+    """Accounting record for a single LLM call."""
+
+    stage: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float
+    cost: float
+    estimated: bool = False
+    error: str = ""
+
+
+class RunUsage:
+    """Thread-safe collection of the LLM calls made during one run."""
+
+    def __init__(self):
+        """Create an empty run."""
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def record(self, call: LLMCall) -> None:
+        """Add a call to the run."""
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self) -> dict:
+        """Aggregate the run's calls by stage and by model.
+
+        Returns:
+            Dict with overall totals plus ``by_stage`` and ``by_model`` breakdowns.
+        """
+        with self._lock:
+            calls = list(self.calls)
+
+        def _totals(group):
+            return {
+                "calls": len(group),
+                "prompt_tokens": sum(c.prompt_tokens for c in group),
+                "completion_tokens": sum(c.completion_tokens for c in group),
+                "latency": round(sum(c.latency for c in group), 3),
+                "cost": round(sum(c.cost for c in group), 6),
+            }
+
+        summary = _totals(calls)
+        summary["by_stage"] = {
+            stage: _totals([c for c in calls if c.stage == stage])
+            for stage in dict.fromkeys(c.stage for c in calls)
+        }
+        summary["by_model"] = {
+            model: _totals([c for c in calls if c.model == model])
+            for model in dict.fromkeys(c.model for c in calls)
+        }
+        summary["calls_detail"] = [asdict(c) for c in calls]
+        return summary
+
+
+_current_usage = ContextVar("run_usage", default=None)
+
+
+def current_usage():
+    """Get the ``RunUsage`` of the active ``track_usage`` block, if any."""
+    return _current_usage.get()
+
+
+@contextmanager
+def track_usage():
+    """Collect every LLM call made inside the block into a fresh ``RunUsage``."""
+    usage = RunUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def format_usage(summary: dict) -> str:
+    """Format a usage summary as a single log line."""
+    stages = ", ".join(
+        f"{stage}={s['prompt_tokens']}+{s['completion_tokens']}tok/{s['latency']:.2f}s"
+        for stage, s in summary.get("by_stage", {}).items()
+    )
+    return (
+        f"{summary['calls']} LLM call(s), {summary['prompt_tokens']} prompt + "
+        f"{summary['completion_tokens']} completion tokens, "
+        f"~${summary['cost']:.4f} ({stages})"
+    )
+
+
+def _extract_token_usage(response) -> tuple:
+    """Pull (prompt_tokens, completion_tokens) out of an ``LLMResult``."""
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            metadata = getattr(message, "usage_metadata", None)
+            if not metadata:
+                metadata = (generation.generation_info or {}).get("usage_metadata")
+            if metadata:
+                return metadata.get("input_tokens", 0), metadata.get("output_tokens", 0)
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """LangChain callback that records each LLM call into the current run."""
+
+    def __init__(self, stage: str):
+        """Create a handler recording calls under ``stage``."""
+        self.stage = stage
+        self._starts = {}  # run_id -> (start time, model, prompt chars)
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, serialized, kwargs, prompt_chars: int) -> None:
+        params = kwargs.get("invocation_params") or {}
+        metadata = kwargs.get("metadata") or {}
+        model = (
+            params.get("model")
+            or params.get("model_name")
+            or metadata.get("ls_model_name")
+            or ((serialized or {}).get("kwargs") or {}).get("model")
+            or "unknown"
+        )
+        with self._lock:
+            self._starts[run_id] = (time.perf_counter(), model, prompt_chars)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        """Remember when a completion-style call started."""
+        self._start(run_id, serialized, kwargs, sum(len(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        """Remember when a chat call started."""
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._start(run_id, serialized, kwargs, chars)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        """Record tokens, latency and cost of a finished call."""
+        started, model, prompt_chars = self._pop(run_id)
+        tokens = _extract_token_usage(response)
+        estimated = tokens is None
+        if estimated:
+            completion_chars = sum(
+                len(g.text or "") for gens in response.generations for g in gens
+            )
+            tokens = (prompt_chars // 4, completion_chars // 4)
+        record_call(LLMCall(
+            stage=self.stage,
+            model=model,
+            prompt_tokens=tokens[0],
+            completion_tokens=tokens[1],
+            latency=time.perf_counter() - started,
+            cost=estimate_cost(model, *tokens),
+            estimated=estimated,
+        ))
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        """Record the latency of a failed call."""
+        started, model, _ = self._pop(run_id)
+        record_call(LLMCall(
+            stage=self.stage,
+            model=model,
+            prompt_tokens=0,
+            completion_tokens=0,
+            latency=time.perf_counter() - started,
+            cost=0.0,
+            error=str(error),
+        ))
+
+    def _pop(self, run_id) -> tuple:
+        with self._lock:
+            return self._starts.pop(run_id, (time.perf_counter(), "unknown", 0))
+
+
+def record_call(call: LLMCall) -> None:
+    """Add a call to the metrics and to the active ``track_usage`` block, if any."""
+    LLM_TOKENS.inc(call.prompt_tokens, model=call.model, stage=call.stage, kind="prompt")
+    LLM_TOKENS.inc(call.completion_tokens, model=call.model, stage=call.stage, kind="completion")
+    LLM_COST.inc(call.cost, model=call.model, stage=call.stage)
+    LLM_SECONDS.observe(call.latency, model=call.model, stage=call.stage, outcome="error" if call.error else "ok")
+    logger.info(
+        f"LLM call [{call.stage}] {call.model}: {call.prompt_tokens}+{call.completion_tokens} "
+        f"tokens in {call.latency:.2f}s (~${call.cost:.5f})"
+    )
+    usage = current_usage()
+    if usage is not None:
+        usage.record(call)
+
+
+def record_video_generation(model: str, video_seconds: float, latency: float) -> None:
+    """Record a finished video generation, priced per second from ``VIDEO_PRICES``."""
+    record_call(LLMCall(
+        stage="video_generation",
+        model=model,
+        prompt_tokens=0,
+        completion_tokens=0,
+        latency=latency,
+        cost=video_seconds * VIDEO_PRICES.get(model, 0.0),
+    ))
+
+
+def usage_callbacks(stage: str) -> list:
+    """Get the callbacks to pass to a LangChain model for the given stage."""
+    return [UsageCallbackHandler(stage)]
@@ -8,10 +8,23 @@ from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 from huggingface_hub import InferenceClient
+from .cassette import recorded
+from .metrics import timed
+from .rate_limit import get_governor
+from .resilience import budget_timeout, call, is_available
+from .streaming import download_to_file, write_chunks
+from .usage import record_video_generation, usage_callbacks
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+VEO_POLL_SECONDS = float(os.getenv("VEO_POLL_SECONDS", "10"))
+VIDEO_SETTLE_SECONDS = 3  # Let the downloaded file finish writing before checking it
+FALLBACK_VIDEO_PROMPT = (
+    "Modern vertical video showcasing AI credit repair tools and automation. Professional, clean, dynamic camera movement."
+)
+
+@timed("video_prompt")
 def enhance_tweet_to_video_prompt(tweet_text: str) -> str:
     """Convert tweet text to dynamic video prompt for reels.
     
@@ -26,7 +39,9 @@ def enhance_tweet_to_video_prompt(tweet_text: str) -> str:
     llm = GoogleGenerativeAI(
         model="gemini-2.5-flash-lite",
         temperature=0.8,
-        google_api_key=os.getenv("GOOGLE_API_KEY")
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        callbacks=usage_callbacks("video_prompt"),
+        timeout=budget_timeout("gemini")
     )
     
     prompt = f"""Convert this social media post into a dynamic 8-second vertical video prompt with audio for Instagram/TikTok reels.
@@ -51,60 +66,103 @@ OUTPUT:
 Return ONLY the video prompt with audio cues. No explanations."""
     
     try:
-        response = llm.invoke(prompt)
+        get_governor().acquire_sync("gemini-2.5-flash-lite")
+        response = recorded("gemini", "video_prompt", llm.invoke)(prompt)
         video_prompt = response.strip()
         logger.info(f"Enhanced video prompt: {video_prompt}")
         return video_prompt
     except Exception as e:
         logger.error(f"Failed to enhance prompt: {e}")
-        return f"Modern vertical video showcasing AI credit repair tools and automation. Professional, clean, dynamic camera movement."
+        return FALLBACK_VIDEO_PROMPT
+
+
+@timed("veo")
+def _generate_with_veo(video_prompt: str) -> str:
+    """Generate and download a Veo 3.1 video, giving up after the Veo timeout.
 
+    The timeout is capped at the time left before the run's deadline.
+
+    Returns:
+        Local path of the video, or None if the saved file is empty.
+    """
+    client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    timeout = budget_timeout("veo")
+    started = time.monotonic()
+    deadline = started + timeout
+
+    operation = get_governor().call_sync(
+        "veo-3.1-generate-preview",
+        client.models.generate_videos,
+        model="veo-3.1-generate-preview",
+        prompt=video_prompt,
+        config=types.GenerateVideosConfig(
+            aspect_ratio="9:16",
+            resolution="720p",
+            duration_seconds=8,
+            person_generation="allow_all"
+        )
+    )
+
+    logger.info("Waiting for video generation...")
+    while not operation.done:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Veo generation did not finish within {timeout:.0f}s")
+        time.sleep(VEO_POLL_SECONDS)
+        # The client's own HTTP timeout: a nested resilience.call would take a second half-open trial
+        remaining = max(1.0, deadline - time.monotonic())
+        operation = client.operations.get(
+            operation, config=types.GetOperationConfig(http_options=types.HttpOptions(timeout=int(remaining * 1000)))
+        )
+
+    generated_video = operation.response.generated_videos[0]
+    record_video_generation("veo-3.1-generate-preview", 8, time.monotonic() - started)
+    temp_dir = Path("temp_videos")
+    temp_dir.mkdir(exist_ok=True)
+    video_path = temp_dir / f"santa_spot_reel_{int(time.time())}.mp4"
+
+    uri = getattr(generated_video.video, "uri", None)
+    if uri:
+        # Stream to disk in chunks rather than holding the whole video in memory
+        remaining = max(1.0, deadline - time.monotonic())
+        download_to_file(uri, video_path, headers={"x-goog-api-key": os.getenv("GOOGLE_API_KEY")}, timeout=remaining)
+    else:
+        client.files.download(file=generated_video.video)
+        generated_video.video.save(str(video_path))
+        time.sleep(VIDEO_SETTLE_SECONDS)
+
+    if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
+        return str(video_path)
+    return None
 
-def generate_video_from_tweet(tweet_text: str, image_path: str = None) -> str:
+
+@timed("video_generation")
+def generate_video_from_tweet(tweet_text: str, image_path: str = None, video_prompt: str = None) -> str:
     """Generate vertical video using Veo 3.1 with Hugging Face fallback.
     
     Args:
         tweet_text: Tweet text to convert to video.
         image_path: Image to use for video generation.
+        video_prompt: Ready video prompt, e.g. from the post's creative
+            brief. Derived from ``tweet_text`` with an extra LLM call if
+            omitted.
         
     Returns:
-        Local path to generated video file.
+        Local path to generated video file, or None if generation failed or
+        both providers are unavailable (circuit open).
     """
-    video_prompt = enhance_tweet_to_video_prompt(tweet_text)
+    if not is_available("veo") and not is_available("huggingface"):
+        logger.warning("Skipping video generation: Veo and Hugging Face are unavailable")
+        return None
+
+    video_prompt = video_prompt or enhance_tweet_to_video_prompt(tweet_text)
     
     # Try Google Veo 3.1 first
     try:
         logger.info("---GENERATING VIDEO WITH VEO 3.1---")
-        client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-        
-        operation = client.models.generate_videos(
-            model="veo-3.1-generate-preview",
-            prompt=video_prompt,
-            config=types.GenerateVideosConfig(
-                aspect_ratio="9:16",
-                resolution="720p",
-                duration_seconds=8,
-                person_generation="allow_all"
-            )
-        )
-        
-        logger.info("Waiting for video generation...")
-        while not operation.done:
-            time.sleep(10)
-            operation = client.operations.get(operation)
-        
-        generated_video = operation.response.generated_videos[0]
-        temp_dir = Path("temp_videos")
-        temp_dir.mkdir(exist_ok=True)
-        video_path = temp_dir / f"santa_spot_reel_{int(time.time())}.mp4"
-        
-        client.files.download(file=generated_video.video)
-        generated_video.video.save(str(video_path))
-        time.sleep(3)
-        
-        if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
+        video_path = call("veo", recorded("veo", "generate_video", _generate_with_veo, files=True), video_prompt)
+        if video_path:
             logger.info(f"Veo video saved: {video_path}")
-            return str(video_path)
+            return video_path
     except Exception as e:
         logger.warning(f"Veo failed: {e}. Trying Hugging Face...")
     
@@ -113,15 +171,16 @@ def generate_video_from_tweet(tweet_text: str, image_path: str = None) -> str:
         logger.info("---GENERATING VIDEO WITH HUGGING FACE LTX-VIDEO---")
         hf_client = InferenceClient(
             provider="fal-ai",
-            api_key=os.getenv("HF_TOKEN")
+            api_key=os.getenv("HF_TOKEN"),
+            timeout=budget_timeout("huggingface")
         )
         
         if image_path and os.path.exists(image_path):
-            with open(image_path, "rb") as img_file:
-                input_image = img_file.read()
-            
-            video = hf_client.image_to_video(
-                input_image,
+            # The client reads the image from the path itself
+            video = call(
+                "huggingface",
+                recorded("huggingface", "image_to_video", hf_client.image_to_video),
+                Path(image_path),
                 prompt=video_prompt,
                 model="Lightricks/LTX-Video"
             )
@@ -133,8 +192,9 @@ def generate_video_from_tweet(tweet_text: str, image_path: str = None) -> str:
         temp_dir.mkdir(exist_ok=True)
         video_path = temp_dir / f"santa_spot_reel_{int(time.time())}.mp4"
         
-        with open(video_path, "wb") as f:
-            f.write(video)
+        # The client downloads the whole video into memory and exposes no URL to stream
+        # from, so chunking wouldn't lower peak memory; it is written in one piece (atomically)
+        write_chunks(video_path, [video])
         
         if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
             logger.info(f"HF video saved: {video_path}")
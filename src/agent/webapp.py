@@ -0,0 +1,15 @@
+"""Custom routes served alongside the LangGraph API (``http.app`` in langgraph.json)."""
+
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+from .metrics import CONTENT_TYPE, REGISTRY
+
+
+async def metrics(request) -> Response:
+    """Serve the in-process metrics in Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+app = Starlette(routes=[Route("/metrics", metrics)])
@@ -2,34 +2,35 @@
 
 import logging
 import os
-from composio import Composio
 from dotenv import load_dotenv
+from .clients import execute_tool, get_composio_client
+from .metrics import timed
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-# Initialize Composio client
-composio_client = Composio(
-    api_key=os.getenv("COMPOSIO_API_KEY"),
-    entity_id=os.getenv("YOUTUBE_ENTITY_ID", "default")
-)
+# Initialize Composio client (shared with the other agents)
+composio_client = get_composio_client(os.getenv("YOUTUBE_ENTITY_ID", "default"))
 
 
-def upload_video_to_youtube(video_path: str, title: str, description: str) -> dict:
+@timed("youtube_upload")
+def upload_video_to_youtube(video_path: str, title: str, description: str, connected_account_id: str = None) -> dict:
     """Upload video to YouTube.
     
     Args:
         video_path: Local path to video file.
         title: Video title.
         description: Video description.
+        connected_account_id: YouTube connection to use. Defaults to env
+            `YOUTUBE_ACCOUNT_ID`.
         
     Returns:
         Upload result with video ID.
     """
     logger.info("---UPLOADING VIDEO TO YOUTUBE---")
+    connected_account_id = connected_account_id or os.getenv("YOUTUBE_ACCOUNT_ID")
     
     import time
-    import os
     
     # Verify file exists and is valid MP4
     if not os.path.exists(video_path):
@@ -48,7 +49,8 @@ def upload_video_to_youtube(video_path: str, title: str, description: str) -> di
     time.sleep(10)
     
     try:
-        result = composio_client.tools.execute(
+        result = execute_tool(
+            composio_client,
             "YOUTUBE_UPLOAD_VIDEO",
             {
                 "videoFilePath": video_path,
@@ -58,7 +60,8 @@ def upload_video_to_youtube(video_path: str, title: str, description: str) -> di
                 "categoryId": "22",
                 "tags": ["SantaSpot", "Holidays", "Family", "Christmas", "AI"]
             },
-            connected_account_id=os.getenv("YOUTUBE_ACCOUNT_ID")
+            connected_account_id=connected_account_id,
+            idempotent=False
         )
         
         logger.info(f"Upload response: {result}")
@@ -78,22 +81,27 @@ def upload_video_to_youtube(video_path: str, title: str, description: str) -> di
         return {"success": False, "error": str(e)}
 
 
-def get_channel_id_by_handle(handle: str) -> dict:
+@timed("youtube_channel_id")
+def get_channel_id_by_handle(handle: str, connected_account_id: str = None) -> dict:
     """Get YouTube channel ID from handle.
     
     Args:
         handle: YouTube channel handle (e.g., @MHEMEDIA).
+        connected_account_id: YouTube connection to use. Defaults to env
+            `YOUTUBE_ACCOUNT_ID`.
         
     Returns:
         Channel ID.
     """
     logger.info(f"---GETTING CHANNEL ID FOR {handle}---")
+    connected_account_id = connected_account_id or os.getenv("YOUTUBE_ACCOUNT_ID")
     
     try:
-        result = composio_client.tools.execute(
+        result = execute_tool(
+            composio_client,
             "YOUTUBE_GET_CHANNEL_ID_BY_HANDLE",
             {"channel_handle": handle},
-            connected_account_id=os.getenv("YOUTUBE_ACCOUNT_ID")
+            connected_account_id=connected_account_id
         )
         
         if result.get("successful"):
@@ -110,29 +118,34 @@ def get_channel_id_by_handle(handle: str) -> dict:
         return {"success": False, "error": str(e)}
 
 
-def get_channel_statistics(channel_id: str = None, handle: str = "@MHEMEDIA") -> dict:
+@timed("youtube_channel_statistics")
+def get_channel_statistics(channel_id: str = None, handle: str = "@MHEMEDIA", connected_account_id: str = None) -> dict:
     """Get YouTube channel statistics.
     
     Args:
         channel_id: YouTube channel ID.
+        connected_account_id: YouTube connection to use. Defaults to env
+            `YOUTUBE_ACCOUNT_ID`.
         
     Returns:
         Channel statistics including subscriber count, view count, video count.
     """
     logger.info("---GETTING YOUTUBE CHANNEL STATISTICS---")
+    connected_account_id = connected_account_id or os.getenv("YOUTUBE_ACCOUNT_ID")
     
     try:
         # Get channel ID from handle if not provided
         if not channel_id:
-            handle_result = get_channel_id_by_handle(handle)
+            handle_result = get_channel_id_by_handle(handle, connected_account_id)
             if not handle_result.get("success"):
                 return handle_result
             channel_id = handle_result.get("channel_id")
         
-        result = composio_client.tools.execute(
+        result = execute_tool(
+            composio_client,
             "YOUTUBE_GET_CHANNEL_STATISTICS",
             {"id": channel_id, "part": "statistics"},
-            connected_account_id=os.getenv("YOUTUBE_ACCOUNT_ID")
+            connected_account_id=connected_account_id
         )
         
         if result.get("successful"):
@@ -151,35 +164,40 @@ def get_channel_statistics(channel_id: str = None, handle: str = "@MHEMEDIA") ->
         return {"success": False, "error": str(e)}
 
 
-def get_channel_activities(channel_id: str = None, handle: str = "@MHEMEDIA", max_results: int = 10) -> dict:
+@timed("youtube_channel_activities")
+def get_channel_activities(channel_id: str = None, handle: str = "@MHEMEDIA", max_results: int = 10, connected_account_id: str = None) -> dict:
     """Get recent channel activities.
     
     Args:
         channel_id: YouTube channel ID (optional).
         handle: YouTube channel handle (default: @MHEMEDIA).
         max_results: Maximum number of activities to return.
+        connected_account_id: YouTube connection to use. Defaults to env
+            `YOUTUBE_ACCOUNT_ID`.
         
     Returns:
         Recent channel activities.
     """
     logger.info("---GETTING YOUTUBE CHANNEL ACTIVITIES---")
+    connected_account_id = connected_account_id or os.getenv("YOUTUBE_ACCOUNT_ID")
     
     try:
         # Get channel ID from handle if not provided
         if not channel_id:
-            handle_result = get_channel_id_by_handle(handle)
+            handle_result = get_channel_id_by_handle(handle, connected_account_id)
             if not handle_result.get("success"):
                 return handle_result
             channel_id = handle_result.get("channel_id")
         
-        result = composio_client.tools.execute(
+        result = execute_tool(
+            composio_client,
             "YOUTUBE_GET_CHANNEL_ACTIVITIES",
             {
                 "channelId": channel_id,
                 "maxResults": max_results,
                 "part": "snippet,contentDetails"
             },
-            connected_account_id=os.getenv("YOUTUBE_ACCOUNT_ID")
+            connected_account_id=connected_account_id
         )
         
         if result.get("successful"):
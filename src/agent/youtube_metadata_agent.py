@@ -4,30 +4,18 @@ import logging
 import os
 from langchain_google_genai import GoogleGenerativeAI
 from dotenv import load_dotenv
+from .cassette import recorded
+from .metrics import timed
+from .rate_limit import get_governor
+from .resilience import budget_timeout
+from .usage import usage_callbacks
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+FALLBACK_TITLE = "Holiday Magic with Santa's Spot"
 
-def generate_youtube_metadata(tweet_text: str) -> dict:
-    """Generate YouTube title and description from tweet.
-    
-    Args:
-        tweet_text: Original tweet text.
-        
-    Returns:
-        Dict with title and description.
-    """
-    logger.info("---GENERATING YOUTUBE METADATA---")
-    
-    llm = GoogleGenerativeAI(
-        model="gemini-2.5-flash-lite",
-        temperature=0.7,
-        google_api_key=os.getenv("GOOGLE_API_KEY")
-    )
-    
-    # Use full template directly
-    description_template = f"""The Digital Hustle Revolution is HERE — featuring: @omniai + @futuristicwealth
+DESCRIPTION_TEMPLATE = """The Digital Hustle Revolution is HERE — featuring: @omniai + @futuristicwealth
 
 Take back control of your money, credit, data, and digital life.
 Start using DisputeAI — my automated credit repair & consumer-law toolkit.
@@ -131,6 +119,32 @@ Daniel Wray (a.k.a. D Smith) is an AI systems builder, automation specialist, di
 • MHE Gardens Eco Retreat Project
 
 I create tools, apps, workflows, and systems that help regular people access AI, credit repair, real estate pathways, income streams, and digital automation — no gatekeeping."""
+
+
+@timed("youtube_metadata")
+def generate_youtube_metadata(tweet_text: str, title: str = None) -> dict:
+    """Generate YouTube title and description from tweet.
+    
+    Args:
+        tweet_text: Original tweet text.
+        title: Ready title, e.g. from the post's creative brief. Generated
+            from ``tweet_text`` with an extra LLM call if omitted.
+        
+    Returns:
+        Dict with title and description.
+    """
+    logger.info("---GENERATING YOUTUBE METADATA---")
+    
+    if title:
+        return {"title": title[:100], "description": DESCRIPTION_TEMPLATE}
+
+    llm = GoogleGenerativeAI(
+        model="gemini-2.5-flash-lite",
+        temperature=0.7,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        callbacks=usage_callbacks("youtube_metadata"),
+        timeout=budget_timeout("gemini")
+    )
     
     prompt = f"""Create a catchy YouTube title (max 60 chars, NO URLs) for this video topic:
 
@@ -139,14 +153,15 @@ TOPIC: {tweet_text}
 OUTPUT ONLY the title, nothing else."""
     
     try:
-        title = llm.invoke(prompt).strip()
+        get_governor().acquire_sync("gemini-2.5-flash-lite")
+        title = recorded("gemini", "youtube_title", llm.invoke)(prompt).strip()
         
         # Use full template for description
-        description = description_template
+        description = DESCRIPTION_TEMPLATE
         
         # Fallback if title generation fails
         if not title or len(title) > 100:
-            title = "Holiday Magic with Santa's Spot"
+            title = FALLBACK_TITLE
         
         logger.info(f"Generated title: {title}")
         logger.info(f"Generated description: {description[:100]}...")
@@ -156,6 +171,6 @@ OUTPUT ONLY the title, nothing else."""
     except Exception as e:
         logger.error(f"Failed to generate metadata: {e}")
         return {
-            "title": "Holiday Magic with Santa's Spot",
+            "title": FALLBACK_TITLE,
             "description": f"{tweet_text}\n\nVisit https://santaspot.xyz for more holiday magic!"
         }
@@ -0,0 +1,149 @@
+"""Offline benchmark harness: provider fakes, timing and baselines.
+
+``BENCH_ROUNDS`` sets the timed rounds per case (after one warm-up round).
+A case regresses when its median latency, or the mean latency of one of its
+stages, exceeds ``baseline * BENCH_THRESHOLD + BENCH_SLACK_SECONDS``. Run
+with ``BENCH_UPDATE_BASELINES=1`` to rewrite ``baselines.json`` instead.
+"""
+
+import gc
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+import pytest
+
+from agent import clients
+from agent.graph import graph
+from agent.metrics import STAGE_SECONDS
+
+from . import fakes
+
+BASELINES_FILE = Path(__file__).parent / "baselines.json"
+BENCH_ROUNDS = int(os.getenv("BENCH_ROUNDS", "5"))
+BENCH_THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "1.5"))
+BENCH_SLACK_SECONDS = float(os.getenv("BENCH_SLACK_SECONDS", "0.05"))
+BENCH_UPDATE_BASELINES = os.getenv("BENCH_UPDATE_BASELINES", "").lower() in ("1", "true", "yes")
+
+_results = {}  # case -> {"median", "max", "rounds", "stages": {stage: mean seconds}}
+
+
+@pytest.fixture(scope="session")
+def composio_server():
+    server = fakes.FakeComposioServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+async def offline_graph(composio_server, monkeypatch, tmp_path):
+    """Get the compiled graph with every provider pointed at its local fake."""
+    fakes.install(monkeypatch, composio_server, tmp_path)
+    yield graph
+    await clients.close_http_session()
+
+
+def _stage_totals() -> dict:
+    return {key[0]: value for key, value in STAGE_SECONDS.totals().items()}
+
+
+@pytest.fixture
+def bench():
+    """Time ``BENCH_ROUNDS`` rounds of a case and check them against its baseline.
+
+    Usage: ``await bench(case, make_round)`` where ``make_round(i)`` returns
+    the awaitable of round ``i``. Returns the result of the last round.
+    """
+    async def run(case: str, make_round):
+        result = await make_round(-1)  # Warm-up: imports, pools, first-use caches
+        latencies = []
+        # Like timeit: a full collection of the session's heap takes ~0.3s and
+        # would land in whichever round triggers it
+        gc.collect()
+        gc.disable()
+        try:
+            before = _stage_totals()
+            for i in range(BENCH_ROUNDS):
+                started = time.perf_counter()
+                result = await make_round(i)
+                latencies.append(time.perf_counter() - started)
+            after = _stage_totals()
+        finally:
+            gc.enable()
+
+        stages = {}
+        for stage, (total, count) in after.items():
+            prev_total, prev_count = before.get(stage, (0.0, 0))
+            if count > prev_count:
+                stages[stage] = (total - prev_total) / (count - prev_count)
+        _results[case] = {
+            "median": statistics.median(latencies),
+            "max": max(latencies),
+            "rounds": BENCH_ROUNDS,
+            "stages": stages,
+        }
+        if not BENCH_UPDATE_BASELINES:
+            regressions = _regressions(case, _results[case])
+            assert not regressions, f"{case} regressed: " + "; ".join(regressions)
+        return result
+
+    return run
+
+
+def _load_baselines() -> dict:
+    if not BASELINES_FILE.exists():
+        return {}
+    return json.loads(BASELINES_FILE.read_text())
+
+
+def _limit(baseline: float) -> float:
+    return baseline * BENCH_THRESHOLD + BENCH_SLACK_SECONDS
+
+
+def _regressions(case: str, result: dict) -> list:
+    baseline = _load_baselines().get(case)
+    if baseline is None:
+        return []
+    regressions = []
+    if result["median"] > _limit(baseline["median"]):
+        regressions.append(f"median {result['median']:.3f}s > {_limit(baseline['median']):.3f}s")
+    for stage, seconds in result["stages"].items():
+        expected = baseline["stages"].get(stage)
+        if expected is not None and seconds > _limit(expected):
+            regressions.append(f"stage {stage} {seconds:.3f}s > {_limit(expected):.3f}s")
+    return regressions
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if BENCH_UPDATE_BASELINES and _results:
+        baselines = _load_baselines()
+        for case, result in _results.items():
+            baselines[case] = {
+                "median": round(result["median"], 4),
+                "stages": {stage: round(s, 4) for stage, s in sorted(result["stages"].items())},
+            }
+        BASELINES_FILE.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    baselines = _load_baselines()
+    write = terminalreporter.write_line
+    terminalreporter.section("benchmarks")
+    write(f"{'case / stage':<32}{'median':>10}{'max':>10}{'baseline':>10}{'ratio':>8}")
+    for case, result in sorted(_results.items()):
+        baseline = baselines.get(case, {})
+        base = baseline.get("median")
+        ratio = f"{result['median'] / base:.2f}" if base else "-"
+        base_text = f"{base:.3f}" if base else "-"
+        write(f"{case:<32}{result['median']:>10.3f}{result['max']:>10.3f}{base_text:>10}{ratio:>8}")
+        for stage, seconds in sorted(result["stages"].items(), key=lambda s: -s[1]):
+            base = baseline.get("stages", {}).get(stage)
+            ratio = f"{seconds / base:.2f}" if base else "-"
+            base_text = f"{base:.3f}" if base else "-"
+            write(f"  {stage:<30}{seconds:>10.3f}{'':>10}{base_text:>10}{ratio:>8}")
+    if BENCH_UPDATE_BASELINES:
+        write(f"Baselines written to {BASELINES_FILE}")
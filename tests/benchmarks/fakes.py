@@ -0,0 +1,336 @@
+"""Local stand-ins for every provider the graph calls.
+
+Each fake sleeps for its entry in ``DELAYS`` (seconds) to model provider
+latency. Override delays with ``BENCH_FAKE_DELAYS``, a JSON object such as
+``{"veo_generation": 2.0}``; baselines are only comparable between runs with
+the same delays.
+"""
+
+import asyncio
+import base64
+import collections
+import functools
+import importlib
+import io
+import json
+import os
+import random
+import string
+import threading
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import requests
+from aiohttp import web
+from PIL import Image
+
+DELAYS = {
+    "composio": 0.02,  # Any Composio tool execution
+    "composio_upload": 0.05,  # Media and file uploads, plus transfer time
+    "upload_bytes_per_second": 10e6,
+    "gemini_text": 0.05,
+    "gemini_image": 0.1,
+    "veo_generation": 0.3,  # Until the operation reports done
+    "veo_poll": 0.01,  # Each operations.get
+    "veo_download": 0.02,
+    "uploadpost": 0.05,
+    "firecrawl": 0.02,
+}
+DELAYS.update(json.loads(os.getenv("BENCH_FAKE_DELAYS", "{}")))
+
+@functools.lru_cache(maxsize=1)
+def png_bytes() -> bytes:
+    """A 1024x1024 PNG about as large as Gemini's (~1.4 MB)."""
+    gradient = Image.linear_gradient("L").resize((1024, 1024))
+    noise = Image.effect_noise((1024, 1024), 12)
+    buffer = io.BytesIO()
+    Image.merge("RGB", (gradient, Image.blend(gradient, noise, 0.3), noise)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def upload_seconds(arguments: dict) -> float:
+    """Transfer time of the local files named in a tool's arguments."""
+    size = sum(os.path.getsize(v) for v in arguments.values() if isinstance(v, str) and os.path.isfile(v))
+    return size / DELAYS["upload_bytes_per_second"]
+
+
+VIDEO_BYTES = b"\x00\x00\x00\x18ftypmp42" + bytes(1024)
+
+UPLOAD_TOOLS = {"TWITTER_UPLOAD_MEDIA", "GOOGLEDRIVE_UPLOAD_FILE", "YOUTUBE_UPLOAD_VIDEO"}
+
+
+def tool_response(slug: str, arguments: dict) -> dict:
+    """Build a successful Composio result shaped like the real tool's."""
+    new_id = str(uuid.uuid4().int)[:19]
+    if slug == "TWITTER_RECENT_SEARCH":
+        tweets = [
+            {
+                "id": str(1000 + i),
+                "text": f"Result {i} for {arguments.get('query')}",
+                "created_at": f"2026-01-01T{i:02d}:00:00.000Z",
+                "public_metrics": {"like_count": 10 * i, "retweet_count": i, "reply_count": i % 3, "quote_count": 0},
+            }
+            for i in range(10)
+        ]
+        data = {"data": tweets, "meta": {"result_count": len(tweets)}}
+    elif slug == "TWITTER_POST_LOOKUP_BY_POST_ID":
+        data = {"data": {"id": arguments.get("id"), "text": "Looked up tweet"}}
+    elif slug == "TWITTER_POST_LOOKUP_BY_POST_IDS":
+        data = {"data": [{"id": i, "text": "Looked up tweet"} for i in arguments.get("ids", [])]}
+    elif slug == "TWITTER_UPLOAD_MEDIA":
+        data = {"data": {"id": new_id}}
+    elif slug == "TWITTER_CREATION_OF_A_POST":
+        data = {"id": new_id, "text": arguments.get("text")}
+    elif slug == "GOOGLEDRIVE_FIND_FOLDER":
+        data = {"files": [{"id": "folder-ai-video", "name": "AI Video"}]}
+    elif slug in UPLOAD_TOOLS:
+        data = {"id": new_id}
+    else:
+        data = {}
+    return {"successful": True, "data": data, "error": None}
+
+
+class FakeComposioServer:
+    """aiohttp fake of the Composio ``tools/execute`` API.
+
+    Runs on its own event loop in a daemon thread, so the graph's blocking
+    SDK calls (made on the test's loop) cannot stall it.
+    """
+
+    def __init__(self):
+        self.url = None
+        self.calls = collections.Counter()  # Tool slug -> requests served
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+
+    async def _execute(self, request: web.Request) -> web.Response:
+        slug = request.match_info["slug"]
+        self.calls[slug] += 1
+        body = await request.json()
+        arguments = body.get("arguments") or {}
+        if slug in UPLOAD_TOOLS:
+            await asyncio.sleep(DELAYS["composio_upload"] + upload_seconds(arguments))
+        else:
+            await asyncio.sleep(DELAYS["composio"])
+        return web.json_response(tool_response(slug, arguments))
+
+    async def _start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/api/v3/tools/execute/{slug}", self._execute)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/api/v3/tools/execute"
+
+    def start(self) -> "FakeComposioServer":
+        threading.Thread(target=self._loop.run_forever, name="fake-composio", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(10)
+        return self
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class FakeComposio:
+    """Composio SDK client executing tools against ``FakeComposioServer``."""
+
+    def __init__(self, server: FakeComposioServer):
+        self.tools = SimpleNamespace(execute=self._execute)
+        self._server = server
+        self._session = requests.Session()
+
+    def _execute(self, slug: str, arguments: dict, connected_account_id: str = None) -> dict:
+        response = self._session.post(
+            f"{self._server.url}/{slug}",
+            json={"connected_account_id": connected_account_id, "arguments": arguments},
+            timeout=30,
+        )
+        return response.json()
+
+
+class FakeChatModel:
+    """Stand-in for ``ChatGoogleGenerativeAI`` text and image models."""
+
+    def __init__(self, model: str = "", **kwargs):
+        self.model = model
+
+    def _response(self, response_modalities=None) -> SimpleNamespace:
+        if response_modalities:
+            url = "data:image/png;base64," + base64.b64encode(png_bytes()).decode()
+            return SimpleNamespace(content=[{"image_url": {"url": url}}])
+        return SimpleNamespace(content="Fresh take on automating credit disputes with AI")
+
+    def invoke(self, messages, response_modalities=None, **kwargs) -> SimpleNamespace:
+        time.sleep(DELAYS["gemini_image" if response_modalities else "gemini_text"])
+        return self._response(response_modalities)
+
+    async def ainvoke(self, messages, response_modalities=None, **kwargs) -> SimpleNamespace:
+        await asyncio.sleep(DELAYS["gemini_image" if response_modalities else "gemini_text"])
+        return self._response(response_modalities)
+
+
+class FakeGenerativeAI:
+    """Stand-in for the ``GoogleGenerativeAI`` completion model."""
+
+    def __init__(self, model: str = "", **kwargs):
+        self.model = model
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        time.sleep(DELAYS["gemini_text"])
+        return "Dolly shot of an AI dashboard raising a credit score. Audio: upbeat synth."
+
+
+class FakeTweetBatchModel:
+    """Stand-in for the content buffer's structured-output Gemini model."""
+
+    def __init__(self, seed: int = 0):
+        self._rng = random.Random(seed)
+
+    async def ainvoke(self, messages, **kwargs) -> SimpleNamespace:
+        await asyncio.sleep(DELAYS["gemini_text"])
+
+        def words() -> str:
+            return " ".join("".join(self._rng.choices(string.ascii_lowercase, k=6)) for _ in range(8))
+
+        return SimpleNamespace(tweets=[f"{words()} https://disputeai.xyz #AITools" for _ in range(10)])
+
+
+class FakeCreativeBriefModel:
+    """Stand-in for the creative brief's structured-output Gemini model."""
+
+    def __init__(self, schema):
+        self.schema = schema  # CreativeBrief of the patched package
+
+    def invoke(self, messages, **kwargs):
+        time.sleep(DELAYS["gemini_text"])
+        return self.schema(
+            image_prompt="AI credit score dashboard rising on a laptop, modern clean tech style",
+            video_prompt="Dolly shot of an AI dashboard raising a credit score. Audio: upbeat synth.",
+            youtube_title="AI Fixed My Credit in 8 Seconds",
+        )
+
+
+class _FakeVideo:
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(VIDEO_BYTES)
+
+
+class _FakeOperation:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.done = False
+        self.response = SimpleNamespace(generated_videos=[SimpleNamespace(video=_FakeVideo())])
+
+
+class FakeVeoClient:
+    """Stand-in for ``genai.Client``: long-running Veo operations."""
+
+    def __init__(self, api_key: str = None, **kwargs):
+        self.models = SimpleNamespace(generate_videos=self._generate_videos)
+        self.operations = SimpleNamespace(get=self._get)
+        self.files = SimpleNamespace(download=self._download)
+
+    def _generate_videos(self, model: str, prompt: str, config=None) -> _FakeOperation:
+        time.sleep(DELAYS["veo_poll"])
+        return _FakeOperation()
+
+    def _get(self, operation: _FakeOperation, config=None) -> _FakeOperation:
+        time.sleep(DELAYS["veo_poll"])
+        operation.done = time.monotonic() - operation.started >= DELAYS["veo_generation"]
+        return operation
+
+    def _download(self, file=None) -> None:
+        time.sleep(DELAYS["veo_download"])
+
+
+class FakeUploadPostClient:
+    """Stand-in for ``upload_post.UploadPostClient``."""
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key
+
+    def upload_video(self, video_path: str, title: str, description: str, user: str, platforms: list, **kwargs) -> dict:
+        time.sleep(DELAYS["uploadpost"])
+        return {"success": True, "results": {p: {"success": True, "url": f"https://{p}.example/v"} for p in platforms}}
+
+
+class FakeFirecrawlApp:
+    """Stand-in for ``firecrawl.FirecrawlApp``."""
+
+    def __init__(self, api_key: str = None, **kwargs):
+        self.api_key = api_key
+
+    def scrape(self, url: str, formats: list = None) -> dict:
+        time.sleep(DELAYS["firecrawl"])
+        content = (
+            f"# {url}\n\nAI credit repair tools that draft dispute letters, track credit scores "
+            "and automate follow-ups for consumers and small businesses.\n\n"
+        ) * 20
+        return {"markdown": content, "metadata": {"title": url, "description": "AI tools"}}
+
+
+def install(monkeypatch, server: FakeComposioServer, workdir: Path, package: str = "agent") -> None:
+    """Point every provider of an agent package at its local fake.
+
+    Args:
+        monkeypatch: ``pytest.MonkeyPatch`` that undoes the patches.
+        server: Running Composio fake.
+        workdir: Directory for temp media, the post ledger and caches.
+        package: Package to patch: ``agent`` (tests, LangGraph server) or
+            ``src.agent`` (as imported by ``scheduler.py``).
+    """
+    def module(name):
+        return importlib.import_module(f"{package}.{name}")
+
+    monkeypatch.chdir(workdir)  # temp_images/, temp_videos/ and accounts.json
+    for name, value in {
+        "TWITTER_CONNECTION_ID": "bench-twitter-connection",
+        "TWITTER_ACCOUNT_ID": "bench-twitter-account",
+        "GOOGLEDRIVE_CONNECTION_ID": "bench-drive-connection",
+        "UPLOADPOST_USER": "bench",
+    }.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(module("accounts"), "_cache", {"mtime_ns": None, "accounts": None})
+
+    graph = module("graph")
+    composio = FakeComposio(server)
+    monkeypatch.setattr(graph, "COMPOSIO_API_KEY", "bench")
+    monkeypatch.setattr(graph, "COMPOSIO_BASE_URL", server.url)
+    for name in ("graph", "googledrive_agent", "youtube_agent"):
+        monkeypatch.setattr(module(name), "composio_client", composio)
+
+    monkeypatch.setattr(graph, "llm", FakeChatModel("gemini-2.0-flash-exp"))
+    monkeypatch.setattr(module("image_subagent"), "ChatGoogleGenerativeAI", FakeChatModel)
+    for name in ("image_subagent", "youtube_metadata_agent"):
+        monkeypatch.setattr(module(name), "GoogleGenerativeAI", FakeGenerativeAI)
+    monkeypatch.setattr("langchain_google_genai.GoogleGenerativeAI", FakeGenerativeAI)
+
+    video_agent = module("video_agent")
+    monkeypatch.setattr(video_agent.genai, "Client", FakeVeoClient)
+    monkeypatch.setattr(video_agent, "VEO_POLL_SECONDS", DELAYS["veo_poll"])
+    monkeypatch.setattr(video_agent, "VIDEO_SETTLE_SECONDS", 0)
+    monkeypatch.setattr(module("uploadpost_agent"), "StreamingUploadPostClient", FakeUploadPostClient)
+    firecrawl_agent = module("firecrawl_agent")
+    monkeypatch.setattr(firecrawl_agent, "FirecrawlApp", FakeFirecrawlApp)
+    monkeypatch.setattr(firecrawl_agent, "CACHE_FILE", Path(workdir) / "product_data_cache.json")
+
+    # Fresh process-wide state, without rate limits so requests don't queue
+    ledger = module("ledger")
+    monkeypatch.setattr(ledger, "_ledger", ledger.PostLedger(str(Path(workdir) / "post_ledger.db")))
+    monkeypatch.setattr(module("dedup"), "_indexes", {})
+    rate_limit = module("rate_limit")
+    unlimited = {endpoint: (10**9, 1) for endpoint in rate_limit.DEFAULT_LIMITS}
+    monkeypatch.setattr(rate_limit, "_governor", rate_limit.RateGovernor(unlimited))
+    monkeypatch.setattr(module("resilience"), "_breakers", {})
+    creative_brief = module("creative_brief")
+    monkeypatch.setattr(creative_brief, "_model", FakeCreativeBriefModel(creative_brief.CreativeBrief))
+    content_buffer = module("content_buffer")
+    monkeypatch.setattr(content_buffer, "_buffer", content_buffer.ContentBuffer(str(Path(workdir) / "content.db")))
+    monkeypatch.setattr(content_buffer, "_model", FakeTweetBatchModel())
+    monkeypatch.setattr(content_buffer, "_refills", {})
@@ -0,0 +1,317 @@
+"""Concurrent load generator for the graph and scheduler, against local fakes.
+
+Replays a weighted mix of queries through ``graph.ainvoke`` (and
+``scheduler.run_agent`` for ``scheduled``) with every provider replaced by
+the fakes in ``fakes.py``, then reports throughput, latency percentiles,
+event-loop lag and memory growth. Run from the repository root:
+
+    python -m tests.benchmarks.load --concurrency 20 --duration 30
+    python -m tests.benchmarks.load --rate 5 --requests 300 --mix search=4,lookup=3,post=1,like=1,dm=1
+
+``--concurrency`` keeps N requests in flight (closed loop); ``--rate``
+starts requests at a fixed rate regardless of how many are still running
+(open loop), which shows where latency starts to climb. Event-loop lag is
+how late a timer firing every ``--lag-interval`` seconds runs; it grows when
+blocking calls hold the loop.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+import pytest
+
+from . import fakes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIX = "search=4,lookup=3,post=1,like=1,dm=1"
+
+
+def _tweet_id(rng: random.Random) -> str:
+    return str(rng.randrange(10**18, 10**19))
+
+
+def _words(rng: random.Random, count: int = 10) -> str:
+    return " ".join("".join(rng.choices(string.ascii_lowercase, k=6)) for _ in range(count))
+
+
+# Query builders per kind. Note: the graph routes any query with a numeric
+# token to lookup, so ``like`` and ``dm`` currently exercise that path.
+QUERIES = {
+    "search": lambda rng: f"search for {rng.choice(['credit repair', 'AI tools', 'dispute letters'])}",
+    "lookup": lambda rng: f"lookup {_tweet_id(rng)}",
+    "lookup_many": lambda rng: "lookup " + " ".join(_tweet_id(rng) for _ in range(3)),
+    "post": lambda rng: f"post a new tweet: {_words(rng)}",
+    "poll": lambda rng: "create a poll: Which tool do you use? DisputeAI, ConsumerAI, Both",
+    "like": lambda rng: f"like {_tweet_id(rng)}",
+    "dm": lambda rng: f"dm {_tweet_id(rng)} thanks for checking out DisputeAI",
+}
+KINDS = sorted(QUERIES) + ["scheduled"]
+
+
+def parse_mix(text: str) -> dict:
+    """Parse ``kind=weight,...`` into a dict of weights."""
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown kind {kind!r}; choose from {', '.join(KINDS)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def rss_bytes() -> int:
+    """Get the resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Peak, in KiB on Linux
+
+
+def percentiles(values: list) -> dict:
+    """Get p50/p90/p99/max of a list of seconds."""
+    if not values:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    if len(values) == 1:
+        return {"p50": values[0], "p90": values[0], "p99": values[0], "max": values[0]}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": cuts[49], "p90": cuts[89], "p99": cuts[98], "max": max(values)}
+
+
+class LoopMonitor:
+    """Samples event-loop lag and RSS while the load runs."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lags = []
+        self.rss_start = rss_bytes()
+        self.rss_peak = self.rss_start
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+            self.rss_peak = max(self.rss_peak, rss_bytes())
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+
+class LoadRunner:
+    """Issues requests from a weighted mix and records their outcomes."""
+
+    def __init__(self, mix: dict, seed: int = 0):
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.rng = random.Random(seed)
+        self.latencies = {kind: [] for kind in self.kinds}
+        self.errors = {kind: 0 for kind in self.kinds}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._graph = None
+        self._scheduler = None
+        self._packages = ["agent"]
+
+    def setup(self, monkeypatch, server, workdir: str) -> None:
+        fakes.install(monkeypatch, server, workdir)
+        from agent.graph import graph
+
+        self._graph = graph
+        if "scheduled" in self.kinds:
+            fakes.install(monkeypatch, server, workdir, package="src.agent")
+            import scheduler
+
+            self._scheduler = scheduler
+            self._packages.append("src.agent")
+
+    async def close(self) -> None:
+        """Close the pooled HTTP sessions of the patched packages."""
+        for package in self._packages:
+            await importlib.import_module(f"{package}.clients").close_http_session()
+
+    async def request(self) -> None:
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            if kind == "scheduled":
+                await self._scheduler.run_agent()  # Reports its own failures
+                ok = True
+            else:
+                result = await self._graph.ainvoke({"query": QUERIES[kind](self.rng)})
+                ok = "Twitter Results" in result.get("analysis", "")
+        except Exception:
+            ok = False
+        finally:
+            self.in_flight -= 1
+        self.latencies[kind].append(time.perf_counter() - started)
+        if not ok:
+            self.errors[kind] += 1
+
+    async def run_closed(self, concurrency: int, deadline: float, total: int) -> None:
+        """Keep ``concurrency`` requests in flight until the deadline or total."""
+        issued = 0
+
+        async def worker():
+            nonlocal issued
+            while time.monotonic() < deadline and issued < total:
+                issued += 1
+                await self.request()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def run_open(self, rate: float, deadline: float, total: int) -> None:
+        """Start requests at ``rate`` per second until the deadline or total."""
+        started = time.monotonic()
+        tasks = set()
+        for i in range(total):
+            delay = started + i / rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if time.monotonic() >= deadline:
+                break
+            task = asyncio.create_task(self.request())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+
+def build_report(runner: LoadRunner, monitor: LoopMonitor, elapsed: float, rss_end: int,
+                 upstream: dict = None) -> dict:
+    """Summarize a finished run, with ``upstream`` Composio requests per tool."""
+    all_latencies = [s for values in runner.latencies.values() for s in values]
+    completed = len(all_latencies)
+    return {
+        "elapsed_seconds": elapsed,
+        "completed": completed,
+        "errors": sum(runner.errors.values()),
+        "throughput_per_second": completed / elapsed if elapsed else 0.0,
+        "max_in_flight": runner.max_in_flight,
+        "latency": percentiles(all_latencies),
+        "by_kind": {
+            kind: {"completed": len(values), "errors": runner.errors[kind], **percentiles(values)}
+            for kind, values in runner.latencies.items()
+        },
+        "loop_lag": percentiles(monitor.lags),
+        "upstream_calls": dict(sorted((upstream or {}).items())),
+        "memory": {
+            "rss_start_mb": monitor.rss_start / 2**20,
+            "rss_end_mb": rss_end / 2**20,
+            "rss_peak_mb": monitor.rss_peak / 2**20,
+            "growth_mb": (rss_end - monitor.rss_start) / 2**20,
+        },
+    }
+
+
+def format_report(report: dict) -> str:
+    """Render a report as a text table."""
+    lines = [
+        f"Completed {report['completed']} request(s) in {report['elapsed_seconds']:.1f}s "
+        f"({report['throughput_per_second']:.2f}/s), {report['errors']} error(s), "
+        f"max {report['max_in_flight']} in flight",
+        "",
+        f"{'kind':<14}{'count':>7}{'errors':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}",
+    ]
+    rows = sorted(report["by_kind"].items()) + [("all", {
+        "completed": report["completed"], "errors": report["errors"], **report["latency"],
+    })]
+    for kind, row in rows:
+        lines.append(
+            f"{kind:<14}{row['completed']:>7}{row['errors']:>8}"
+            + "".join(f"{row[p]:>9.3f}" for p in ("p50", "p90", "p99", "max"))
+        )
+    lag, memory = report["loop_lag"], report["memory"]
+    upstream = report["upstream_calls"]
+    lines += [
+        "",
+        f"Upstream Composio calls: {sum(upstream.values())} "
+        f"({', '.join(f'{slug} {count}' for slug, count in upstream.items()) or 'none'})",
+        f"Event-loop lag: p50 {lag['p50'] * 1000:.1f}ms, p99 {lag['p99'] * 1000:.1f}ms, "
+        f"max {lag['max'] * 1000:.1f}ms",
+        f"RSS: {memory['rss_start_mb']:.1f} -> {memory['rss_end_mb']:.1f} MiB "
+        f"(peak {memory['rss_peak_mb']:.1f}, growth {memory['growth_mb']:+.1f})",
+    ]
+    return "\n".join(lines)
+
+
+async def run_load(args) -> dict:
+    runner = LoadRunner(args.mix, seed=args.seed)
+    server = fakes.FakeComposioServer().start()
+    try:
+        with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as workdir:
+            with contextlib.redirect_stdout(io.StringIO()):
+                runner.setup(monkeypatch, server, workdir)
+            logging.getLogger().setLevel(args.log_level)  # After the graph's basicConfig
+            monitor = LoopMonitor(args.lag_interval)
+            monitor.start()
+            started = time.monotonic()
+            deadline = started + args.duration
+            # The graph and scheduler print and log per request; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                if args.rate:
+                    await runner.run_open(args.rate, deadline, args.requests)
+                else:
+                    await runner.run_closed(args.concurrency, deadline, args.requests)
+            elapsed = time.monotonic() - started
+            await monitor.stop()
+            await runner.close()
+            return build_report(runner, monitor, elapsed, rss_bytes(), server.calls)
+    finally:
+        server.stop()
+
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"kind=weight,... from {', '.join(KINDS)} (default: {DEFAULT_MIX})")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=10, help="requests kept in flight (default: 10)")
+    load.add_argument("--rate", type=float, help="requests started per second, instead of --concurrency")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run (default: 30)")
+    parser.add_argument("--requests", type=int, default=10**9, help="stop after this many requests")
+    parser.add_argument("--lag-interval", type=float, default=0.05, help="lag probe interval in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    # The report goes to stdout regardless of --log-level
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    report = asyncio.run(run_load(args))
+    logger.info(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import asyncio
+import importlib
+import random
+import string
+import time
+
+import pytest
+
+from agent import deadline, dedup, firecrawl_agent, image_pool, ledger
+from agent.accounts import get_account
+from agent.cassette import use_cassette
+from agent.ledger import get_ledger
+
+graph_module = importlib.import_module("agent.graph")
+
+pytestmark = pytest.mark.anyio
+
+INTENT_QUERIES = {
+    "search": "search for credit repair automation",
+    "lookup": "lookup 1234567890",
+    "lookup_many": "lookup 1234567890 1234567891 1234567892",
+    "poll": "create a poll: Which tool do you use? DisputeAI, ConsumerAI, Both",
+}
+
+
+def _fresh_text(round_: int) -> str:
+    """Random words, so every post passes the duplicate check."""
+    rng = random.Random(f"post-{round_}")
+    return " ".join("".join(rng.choices(string.ascii_lowercase, k=6)) for _ in range(10))
+
+
+@pytest.mark.parametrize("intent", sorted(INTENT_QUERIES))
+async def test_intent(offline_graph, bench, intent) -> None:
+    query = INTENT_QUERIES[intent]
+    result = await bench(intent, lambda i: offline_graph.ainvoke({"query": query}))
+    assert "Twitter Results" in result["analysis"]
+
+
+async def test_profile(offline_graph, bench) -> None:
+    inputs = {"query": "show my profile", "twitter_account_id": "1234567890"}
+    result = await bench("profile", lambda i: offline_graph.ainvoke(inputs))
+    assert "Twitter Results" in result["analysis"]
+
+
+async def test_post(offline_graph, bench) -> None:
+    """Full post pipeline: image, media upload, tweet, reply, video and its distribution."""
+    async def post(i):
+        return await offline_graph.ainvoke({"query": f"post a new tweet: {_fresh_text(i)}"})
+
+    result = await bench("post", post)
+    assert "Twitter Results" in result["analysis"]
+    run = get_ledger().start(result["idempotency_key"])
+    for step in ("compose", "image", "media_upload", "tweet", "reply", "video", "youtube", "tiktok", "instagram", "drive"):
+        assert run.get(step) is not None, step
+
+
+async def test_prompt(offline_graph, bench) -> None:
+    """Prompt build with a fresh Firecrawl scrape of the product pages."""
+    async def build(i):
+        firecrawl_agent.CACHE_FILE.unlink(missing_ok=True)
+        graph_module._prompt_cache.clear()
+        return graph_module.get_prompt("credit repair dispute letters")
+
+    prompt = await bench("prompt", build)
+    assert "PRODUCT KNOWLEDGE" in prompt.messages[0].prompt.template
+
+
+async def test_post_streams_progress_before_video(offline_graph) -> None:
+    events = []
+    async for mode, chunk in offline_graph.astream(
+        {"query": f"post a new tweet: {_fresh_text(100)}"}, stream_mode=["custom", "values"]
+    ):
+        if mode == "custom":
+            events.append(chunk)
+    assert [e["event"] for e in events] == [
+        "image_ready", "media_uploaded", "tweet_posted", "reply_posted", "video_ready",
+        "upload_done", "upload_done", "upload_done", "upload_done",
+    ]
+    assert {e["target"] for e in events[5:]} == {"youtube", "tiktok", "instagram", "drive"}
+
+
+async def test_post_skips_video_beyond_its_budget(offline_graph, monkeypatch) -> None:
+    """The tweet still goes out; the video is reported as degraded and left for a resume."""
+    monkeypatch.setattr(deadline, "estimate", lambda stage: 3600.0 if stage == "video_generation" else None)
+    events, result = [], {}
+    async for mode, chunk in offline_graph.astream(
+        {"query": f"post a new tweet: {_fresh_text(150)}"}, context={"budget_seconds": 600},
+        stream_mode=["custom", "values"],
+    ):
+        if mode == "custom":
+            events.append(chunk["event"])
+        else:
+            result = chunk
+    assert events[-2:] == ["reply_posted", "video_skipped"]
+    assert [d["stage"] for d in result["degraded"]] == ["video"]
+    partial = [p for p in get_ledger().incomplete_posts() if p["key"] == result["idempotency_key"]]
+    assert [p["status"] for p in partial] == ["partial"]
+    run = get_ledger().start(result["idempotency_key"])
+    assert run.get("tweet") is not None and run.get("video") is None
+    assert [d["stage"] for d in run.get("degraded")] == ["video"]
+
+
+async def test_post_takes_pooled_image(offline_graph) -> None:
+    account = get_account()
+    assert await image_pool.refill_image_pool(account, size=1) == len(image_pool.pool_themes(account))
+    result = await offline_graph.ainvoke({"query": f"post a new tweet: {_fresh_text(200)} https://disputeai.xyz"})
+    image = get_ledger().start(result["idempotency_key"]).get("image")
+    assert image["pooled"]
+    assert image_pool.pool_size(account, "DisputeAI") == 0
+
+
+async def test_concurrent_lookups_are_coalesced(offline_graph, composio_server) -> None:
+    before = dict(composio_server.calls)
+    ids = [str(1234567000 + i) for i in range(20)]
+    results = await asyncio.gather(*(offline_graph.ainvoke({"query": f"lookup {i}"}) for i in ids))
+    assert all(f'"id": "{i}"' in r["analysis"] for i, r in zip(ids, results))
+    calls = {slug: count - before.get(slug, 0) for slug, count in composio_server.calls.items()}
+    assert calls.get("TWITTER_POST_LOOKUP_BY_POST_ID", 0) == 0
+    assert calls["TWITTER_POST_LOOKUP_BY_POST_IDS"] < len(ids)
+
+
+async def test_post_replays_from_cassette(offline_graph, composio_server, monkeypatch, tmp_path) -> None:
+    """A recorded post replays offline, with the same tweet and no provider traffic."""
+    query = f"post a new tweet: {_fresh_text(300)}"
+    cassette_path = tmp_path / "post.jsonl.gz"
+    random.seed(300)
+    started = time.perf_counter()
+    with use_cassette(cassette_path, "record"):
+        recorded = await offline_graph.ainvoke({"query": query})
+    record_seconds = time.perf_counter() - started
+    tweet = get_ledger().start(recorded["idempotency_key"]).get("tweet")
+
+    # Fresh post history, so the replay composes (and dedups) the same way
+    monkeypatch.setattr(ledger, "_ledger", ledger.PostLedger(str(tmp_path / "replay_ledger.db")))
+    monkeypatch.setattr(dedup, "_indexes", {})
+    before = dict(composio_server.calls)
+    random.seed(300)
+    started = time.perf_counter()
+    with use_cassette(cassette_path, "replay", latency="fast") as cassette:
+        replayed = await offline_graph.ainvoke({"query": query})
+    replay_seconds = time.perf_counter() - started
+
+    assert dict(composio_server.calls) == before
+    assert cassette.pending() == 0
+    run = get_ledger().start(replayed["idempotency_key"])
+    assert run.get("tweet")["data"]["text"] == tweet["data"]["text"]
+    for step in ("image", "media_upload", "video", "youtube", "tiktok", "instagram", "drive"):
+        assert run.get(step) is not None, step
+    assert replay_seconds < record_seconds
@@ -0,0 +1,26 @@
+import argparse
+
+import pytest
+
+from .load import DEFAULT_MIX, format_report, parse_mix, run_load
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_load_smoke() -> None:
+    args = argparse.Namespace(
+        mix=parse_mix(DEFAULT_MIX), concurrency=4, rate=None, duration=30, requests=12, lag_interval=0.01, seed=1,
+        log_level="WARNING",
+    )
+    report = await run_load(args)
+    assert report["completed"] == 12
+    assert report["errors"] == 0
+    assert report["max_in_flight"] == 4
+    assert report["loop_lag"]["max"] >= 0
+    assert "Event-loop lag" in format_report(report)
+
+
+def test_parse_mix_rejects_unknown_kinds() -> None:
+    assert parse_mix("search=2,post") == {"search": 2.0, "post": 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix("retweet=1")
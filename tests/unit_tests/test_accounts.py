@@ -0,0 +1,67 @@
+import importlib
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agent import accounts
+from agent.accounts import DEFAULT_ACCOUNT, get_account, load_accounts
+
+graph_module = importlib.import_module("agent.graph")
+
+
+@pytest.fixture
+def accounts_file(tmp_path, monkeypatch):
+    path = tmp_path / "accounts.json"
+    monkeypatch.setattr(accounts, "ACCOUNTS_FILE", path)
+    monkeypatch.setattr(accounts, "_cache", {"mtime_ns": None, "accounts": None})
+    monkeypatch.setenv("TWITTER_CONNECTION_ID", "env-twitter")
+    monkeypatch.setenv("UPLOADPOST_USER", "env-uploadpost")
+    path.write_text(json.dumps({"accounts": [
+        {"name": "brand", "twitter_connection_id": "brand-twitter", "twitter_account_id": "brand-account",
+         "max_concurrency": 2, "typo_field": 1},
+        {"twitter_connection_id": "nameless-twitter", "twitter_account_id": "nameless-account"},
+        {"name": "partial", "twitter_connection_id": "partial-twitter"},
+    ]}), encoding="utf-8")
+    return path
+
+
+def test_accounts_are_loaded_from_the_file(accounts_file) -> None:
+    loaded = load_accounts()
+    assert set(loaded) == {DEFAULT_ACCOUNT, "brand"}
+    brand = loaded["brand"]
+    assert (brand.twitter_connection_id, brand.max_concurrency) == ("brand-twitter", 2)
+    assert load_accounts() is loaded  # Unchanged file, cached
+
+
+def test_file_accounts_never_inherit_credentials(accounts_file) -> None:
+    brand = get_account("brand")
+    assert brand.uploadpost_user is None  # Not the default account's env-uploadpost
+    assert brand.google_connection_id == "brand-twitter"
+    assert (get_account().twitter_connection_id, get_account().uploadpost_user) == ("env-twitter", "env-uploadpost")
+
+
+def test_invalid_entries_are_skipped(accounts_file) -> None:
+    assert set(load_accounts()) == {DEFAULT_ACCOUNT, "brand"}  # No name, or no Twitter account
+    assert get_account().twitter_connection_id == "env-twitter"  # Not replaced by the nameless entry
+
+
+def test_missing_file_leaves_the_default_account(accounts_file) -> None:
+    accounts_file.unlink()
+    assert set(load_accounts()) == {DEFAULT_ACCOUNT}
+
+
+def test_invocation_context_selects_the_account(accounts_file) -> None:
+    state = graph_module.State(query="show my profile", account="brand")
+    runtime = SimpleNamespace(context={"account": DEFAULT_ACCOUNT})
+    assert graph_module._resolve_account(state, runtime).name == DEFAULT_ACCOUNT  # Context wins
+    assert graph_module._resolve_account(state, SimpleNamespace(context=None)).name == "brand"
+    assert graph_module._resolve_account(graph_module.State(), SimpleNamespace()).name == DEFAULT_ACCOUNT
+
+
+def test_unknown_account_is_rejected(accounts_file) -> None:
+    with pytest.raises(ValueError, match="Unknown account: ghost"):
+        get_account("ghost")
+    runtime = SimpleNamespace(context={"account": "ghost"})
+    with pytest.raises(ValueError):
+        graph_module._resolve_account(graph_module.State(), runtime)
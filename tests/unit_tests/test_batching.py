@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from agent.batching import BatchLoader
+
+pytestmark = pytest.mark.anyio
+
+
+class Upstream:
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, keys):
+        self.batches.append(keys)
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return {k: f"value-{k}" for k in keys if k != "missing"}
+
+
+async def test_concurrent_loads_share_one_batch() -> None:
+    upstream = Upstream()
+    loader = BatchLoader(upstream, "test", window=0.01)
+    results = await asyncio.gather(*(loader.load(k) for k in ["a", "b", "a", "missing"]))
+    assert results == ["value-a", "value-b", "value-a", None]
+    assert upstream.batches == [["a", "b", "missing"]]
+
+
+async def test_full_batch_dispatches_without_waiting_for_the_window() -> None:
+    upstream = Upstream()
+    loader = BatchLoader(upstream, "test", max_batch_size=3, window=10)
+    results = await asyncio.wait_for(loader.load_many([str(i) for i in range(6)]), 1)
+    assert results == [f"value-{i}" for i in range(6)]
+    assert [len(b) for b in upstream.batches] == [3, 3]
+
+
+async def test_batch_failure_reaches_every_caller() -> None:
+    loader = BatchLoader(Upstream(fail=True), "test", window=0)
+    results = await asyncio.gather(loader.load("a"), loader.load("b"), return_exceptions=True)
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+
+async def test_cancelled_caller_does_not_cancel_the_batch() -> None:
+    upstream = Upstream()
+    loader = BatchLoader(upstream, "test", window=0.01)
+    first = asyncio.create_task(loader.load("a"))
+    second = asyncio.create_task(loader.load("a"))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "value-a"
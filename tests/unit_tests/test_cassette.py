@@ -0,0 +1,119 @@
+import gzip
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.cassette import Cassette, CassetteMiss, ReplayedError, recorded, use_cassette
+from agent.rate_limit import RetryableError, error_status
+
+pytestmark = pytest.mark.anyio
+
+
+def unreachable(*args, **kwargs):
+    raise AssertionError("Replay must not call the provider")
+
+
+async def aunreachable(*args, **kwargs):
+    raise AssertionError("Replay must not call the provider")
+
+
+async def test_replays_responses_with_recorded_or_no_latency(tmp_path) -> None:
+    path = tmp_path / "calls.jsonl.gz"
+
+    async def chat(messages):
+        time.sleep(0.05)
+        return AIMessage(content=f"reply to {messages[0].content}")
+
+    def scrape(url, formats=None):
+        return {"markdown": f"# {url}", "raw": b"\x00\x01"}
+
+    with use_cassette(path, "record"):
+        assert (await recorded("gemini", "chat", chat)([HumanMessage(content="hi")])).content == "reply to hi"
+        scrape = recorded("firecrawl", "scrape", scrape)
+        assert scrape("https://a.example", formats=["markdown"])["markdown"] == "# https://a.example"
+
+    with use_cassette(path, "replay") as cassette:
+        started = time.perf_counter()
+        message = await recorded("gemini", "chat", aunreachable)([HumanMessage(content="hi")])
+        assert time.perf_counter() - started >= 0.05
+        assert isinstance(message, AIMessage) and message.content == "reply to hi"
+        page = recorded("firecrawl", "scrape", unreachable)("https://a.example", formats=["markdown"])
+        assert page == {"markdown": "# https://a.example", "raw": b"\x00\x01"}
+        assert cassette.pending() == 0
+
+    with use_cassette(path, "replay", latency="fast"):
+        started = time.perf_counter()
+        await recorded("gemini", "chat", aunreachable)([HumanMessage(content="hi")])
+        assert time.perf_counter() - started < 0.05
+
+
+def test_unmatched_requests_replay_in_recorded_order(tmp_path) -> None:
+    path = tmp_path / "calls.jsonl.gz"
+    with use_cassette(path, "record"):
+        for prompt in ("first 1234", "second 5678"):
+            recorded("gemini", "title", str.upper)(prompt)
+
+    with use_cassette(path, "replay"):
+        assert recorded("gemini", "title", unreachable)("second 5678") == "SECOND 5678"  # Exact
+        assert recorded("gemini", "title", unreachable)("first 9999") == "FIRST 1234"  # Next unused
+        with pytest.raises(CassetteMiss):
+            recorded("gemini", "title", unreachable)("third")
+
+
+def test_errors_replay_with_their_status(tmp_path) -> None:
+    path = tmp_path / "calls.jsonl.gz"
+
+    class QuotaError(Exception):
+        status_code = 429
+
+    def fail(error):
+        raise error
+
+    with use_cassette(path, "record"):
+        for error in (RetryableError(503, "busy", retry_after=2), TimeoutError("slow"), QuotaError("quota")):
+            with pytest.raises(type(error)):
+                recorded("composio", "TWITTER_CREATION_OF_A_POST", fail)(error)
+
+    with use_cassette(path, "replay"):
+        replay = recorded("composio", "TWITTER_CREATION_OF_A_POST", unreachable)
+        with pytest.raises(RetryableError) as retryable:
+            replay()
+        assert (retryable.value.status, retryable.value.retry_after, str(retryable.value)) == (503, 2, "HTTP 503: busy")
+        with pytest.raises(TimeoutError, match="slow"):
+            replay()
+        with pytest.raises(ReplayedError, match="quota") as other:
+            replay()
+        assert error_status(other.value) == 429
+
+
+def test_written_files_are_stored_once_and_restored(tmp_path) -> None:
+    path = tmp_path / "calls.jsonl.gz"
+    video = tmp_path / "videos" / "reel.mp4"
+
+    def generate(prompt):
+        video.parent.mkdir(exist_ok=True)
+        video.write_bytes(b"video" * 1000)
+        return str(video)
+
+    with use_cassette(path, "record"):
+        for _ in range(2):
+            recorded("veo", "generate_video", generate, files=True)("prompt")
+    with gzip.open(path, "rt") as f:
+        assert sum('"blob"' in line for line in f) == 1
+
+    video.unlink()
+    with use_cassette(path, "replay"):
+        assert recorded("veo", "generate_video", unreachable, files=True)("prompt") == str(video)
+    assert video.read_bytes() == b"video" * 1000
+
+
+def test_interrupted_recording_is_replayable(tmp_path) -> None:
+    path = tmp_path / "calls.jsonl.gz"
+    cassette = Cassette(path, "record")  # Never closed, as when the process is killed
+    cassette.record("uploadpost", "upload_video", {}, time.perf_counter(), 0.1, {"success": True})
+    assert Cassette(path, "replay").take("uploadpost", "upload_video", {})["response"] == {"success": True}
+
+
+def test_no_cassette_leaves_calls_untouched() -> None:
+    assert recorded("gemini", "chat", unreachable) is unreachable
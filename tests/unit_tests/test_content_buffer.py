@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.prompts import ChatPromptTemplate
+
+from agent import content_buffer, dedup, ledger, resilience
+from agent.accounts import Account
+from agent.content_buffer import (
+    ContentBuffer,
+    generate_tweets,
+    next_tweet,
+    validate_tweet,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class BatchModel:
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return SimpleNamespace(tweets=self.batches.pop(0))
+
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_buffer, "_buffer", ContentBuffer(str(tmp_path / "content.db")))
+    monkeypatch.setattr(content_buffer, "_refills", {})
+    monkeypatch.setattr(content_buffer, "get_prompt", lambda query, config_path: ChatPromptTemplate.from_messages(
+        [("system", "You write tweets."), ("human", "{input}"), ("placeholder", "{agent_scratchpad}")]
+    ))
+    monkeypatch.setattr(ledger, "_ledger", ledger.PostLedger(str(tmp_path / "ledger.db")))
+    monkeypatch.setattr(dedup, "_indexes", {})
+    monkeypatch.setattr(resilience, "_breakers", {})
+
+
+def test_validate_tweet() -> None:
+    assert validate_tweet('  "yo   this works"  ', "https://a.b", "#AI") == "yo this works https://a.b #AI"
+    assert validate_tweet("see https://x.y #Tag", "https://a.b", "#AI") == "see https://x.y #Tag"
+    assert validate_tweet("   ") is None
+    assert validate_tweet("x" * 300) is None
+
+
+def test_buffer_is_fifo_per_account_and_persistent(tmp_path) -> None:
+    buffer = ContentBuffer(str(tmp_path / "content.db"))
+    buffer.push("a", ["first", "second"])
+    buffer.push("b", ["other"])
+    assert buffer.pop("a") == "first"
+    reopened = ContentBuffer(str(tmp_path / "content.db"))
+    assert reopened.size("a") == 1
+    assert reopened.pop("a") == "second"
+    assert reopened.pop("a") is None
+    assert reopened.pop("b") == "other"
+
+
+async def test_generate_tweets_drops_invalid_and_duplicate_candidates(isolated) -> None:
+    model = BatchModel([[
+        "real talk - dispute letters in minutes with this AI",
+        "real talk - dispute letters in minutes with this AI!!",
+        "x" * 300,
+        "just automated my whole credit dispute process, wild",
+    ]])
+    tweets = await generate_tweets(Account(), count=4, model=model)
+    assert len(tweets) == 2
+    assert all("http" in t and "#" in t for t in tweets)
+
+
+async def test_next_tweet_fills_empty_buffer_then_refills_below_low_water(isolated, monkeypatch) -> None:
+    model = BatchModel([
+        ["yo check this AI credit tool", "ngl dispute letters got easy", "automation saved my weekend"],
+        ["behind the scenes of building agents", "quick credit win for today", "ask me anything about AI"],
+    ])
+    monkeypatch.setattr(content_buffer, "_model", model)
+    monkeypatch.setattr(content_buffer, "CONTENT_LOW_WATER", 3)
+    account = Account()
+
+    first = await next_tweet(account)
+    assert first.startswith("yo check this AI credit tool")
+    assert model.calls == 1
+    await content_buffer._refills[account.name]  # Background refill below the low-water mark
+    assert model.calls == 2
+    assert content_buffer.get_content_buffer().size(account.name) == 5
+
+
+async def test_next_tweet_returns_none_when_generation_fails(isolated, monkeypatch) -> None:
+    class Failing:
+        async def ainvoke(self, messages):
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(content_buffer, "_model", Failing())
+    assert await next_tweet(Account()) is None
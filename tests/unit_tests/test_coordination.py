@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from agent.coordination import LeaseStore, SQLiteLeaseStore
+
+
+def test_lease_is_exclusive_until_expiry(tmp_path) -> None:
+    store = SQLiteLeaseStore(str(tmp_path / "coord.db"))
+    assert store.acquire("leader", "a", ttl=60)
+    assert not store.acquire("leader", "b", ttl=60)
+    assert store.acquire("leader", "a", ttl=60)
+    store.release("leader", "a")
+    assert store.acquire("leader", "b", ttl=-1)
+    assert store.acquire("leader", "a", ttl=60)
+
+
+def test_work_items_are_claimed_once(tmp_path) -> None:
+    store = SQLiteLeaseStore(str(tmp_path / "coord.db"))
+    assert store.enqueue("media", "k1", {"n": 1})
+    assert not store.enqueue("media", "k1", {"n": 2})
+    item = store.claim("media", "a", ttl=60)
+    assert item == {"key": "k1", "payload": {"n": 1}, "attempts": 1}
+    assert store.claim("media", "b", ttl=60) is None
+    store.fail("media", "k1", "a", "boom")
+    assert store.claim("media", "b", ttl=60)["attempts"] == 2
+    store.complete("media", "k1", "b")
+    assert store.claim("media", "a", ttl=60) is None
+
+
+def test_abandoned_lease_is_reclaimed(tmp_path) -> None:
+    store = SQLiteLeaseStore(str(tmp_path / "coord.db"))
+    store.enqueue("media", "k1", {})
+    assert store.claim("media", "a", ttl=-1)
+    assert store.claim("media", "b", ttl=60)["key"] == "k1"
+
+
+def test_item_abandoned_on_its_last_attempt_fails(tmp_path) -> None:
+    path = str(tmp_path / "coord.db")
+    store = SQLiteLeaseStore(path)
+    store.enqueue("media", "k1", {})
+    assert store.claim("media", "a", ttl=-1, max_attempts=1)
+    assert store.claim("media", "b", ttl=60, max_attempts=1) is None
+    with sqlite3.connect(path) as conn:
+        status, error = conn.execute("SELECT status, error FROM work_items WHERE key = 'k1'").fetchone()
+    assert (status, error) == ("failed", "Lease expired on the last attempt")
+
+
+def test_lease_store_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        LeaseStore()
+
+
+def test_renew_keeps_a_lease_only_while_owned(tmp_path) -> None:
+    store = SQLiteLeaseStore(str(tmp_path / "coord.db"))
+    store.enqueue("media", "k1", {})
+    store.claim("media", "a", ttl=-1)
+    assert store.renew("media", "k1", "a", ttl=60)
+    assert store.claim("media", "b", ttl=60) is None
+    assert not store.renew("media", "k1", "b", ttl=60)
+    store.renew("media", "k1", "a", ttl=-1)
+    assert store.claim("media", "b", ttl=60)["key"] == "k1"
+    assert not store.renew("media", "k1", "a", ttl=60)
+
+
+def test_merge_max_keeps_the_latest_value_per_key(tmp_path) -> None:
+    store = SQLiteLeaseStore(str(tmp_path / "coord.db"))
+    assert store.merge_max("runs", {"post": 10, "media": 5}) == {"post": 10, "media": 5}
+    assert store.merge_max("runs", {"media": 7, "post": 3}) == {"post": 10, "media": 7}
+    assert store.get_value("runs") == {"post": 10, "media": 7}
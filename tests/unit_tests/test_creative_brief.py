@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+from agent import creative_brief, deadline, media_pipeline, resilience
+from agent.creative_brief import CreativeBrief, PlatformCaptions
+from agent.resilience import CircuitBreaker
+from agent.video_agent import FALLBACK_VIDEO_PROMPT
+from agent.youtube_metadata_agent import FALLBACK_TITLE
+
+TWEET = "Stop paying for credit repair. #DisputeAI drafts the letters for you https://disputeai.xyz 🚀"
+
+
+class Model:
+    def __init__(self, brief=None, error=None, delay=0):
+        self.brief = brief
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.brief
+
+
+class Run:
+    def __init__(self, **steps):
+        self.steps = steps
+
+    def get(self, step):
+        return self.steps.get(step)
+
+    def record(self, step, output):
+        self.steps[step] = output
+
+
+BRIEF = CreativeBrief(
+    image_prompt="**AI dashboard** drafting #dispute letters",
+    video_prompt="Dolly shot of a laptop drafting letters.  Audio: upbeat synth.",
+    youtube_title='"AI Writes Your Dispute Letters"',
+    captions=PlatformCaptions(tiktok="AI writes your dispute letters #CreditRepair", instagram="x" * 500),
+)
+
+
+def test_brief_fields_are_cleaned() -> None:
+    brief = creative_brief.generate_creative_brief(TWEET, model=Model(BRIEF))
+    assert brief == {
+        "image_prompt": "AI dashboard drafting dispute letters",
+        "video_prompt": "Dolly shot of a laptop drafting letters. Audio: upbeat synth.",
+        "youtube_title": "AI Writes Your Dispute Letters",
+        "captions": {"tiktok": "AI writes your dispute letters #CreditRepair"},  # Instagram's is too long
+        "fallbacks": [],
+    }
+
+
+def test_unusable_fields_fall_back_one_by_one() -> None:
+    partial = BRIEF.model_copy(update={"image_prompt": "#", "youtube_title": "Watch https://spam.example"})
+    brief = creative_brief.generate_creative_brief(TWEET, product_name="DisputeAI", model=Model(partial))
+    assert brief["fallbacks"] == ["image_prompt", "youtube_title"]
+    assert brief["image_prompt"].startswith("Modern AI and credit repair tech image: Stop paying")
+    assert brief["image_prompt"].endswith("Featuring 'DisputeAI'.")
+    assert brief["youtube_title"] == FALLBACK_TITLE
+    assert brief["video_prompt"].startswith("Dolly shot")
+
+
+def test_failed_call_falls_back_entirely() -> None:
+    brief = creative_brief.generate_creative_brief(TWEET, model=Model(error=ConnectionError("down")))
+    assert brief["fallbacks"] == ["image_prompt", "video_prompt", "youtube_title"]
+    assert brief["video_prompt"] == FALLBACK_VIDEO_PROMPT
+    assert brief["captions"] == {}
+
+
+def test_slow_call_falls_back_at_the_run_deadline(monkeypatch) -> None:
+    monkeypatch.setattr(deadline, "DEADLINE_MIN_TIMEOUT", 0)
+    monkeypatch.setitem(resilience._breakers, "gemini", CircuitBreaker("gemini"))
+    started = time.perf_counter()
+    with deadline.run_deadline(0.05):
+        brief = creative_brief.generate_creative_brief(TWEET, model=Model(BRIEF, delay=1))
+    assert time.perf_counter() - started < 0.5
+    assert brief["fallbacks"] == ["image_prompt", "video_prompt", "youtube_title"]
+
+
+def test_post_brief_is_generated_once_per_run(monkeypatch) -> None:
+    model = Model(BRIEF)
+    monkeypatch.setattr(creative_brief, "_model", model)
+    run = Run()
+    first = creative_brief.get_post_brief(TWEET, run)
+    assert creative_brief.get_post_brief(TWEET, run) == first == run.get("brief")
+    assert model.calls == 1
+
+
+@pytest.fixture
+def video_stage(monkeypatch, tmp_path):
+    calls = {}
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"video")
+
+    def generate_video(tweet_text, image_path=None, video_prompt=None):
+        calls["video_prompt"] = video_prompt
+        return str(video)
+
+    def metadata(tweet_text, title=None):
+        calls["title"] = title
+        return {"title": title, "description": "Description"}
+
+    def distribute(video_path, metadata, account, targets=None, on_result=None):
+        calls["metadata"] = metadata
+        return {"results": {}, "seconds": 0.0}
+
+    monkeypatch.setattr(media_pipeline, "generate_video_from_tweet", generate_video)
+    monkeypatch.setattr(media_pipeline, "generate_youtube_metadata", metadata)
+    monkeypatch.setattr(media_pipeline, "distribute_video", distribute)
+    monkeypatch.setattr(media_pipeline, "hash_file", lambda path: "sha")
+    return calls
+
+
+def test_video_stage_takes_its_fields_from_the_brief(video_stage, monkeypatch) -> None:
+    model = Model(error=AssertionError("The recorded brief must be reused"))
+    monkeypatch.setattr(creative_brief, "_model", model)
+    brief = creative_brief.finalize_brief(BRIEF, TWEET)
+    media_pipeline.produce_video_assets(TWEET, None, run=Run(brief=brief))
+    assert model.calls == 0
+    assert video_stage["video_prompt"] == brief["video_prompt"]
+    assert video_stage["title"] == "AI Writes Your Dispute Letters"
+    assert video_stage["metadata"]["tiktok"]["title"] == "AI writes your dispute letters #CreditRepair"
+    assert video_stage["metadata"]["instagram"]["title"] == TWEET
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from agent import deadline, resilience
+from agent.deadline import current_deadline, run_deadline
+from agent.metrics import STAGE_SECONDS
+from agent.resilience import CircuitBreaker
+
+pytestmark = pytest.mark.anyio
+
+
+def test_stages_run_only_while_their_p90_fits() -> None:
+    for _ in range(10):
+        STAGE_SECONDS.observe(4.0, stage="deadline_test_slow")
+    with run_deadline(3) as run:
+        assert deadline.allows("deadline_test_unobserved")
+        assert not deadline.allows("deadline_test_slow", "video")
+    assert [d["stage"] for d in run.degraded] == ["video"]
+    assert run.degraded[0]["estimate"] > run.degraded[0]["remaining"]
+    assert deadline.DEGRADED_STAGES.value(stage="video") >= 1
+
+    with run_deadline(10) as run:
+        assert deadline.allows("deadline_test_slow")
+    assert not run.degraded
+
+
+def test_no_budget_means_no_deadline() -> None:
+    with run_deadline(0) as run:
+        assert run is None and current_deadline() is None
+        assert deadline.allows("deadline_test_slow")
+        assert deadline.cap(60) == 60
+
+
+def test_timeouts_are_capped_at_the_time_left(monkeypatch) -> None:
+    monkeypatch.setattr(deadline, "DEADLINE_MIN_TIMEOUT", 5)
+    with run_deadline(30):
+        assert 29 < resilience.budget_timeout("veo") <= 30
+        assert resilience.budget_timeout("gemini", 20) == 20
+    with run_deadline(1):
+        assert resilience.budget_timeout("veo") == 5  # Floor, so required calls still get a chance
+    assert resilience.budget_timeout("veo") == resilience.get_timeout("veo")
+
+
+async def test_async_calls_stop_at_the_deadline(monkeypatch) -> None:
+    monkeypatch.setattr(deadline, "DEADLINE_MIN_TIMEOUT", 0)
+    monkeypatch.setitem(resilience._breakers, "deadline_async", CircuitBreaker("deadline_async"))
+    started = time.perf_counter()
+    with run_deadline(0.05), pytest.raises(TimeoutError):
+        await resilience.call_async("deadline_async", asyncio.sleep, 1)
+    assert time.perf_counter() - started < 0.5
+
+
+def test_blocking_calls_see_the_run_deadline(monkeypatch) -> None:
+    monkeypatch.setitem(resilience._breakers, "deadline_sync", CircuitBreaker("deadline_sync"))
+    with run_deadline(30) as run:
+        assert resilience.call("deadline_sync", current_deadline, timeout=5) is run  # On a worker thread
+
+
+async def test_non_idempotent_calls_are_not_cut_off_by_the_deadline(monkeypatch) -> None:
+    monkeypatch.setattr(deadline, "DEADLINE_MIN_TIMEOUT", 0)
+    monkeypatch.setitem(resilience._breakers, "deadline_post", CircuitBreaker("deadline_post"))
+    with run_deadline(0.01):
+        await resilience.call_async("deadline_post", asyncio.sleep, 0.1, timeout=5, idempotent=False)
+        assert resilience.call("deadline_post", time.sleep, 0.1, timeout=5, idempotent=False) is None
+        with pytest.raises(TimeoutError):
+            resilience.call("deadline_post", time.sleep, 0.1, timeout=5)
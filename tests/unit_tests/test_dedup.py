@@ -0,0 +1,69 @@
+import importlib
+import random
+import string
+
+import pytest
+
+from agent import dedup
+from agent.accounts import Account
+from agent.dedup import DuplicateIndex, normalize, simhash
+
+
+def test_normalize_strips_volatile_parts() -> None:
+    assert normalize("Yo check THIS out 4821 https://fdwa.site 🚀 #AI @omni") == "yo check this out"
+
+
+def test_near_duplicates_are_found() -> None:
+    index = DuplicateIndex(max_distance=3)
+    index.add("yo check out this AI credit repair tool - been using it and it actually works 1234 https://a.io 🚀 #AI")
+    assert index.find("yo check out this AI credit repair tool - been using it and it actually works 9876 https://b.io 🔥 #Credit")
+    assert index.find("this AI literally writes dispute letters for you - game changer") is None
+
+
+def test_text_without_words_is_never_a_duplicate() -> None:
+    index = DuplicateIndex(max_distance=3)
+    assert simhash("https://fdwa.site #AI 100") is None
+    assert index.add("https://fdwa.site #AI 100") is None
+    assert len(index) == 0
+    assert index.find("https://disputeai.xyz #Credit 200") is None
+
+
+@pytest.mark.anyio
+async def test_composed_tweets_are_indexed_only_once_posted(monkeypatch) -> None:
+    graph_module = importlib.import_module("agent.graph")
+    index = DuplicateIndex()
+    monkeypatch.setattr(dedup, "_indexes", {"dedup-test": index})
+    query = "post a new tweet: yo check out this AI credit repair tool - been using it and it actually works"
+    for _ in range(2):  # The first one was never posted, so it does not block the second
+        composed = await graph_module._compose_unique_tweet(query, [], Account(name="dedup-test"))
+        assert composed["simhash"] == simhash(composed["tweet_text"])
+    assert len(index) == 0
+
+
+def test_lookup_scales_with_large_history() -> None:
+    rng = random.Random(0)
+    index = DuplicateIndex(max_distance=3)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))) for _ in range(2000)]
+    texts = [" ".join(rng.choices(words, k=15)) for _ in range(5000)]
+    for text in texts:
+        index.add(text)
+    assert index.find(texts[1234]) == texts[1234]
+    # Each lookup only compares against its band buckets, not the history
+    buckets = index._band_keys(simhash(texts[1234]))
+    assert sum(len(b[k]) for b, k in zip(index._buckets, buckets)) < 50
+
+
+def test_history_includes_every_published_tweet(monkeypatch, tmp_path) -> None:
+    from agent.ledger import PostLedger
+
+    ledger = PostLedger(str(tmp_path / "ledger.db"))
+    for key, status, posted in [("done", "done", True), ("partial", "partial", True),
+                                ("crashed", "in_progress", True), ("unposted", "in_progress", False)]:
+        run = ledger.start(key, "history-test")
+        run.record("compose", {"tweet_text": f"tweet from the {key} post"})
+        if posted:
+            run.record("tweet", {"tweet_id": key})
+        run.finish(status)
+    monkeypatch.setattr(dedup, "get_ledger", lambda: ledger)
+    monkeypatch.setattr(dedup, "_indexes", {})
+    assert len(dedup.get_duplicate_index("history-test")) == 3
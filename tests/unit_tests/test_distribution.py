@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from agent import deadline, distribution
+from agent.accounts import Account
+from agent.deadline import run_deadline
+
+ACCOUNT = Account(name="main", uploadpost_user="brand", googledrive_connection_id="drive")
+METADATA = distribution.platform_metadata("Title", "Long description", "short caption #AI")
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def uploadpost(video_path, title, description, platforms, user, **overrides):
+        with lock:
+            calls.append(("uploadpost", platforms, overrides))
+        time.sleep(0.2)
+        return {"success": True, "response": {"results": {
+            "youtube": {"success": True, "url": "https://youtube.example/v"},
+            "tiktok": {"success": False, "error": "Rejected"},
+            "instagram": {"success": True, "url": "https://instagram.example/v"},
+        }}}
+
+    def drive(video_path, title, description, connected_account_id=None):
+        with lock:
+            calls.append(("drive", title, description))
+        time.sleep(0.2)
+        return {"success": True, "response": {"id": "file"}}
+
+    monkeypatch.setattr(distribution, "upload_video_multiplatform", uploadpost)
+    monkeypatch.setattr(distribution, "upload_video_to_drive", drive)
+    monkeypatch.setattr(distribution, "is_available", lambda dependency: True)
+    return calls
+
+
+def test_uploads_run_concurrently_and_aggregate_per_platform(uploads) -> None:
+    finished = []
+    started = time.perf_counter()
+    result = distribution.distribute_video(
+        "video.mp4", METADATA, ACCOUNT, ["youtube", "tiktok", "instagram", "drive"],
+        on_result=lambda target, r: finished.append(target),
+    )
+    assert time.perf_counter() - started < 0.35  # The slowest upload, not the sum
+    assert result["seconds"] < 0.35
+    results = result["results"]
+    assert {t: r["success"] for t, r in results.items()} == {
+        "youtube": True, "tiktok": False, "instagram": True, "drive": True,
+    }
+    assert results["tiktok"]["error"] == "Rejected"
+    assert all(r["seconds"] >= 0.2 for r in results.values())
+    assert sorted(finished) == ["drive", "instagram", "tiktok", "youtube"]
+
+    # One UploadPost request for all its platforms, with per-platform overrides
+    [(_, platforms, overrides)] = [c for c in uploads if c[0] == "uploadpost"]
+    assert platforms == ["youtube", "tiktok", "instagram"]
+    assert overrides["youtube_description"] == "Long description"
+    assert overrides["tiktok_title"] == "short caption #AI"
+
+
+def test_only_pending_targets_are_uploaded(uploads) -> None:
+    result = distribution.distribute_video("video.mp4", METADATA, ACCOUNT, ["drive"])
+    assert list(result["results"]) == ["drive"]
+    assert [c[0] for c in uploads] == ["drive"]
+
+
+def test_failures_and_unavailable_dependencies_are_reported(uploads, monkeypatch) -> None:
+    def broken(*args, **kwargs):
+        raise ConnectionError("reset")
+
+    monkeypatch.setattr(distribution, "upload_video_to_drive", broken)
+    monkeypatch.setattr(distribution, "is_available", lambda dependency: dependency != "uploadpost")
+    results = distribution.distribute_video("video.mp4", METADATA, ACCOUNT, ["youtube", "drive"])["results"]
+    assert results["youtube"] == {"success": False, "error": "UploadPost is unavailable", "seconds": 0.0}
+    assert results["drive"]["success"] is False
+    assert results["drive"]["error"] == "reset"
+    assert not uploads
+
+
+def test_targets_without_account_credentials_are_skipped(uploads) -> None:
+    account = Account(name="brand", uploadpost_user="brand")
+    results = distribution.distribute_video("video.mp4", METADATA, account, ["youtube", "drive"])["results"]
+    assert results["drive"] == {"success": False, "error": "No Google Drive connection", "seconds": 0.0}
+    assert results["youtube"]["success"] is True
+    assert [c[0] for c in uploads] == ["uploadpost"]
+
+
+def test_uploads_that_dont_fit_the_run_budget_are_skipped(uploads, monkeypatch) -> None:
+    monkeypatch.setattr(deadline, "estimate", lambda stage: 600.0 if stage == "drive_upload" else 0.1)
+    with run_deadline(60) as run:
+        results = distribution.distribute_video("video.mp4", METADATA, ACCOUNT, ["youtube", "drive"])["results"]
+    assert results["youtube"]["success"] is True
+    assert results["drive"] == {"success": False, "error": "Not enough run budget left", "seconds": 0.0}
+    assert [d["stage"] for d in run.degraded] == ["drive"]
+    assert [c[0] for c in uploads] == ["uploadpost"]
+
+
+def test_caption_is_truncated() -> None:
+    metadata = distribution.platform_metadata("Title", "Description", "x" * 300)
+    assert len(metadata["tiktok"]["title"]) == distribution.CAPTION_LENGTH
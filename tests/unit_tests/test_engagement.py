@@ -0,0 +1,61 @@
+import importlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from agent import engagement
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+
+def tweet(i: int, likes: int = 0, replies: int = 0, hours: float = 1.0) -> dict:
+    created = (NOW - timedelta(hours=hours)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    return {"id": str(i), "created_at": created, "public_metrics": {"like_count": likes, "reply_count": replies}}
+
+
+def test_page_arrays_defaults_missing_fields() -> None:
+    arrays = engagement.page_arrays([tweet(1, likes=5, hours=3), {"id": "2"}], now=NOW)
+    assert arrays["likes"].tolist() == [5, 0]
+    assert arrays["retweets"].tolist() == [0, 0]
+    assert arrays["age_hours"].tolist() == [3, 0]
+
+
+def test_velocity_favors_fresh_tweets() -> None:
+    arrays = engagement.page_arrays([tweet(1, likes=100, hours=48), tweet(2, likes=20, hours=1)], now=NOW)
+    assert np.argmax(engagement.score(arrays, "engagement")) == 0
+    assert np.argmax(engagement.score(arrays, "velocity")) == 1
+    with pytest.raises(ValueError):
+        engagement.score(arrays, "popularity")
+
+
+def test_streaming_top_k_matches_a_full_sort() -> None:
+    rng = np.random.default_rng(0)
+    tweets = [tweet(i, likes=int(rng.integers(0, 1000)), replies=int(rng.integers(0, 50)),
+                    hours=float(rng.uniform(0, 160))) for i in range(2000)]
+    pages = [tweets[i:i + 100] for i in range(0, len(tweets), 100)]
+    ranked = engagement.rank_tweets(pages, k=10, now=NOW)
+    scores = engagement.score(engagement.page_arrays(tweets, now=NOW))
+    assert [t["id"] for t in ranked] == [tweets[i]["id"] for i in np.argsort(-scores, kind="stable")[:10]]
+    assert ranked[0]["engagement_score"] >= ranked[-1]["engagement_score"]
+    assert engagement.rank_tweets(pages, k=0) == []
+
+
+async def test_search_scans_pages_until_exhausted(monkeypatch) -> None:
+    graph_module = importlib.import_module("agent.graph")
+    requests = []
+
+    async def fake_call(tool_name, query=None, params=None, account=None):
+        requests.append(params)
+        page = len(requests)
+        meta = {"next_token": f"page-{page + 1}"} if page < 2 else {}
+        return {"successful": True, "data": {"data": [tweet(page * 10 + i, likes=page * 10 + i) for i in range(5)],
+                                             "meta": meta}}
+
+    monkeypatch.setattr(graph_module, "call_composio_tool", fake_call)
+    result = await graph_module.search_engagement_candidates("credit repair", pages=5, k=3)
+    assert [p.get("next_token") for p in requests] == [None, "page-2"]
+    assert result["data"]["meta"] == {"result_count": 10, "pages": 2}
+    assert [t["id"] for t in result["data"]["data"]] == ["24", "23", "22"]
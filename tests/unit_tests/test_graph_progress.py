@@ -0,0 +1,55 @@
+import importlib
+
+import pytest
+
+from agent import accounts, ledger
+
+graph_module = importlib.import_module("agent.graph")
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def stubbed_providers(monkeypatch, tmp_path):
+    image = tmp_path / "image.png"
+    image.write_bytes(b"image")
+    monkeypatch.setattr(accounts, "ACCOUNTS_FILE", tmp_path / "accounts.json")
+    monkeypatch.setattr(accounts, "_cache", {"mtime_ns": None, "accounts": None})
+    monkeypatch.setenv("TWITTER_CONNECTION_ID", "twitter")
+    monkeypatch.setattr(ledger, "_ledger", ledger.PostLedger(str(tmp_path / "post_ledger.db")))
+    monkeypatch.setattr(graph_module, "COMPOSIO_API_KEY", "key")
+    monkeypatch.setattr(graph_module, "llm", object())
+
+    async def compose(query, ids, account):
+        return {"tweet_text": "Hello", "params": {"text": "Hello"}, "is_poll": False, "unique_id": "u1"}
+
+    async def optimize(path, platform):
+        return {"path": path, "sha256": "sha", "bytes": 5}
+
+    async def composio_tool(name, params=None, account=None):
+        return {"successful": True}
+
+    def produce_video(tweet_text, image_path, account, run, progress):
+        progress("video_ready", video_path="video.mp4")
+
+    monkeypatch.setattr(graph_module, "_compose_unique_tweet", compose)
+    monkeypatch.setattr(graph_module, "take_pooled_image", lambda *args: None)
+    monkeypatch.setattr(graph_module, "get_post_brief", lambda tweet_text, run: {"image_prompt": "Prompt"})
+    monkeypatch.setattr(graph_module, "generate_image", lambda *args, **kwargs: str(image))
+    monkeypatch.setattr(graph_module, "optimize_image", optimize)
+    monkeypatch.setattr(graph_module, "_upload_media", lambda path, account: "media-1")
+    monkeypatch.setattr(
+        graph_module, "execute_tool", lambda *args, **kwargs: {"successful": True, "data": {"id": "42"}}
+    )
+    monkeypatch.setattr(graph_module, "call_composio_tool", composio_tool)
+    monkeypatch.setattr(graph_module, "enqueue_video_assets", lambda *args: False)
+    monkeypatch.setattr(graph_module, "produce_video_assets", produce_video)
+
+
+async def test_tweet_is_posted_before_the_video_is_ready(stubbed_providers) -> None:
+    events = []
+    async for mode, chunk in graph_module.graph.astream(
+        {"query": "post a new tweet: Hello"}, stream_mode=["custom"]
+    ):
+        events.append(chunk["event"])
+    assert events == ["image_ready", "media_uploaded", "tweet_posted", "reply_posted", "video_ready"]
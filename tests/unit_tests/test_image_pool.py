@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+import pytest
+
+from agent import image_pool
+from agent.accounts import Account
+
+pytestmark = pytest.mark.anyio
+
+ACCOUNT = Account(name="main")
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(image_pool, "IMAGE_POOL_DIR", tmp_path / "image_pool")
+    monkeypatch.setattr(image_pool, "pool_themes", lambda account: {
+        "DisputeAI": {"name": "DisputeAI", "description": "AI dispute letters", "url": "https://disputeai.xyz"},
+        "ConsumerAI": {"name": "ConsumerAI", "description": "Credit repair AI", "url": "https://consumerai.info"},
+    })
+    generated = []
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def generate_image(text, unique_id, directory="temp_images", product_name=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        generated.append(product_name)
+        path = tmp_path / directory / f"generated_{unique_id}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(product_name.encode())
+        return str(path)
+
+    monkeypatch.setattr(image_pool, "generate_image", generate_image)
+    return generated, peak
+
+
+def test_match_theme_by_url_then_name(pool) -> None:
+    assert image_pool.match_theme("try it https://consumerai.info #AI", ACCOUNT) == "ConsumerAI"
+    assert image_pool.match_theme("DisputeAI wrote my letters", ACCOUNT) == "DisputeAI"
+    assert image_pool.match_theme("nothing to see", ACCOUNT) is None
+
+
+async def test_refill_tops_up_each_theme_with_bounded_concurrency(pool) -> None:
+    generated, peak = pool
+    assert await image_pool.refill_image_pool(ACCOUNT, size=3, concurrency=2) == 6
+    assert peak[0] <= 2
+    assert image_pool.pool_size(ACCOUNT, "DisputeAI") == 3
+    assert not list((image_pool.IMAGE_POOL_DIR / ".staging").glob("*.png"))
+
+    image_pool.take(ACCOUNT, "DisputeAI")
+    assert await image_pool.refill_image_pool(ACCOUNT, size=3) == 1
+    assert generated.count("DisputeAI") == 4
+
+
+async def test_take_pooled_image_claims_each_image_once(pool) -> None:
+    await image_pool.refill_image_pool(ACCOUNT, size=1)
+    path = image_pool.take_pooled_image("check https://disputeai.xyz", ACCOUNT)
+    assert os.path.basename(path).startswith("pooled_")
+    with open(path, "rb") as f:
+        assert f.read() == b"DisputeAI"
+    assert image_pool.take_pooled_image("check https://disputeai.xyz", ACCOUNT) is None
+    assert image_pool.take_pooled_image("no product here", ACCOUNT) is None
+
+
+async def test_taken_images_never_share_a_name(pool) -> None:
+    await image_pool.refill_image_pool(ACCOUNT, size=2)
+    paths = {image_pool.take(ACCOUNT, "DisputeAI") for _ in range(2)}
+    assert len(paths) == 2 and all(os.path.exists(p) for p in paths)
+
+
+async def test_failed_generation_is_skipped(pool, monkeypatch) -> None:
+    def fail(*args, **kwargs):
+        raise RuntimeError("quota")
+
+    monkeypatch.setattr(image_pool, "generate_image", fail)
+    assert await image_pool.refill_image_pool(ACCOUNT, size=1) == 0
+    assert image_pool.pool_size(ACCOUNT, "ConsumerAI") == 0
@@ -0,0 +1,69 @@
+import sqlite3
+
+from agent.ledger import PostLedger
+
+
+def test_steps_survive_reopening(tmp_path) -> None:
+    path = str(tmp_path / "ledger.db")
+    run = PostLedger(path).start("post-1", "default", "post a new tweet: hi")
+    run.record("compose", {"tweet_text": "hi"})
+
+    ledger = PostLedger(path)
+    [pending] = ledger.incomplete_posts("default")
+    assert (pending["key"], pending["query"]) == ("post-1", "post a new tweet: hi")
+    resumed = ledger.start("post-1")
+    assert resumed.get("compose") == {"tweet_text": "hi"}
+    assert resumed.get("tweet") is None
+
+    resumed.finish()
+    assert ledger.incomplete_posts() == []
+
+
+def test_incomplete_posts_filters_by_account_and_age(tmp_path) -> None:
+    ledger = PostLedger(str(tmp_path / "ledger.db"))
+    ledger.start("a-1", "a")
+    ledger.start("b-1", "b")
+    assert [p["key"] for p in ledger.incomplete_posts("b")] == ["b-1"]
+    assert ledger.incomplete_posts(stale_after=3600) == []
+
+
+def test_partial_posts_are_resumed(tmp_path) -> None:
+    ledger = PostLedger(str(tmp_path / "ledger.db"))
+    ledger.start("done-1").finish()
+    ledger.start("partial-1").finish("partial")
+    assert [(p["key"], p["status"]) for p in ledger.incomplete_posts()] == [("partial-1", "partial")]
+
+
+def test_posts_past_their_resume_limits_are_failed(tmp_path) -> None:
+    ledger = PostLedger(str(tmp_path / "ledger.db"))
+    ledger.start("stuck-1")
+    ledger.start("fresh-1")
+    assert ledger.record_resume("stuck-1") == 1
+    assert ledger.record_resume("stuck-1") == 2
+    assert [p["key"] for p in ledger.incomplete_posts(max_resumes=2)] == ["fresh-1"]
+    assert ledger.incomplete_posts(max_age=-1) == []
+    with ledger._conn() as conn:
+        statuses = dict(conn.execute("SELECT key, status FROM posts").fetchall())
+    assert statuses == {"stuck-1": "failed", "fresh-1": "failed"}
+
+
+def test_ledgers_without_resume_counts_are_migrated(tmp_path) -> None:
+    path = str(tmp_path / "ledger.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE posts (key TEXT PRIMARY KEY, account TEXT, query TEXT, "
+                     "status TEXT NOT NULL DEFAULT 'in_progress', created REAL NOT NULL, updated REAL NOT NULL)")
+        conn.execute("INSERT INTO posts (key, created, updated) VALUES ('old-1', 0, 0)")
+    assert PostLedger(path).incomplete_posts()[0]["resumes"] == 0
+
+
+def test_partial_posts_out_of_resumes_are_done(tmp_path) -> None:
+    ledger = PostLedger(str(tmp_path / "ledger.db"))
+    run = ledger.start("partial-1")
+    run.record("degraded", [{"stage": "video"}])
+    run.finish("partial")
+    ledger.record_resume("partial-1")
+    assert ledger.incomplete_posts(max_resumes=1) == []
+    with ledger._conn() as conn:
+        [(status,)] = conn.execute("SELECT status FROM posts").fetchall()
+    assert status == "done"
+    assert run.get("degraded") == [{"stage": "video"}]
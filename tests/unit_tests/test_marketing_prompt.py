@@ -0,0 +1,91 @@
+import importlib
+import json
+import os
+
+import pytest
+
+from agent import marketing_prompt
+from agent.marketing_prompt import (
+    CONFIG_PATH,
+    get_compiled_prompt,
+    load_marketing_config,
+)
+from agent.product_index import ProductIndex
+
+graph_module = importlib.import_module("agent.graph")
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "marketing_config.json"
+    path.write_text(CONFIG_PATH.read_text(encoding="utf-8"), encoding="utf-8")
+    return path
+
+
+def _touch(path, config) -> None:
+    stat = os.stat(path)
+    path.write_text(json.dumps(config), encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_compiled_prompt_is_cached_until_config_changes(config_file) -> None:
+    first = get_compiled_prompt(config_file)
+    assert get_compiled_prompt(config_file) is first
+    assert "ConsumerAI" in first.product_fragments
+
+    config = dict(first.config)
+    config["company"] = {**config["company"], "name": "Renamed Co"}
+    _touch(config_file, config)
+    reloaded = get_compiled_prompt(config_file)
+    assert reloaded is not first
+    assert "Renamed Co" in reloaded.text
+
+
+def test_invalid_reload_keeps_previous_prompt(config_file, monkeypatch) -> None:
+    first = get_compiled_prompt(config_file)
+    _touch(config_file, {"company": {}})
+    assert get_compiled_prompt(config_file).text == first.text
+
+    # The broken version is parsed once, not on every call
+    parses = []
+    monkeypatch.setattr(marketing_prompt.json, "loads", lambda raw: parses.append(raw) or {})
+    for _ in range(3):
+        assert get_compiled_prompt(config_file) is first
+    assert not parses
+
+    config = dict(first.config)
+    monkeypatch.undo()
+    config["company"] = {**config["company"], "name": "Fixed Co"}
+    _touch(config_file, config)
+    assert "Fixed Co" in get_compiled_prompt(config_file).text
+
+
+def test_invalid_config_without_previous_prompt_raises(tmp_path) -> None:
+    path = tmp_path / "bad.json"
+    path.write_text("{}", encoding="utf-8")
+    with pytest.raises(ValueError):
+        get_compiled_prompt(path)
+
+
+def test_loaded_config_is_a_copy(config_file) -> None:
+    config = load_marketing_config(config_file)
+    config["company"]["name"] = "Changed Co"
+    config["products"].clear()
+    assert get_compiled_prompt(config_file).config["company"]["name"] != "Changed Co"
+    assert load_marketing_config(config_file)["products"]
+
+
+def test_prompt_is_rebuilt_only_when_its_inputs_change(config_file, monkeypatch) -> None:
+    index = ProductIndex()
+    contexts = []
+    monkeypatch.setattr(graph_module, "get_product_index", lambda: index)
+    monkeypatch.setattr(graph_module, "get_product_context", lambda query: contexts.append(query) or "")
+    monkeypatch.setattr(graph_module, "_prompt_cache", {})
+    first = graph_module.get_prompt("dispute letters", config_file)
+    assert graph_module.get_prompt("dispute letters", config_file) is first
+    assert contexts == ["dispute letters"]
+
+    monkeypatch.setattr(index, "version", index.version + 1)
+    assert graph_module.get_prompt("dispute letters", config_file) is not first
+    graph_module.get_prompt("credit repair", config_file)
+    assert contexts == ["dispute letters", "dispute letters", "credit repair"]
@@ -0,0 +1,48 @@
+import hashlib
+
+import pytest
+from PIL import Image
+
+from agent import media_optimizer, streaming
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def png(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_optimizer, "OPTIMIZED_DIR", tmp_path / "optimized")
+    path = tmp_path / "generated_1.png"
+    gradient = Image.linear_gradient("L").resize((2048, 1024))
+    Image.merge("RGBA", (gradient, gradient, Image.effect_noise((2048, 1024), 12), gradient)).save(path)
+    return str(path)
+
+
+async def test_twitter_profile_is_smaller_and_bounded(png) -> None:
+    result = await media_optimizer.optimize_image(png, "twitter")
+    assert result["optimized"]
+    assert result["path"].endswith("generated_1-twitter.jpg")
+    assert result["bytes"] < result["source_bytes"]
+    assert (result["width"], result["height"]) == (1600, 800)
+    with open(png, "rb") as f:
+        assert result["source_sha256"] == hashlib.sha256(f.read()).hexdigest()
+    with Image.open(result["path"]) as image:
+        assert image.format == "JPEG"
+
+
+def test_thumbnail_fills_exact_size(png) -> None:
+    result = media_optimizer.optimize_image_sync(png, "youtube_thumbnail")
+    with Image.open(result["path"]) as image:
+        assert image.size == (1280, 720)
+
+
+async def test_unreadable_image_falls_back_to_original(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(media_optimizer, "OPTIMIZED_DIR", tmp_path / "optimized")
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    assert await media_optimizer.optimize_image(str(broken), "twitter") == {"path": str(broken), "optimized": False}
+
+
+def test_hash_file(tmp_path) -> None:
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"x" * (3 * streaming.STREAM_CHUNK_BYTES + 7))
+    assert media_optimizer.hash_file(str(path)) == hashlib.sha256(path.read_bytes()).hexdigest()
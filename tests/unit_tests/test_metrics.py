@@ -0,0 +1,113 @@
+import gc
+import socket
+import threading
+import urllib.request
+
+import pytest
+
+from agent.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    start_metrics_server,
+    timed,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def test_per_thread_shards_are_merged() -> None:
+    registry = Registry()
+    counter = Counter("jobs_total", "Jobs.", ("kind",), registry=registry)
+    histogram = Histogram("job_seconds", "Job time.", ("kind",), buckets=(0.1, 1), registry=registry)
+
+    def work() -> None:
+        for _ in range(1000):
+            counter.inc(kind="a")
+            histogram.observe(0.5, kind="a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counter.value(kind="a") == 4000
+    text = registry.render()
+    assert 'jobs_total{kind="a"} 4000' in text
+    assert 'job_seconds_bucket{kind="a",le="0.1"} 0' in text
+    assert 'job_seconds_bucket{kind="a",le="1.0"} 4000' in text
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 4000' in text
+    assert 'job_seconds_count{kind="a"} 4000' in text
+
+
+def test_shards_of_exited_threads_are_folded() -> None:
+    registry = Registry()
+    counter = Counter("churn_total", "Churn.", registry=registry)
+    histogram = Histogram("churn_seconds", "Churn time.", buckets=(1,), registry=registry)
+
+    def work() -> None:
+        counter.inc()
+        histogram.observe(0.5)
+
+    for _ in range(50):
+        t = threading.Thread(target=work)
+        t.start()
+        t.join()
+    gc.collect()
+
+    assert len(counter._shards) <= 1 and len(histogram._shards) <= 1
+    assert counter.value() == 50
+    assert 'churn_seconds_count 50' in registry.render()
+
+
+def test_histogram_snapshots_are_not_changed_by_later_observations() -> None:
+    histogram = Histogram("snapshot_seconds", "Snapshot time.", buckets=(1,), registry=Registry())
+    histogram.observe(0.5)
+    [_, shard] = histogram._snapshots()
+    histogram.observe(2)
+    assert list(shard.values()) == [[1, 0, 0.5, 1]]
+    assert histogram.merged() == [1, 1, 2.5, 2]
+
+
+def test_quantile_interpolates_within_buckets() -> None:
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(1, 10), registry=None)
+    assert histogram.quantile(0.9) is None
+    for value in [0.5] * 5 + [5] * 5:
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 1.0
+    assert histogram.quantile(0.9) == pytest.approx(8.2)
+    histogram.observe(100)
+    assert histogram.quantile(1.0) == 10  # Past the last bucket
+
+
+def test_gauge_callback_and_label_escaping() -> None:
+    registry = Registry()
+    Gauge("state", "State.", ("name",), func=lambda: {('say "hi"',): 2}, registry=registry)
+    assert 'state{name="say \\"hi\\""} 2.0' in registry.render()
+
+
+async def test_timed_counts_errors() -> None:
+    from agent.metrics import STAGE_ERRORS, STAGE_SECONDS
+
+    @timed("test_stage")
+    async def fails() -> None:
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await fails()
+    assert STAGE_ERRORS.value(stage="test_stage") == 1
+    assert STAGE_SECONDS.merged(stage="test_stage")[-1] == 1
+
+
+def test_metrics_endpoint() -> None:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = start_metrics_server(port=port)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            assert "# TYPE agent_stage_seconds histogram" in response.read().decode()
+    finally:
+        server.shutdown()
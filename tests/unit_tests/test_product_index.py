@@ -0,0 +1,50 @@
+from agent.product_index import ProductIndex, chunk_markdown
+
+PAGES = {
+    "https://disputeai.xyz": {
+        "title": "DisputeAI",
+        "description": "Automate credit disputes",
+        "content": "Send dispute letters to the credit bureaus.\n\nTrack every response automatically.",
+    },
+    "https://fdwa.site": {
+        "title": "FDW Agency",
+        "description": "Custom AI agents",
+        "content": "We build automation workflows for small business owners.",
+    },
+}
+
+
+def test_search_ranks_relevant_page_first() -> None:
+    index = ProductIndex()
+    index.update(PAGES)
+    results = index.search("how do I write dispute letters?")
+    assert results
+    assert results[0]["url"] == "https://disputeai.xyz"
+
+
+def test_update_only_reindexes_changed_pages() -> None:
+    index = ProductIndex()
+    assert index.update(PAGES) == 2
+    version = index.version
+    assert index.update(PAGES) == 0
+    assert index.version == version  # Unchanged, so cached prompts stay valid
+    changed = dict(PAGES)
+    changed["https://fdwa.site"] = {**PAGES["https://fdwa.site"], "content": "New agents"}
+    assert index.update(changed) == 1
+    del changed["https://disputeai.xyz"]
+    index.update(changed)
+    assert {r["url"] for r in index.search("credit disputes agents")} == {"https://fdwa.site"}
+
+
+def test_keywords_boost_and_token_budget() -> None:
+    index = ProductIndex()
+    index.update(PAGES)
+    index.set_keywords({"https://fdwa.site": ["business ai"]})
+    results = index.search("business ai automation", token_budget=1000)
+    assert results[0]["url"] == "https://fdwa.site"
+    assert index.search("credit bureaus automation", token_budget=1) == []
+
+
+def test_chunk_markdown_respects_max_chars() -> None:
+    text = "\n\n".join(["word " * 50] * 5)
+    assert all(len(c) <= 300 for c in chunk_markdown(text, max_chars=300))
@@ -0,0 +1,57 @@
+import importlib
+import pstats
+
+import pytest
+
+from agent import accounts, profiling
+from agent.graph import graph
+from agent.profiling import maybe_profile, profile_run, profiling_enabled
+
+pytestmark = pytest.mark.anyio
+
+
+def test_profile_run_writes_stats(tmp_path) -> None:
+    with profile_run("post", tmp_path) as path:
+        sum(i * i for i in range(10000))
+    assert path.parent == tmp_path
+    assert "-post-" in path.name and path.suffix == ".pstats"
+    assert pstats.Stats(str(path)).total_calls > 0
+
+
+def test_only_one_profile_at_a_time(tmp_path) -> None:
+    with profile_run("outer", tmp_path) as outer:
+        with profile_run("inner", tmp_path) as inner:
+            pass
+    assert outer is not None and inner is None
+    assert [p.name for p in tmp_path.iterdir()] == [outer.name]
+
+
+def test_disabled_profiling_wraps_nothing(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    with maybe_profile("search", False) as path:
+        pass
+    assert path is None
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("mode, graph_on, jobs_on", [
+    ("", False, False), ("1", True, False), ("graph", True, False), ("jobs", False, True), ("all", True, True),
+])
+def test_profiling_modes(monkeypatch, mode, graph_on, jobs_on) -> None:
+    monkeypatch.setattr(profiling, "PROFILE_MODE", mode)
+    assert profiling_enabled("graph") is graph_on
+    assert profiling_enabled("jobs") is jobs_on
+
+
+async def test_context_profiles_a_graph_run_tagged_by_intent(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "PROFILE_MODE", "")
+    monkeypatch.delenv("TWITTER_CONNECTION_ID", raising=False)  # Stop before any provider call
+    monkeypatch.setattr(accounts, "_cache", {"mtime_ns": None, "accounts": None})
+    monkeypatch.setattr(accounts, "ACCOUNTS_FILE", tmp_path / "accounts.json")
+    monkeypatch.setattr(importlib.import_module("agent.graph"), "llm", object())
+
+    await graph.ainvoke({"query": "search for credit repair"}, context={"profile": True})
+    await graph.ainvoke({"query": "search for credit repair"})
+
+    assert [p.name.split("-")[2] for p in tmp_path.glob("*.pstats")] == ["search"]
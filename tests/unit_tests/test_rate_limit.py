@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from agent import rate_limit
+from agent.rate_limit import (
+    RateGovernor,
+    RateLimitExceeded,
+    RetryableError,
+    TokenBucket,
+    parse_rate_headers,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def test_bucket_spaces_requests_beyond_burst() -> None:
+    bucket = TokenBucket(2, 1)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.01)
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.01)
+    assert bucket.reserve(max_wait=0.5) == -1
+
+
+def test_headers_shrink_bucket() -> None:
+    reset = time.time() + 30
+    info = parse_rate_headers({"X-Rate-Limit-Remaining": "0", "X-Rate-Limit-Reset": str(int(reset))})
+    assert info["remaining"] == 0
+    assert info["reset_after"] == pytest.approx(30, abs=1.5)
+    assert parse_rate_headers({"Retry-After": "7"})["retry_after"] == 7
+
+    governor = RateGovernor({"tool": (10, 1)}, mode="fail")
+    governor.observe("tool", {"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(int(reset))})
+    with pytest.raises(RateLimitExceeded):
+        governor.acquire_sync("tool")
+    governor.acquire_sync("tool", scope="other-account")
+
+
+async def test_call_retries_429_but_not_unsafe_5xx(monkeypatch) -> None:
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda attempt, retry_after=None: 0)
+    governor = RateGovernor({"tool": (100, 1)}, max_retries=3)
+    calls = []
+
+    async def flaky(status):
+        calls.append(status)
+        if len(calls) < 3:
+            raise RetryableError(status)
+        return "ok"
+
+    assert await governor.call("tool", flaky, 429, idempotent=False) == "ok"
+    assert len(calls) == 3
+
+    calls.clear()
+    with pytest.raises(RetryableError):
+        await governor.call("tool", flaky, 503, idempotent=False)
+    assert len(calls) == 1
+    assert governor.call_sync("tool", lambda: "ok") == "ok"
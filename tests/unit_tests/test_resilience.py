@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+from agent import resilience
+from agent.rate_limit import RetryableError
+from agent.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+pytestmark = pytest.mark.anyio
+
+
+def test_breaker_opens_then_recovers_through_half_open() -> None:
+    breaker = CircuitBreaker("svc", failure_threshold=2, recovery_time=0.05)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record(RetryableError(503))
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # Only one trial at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_rate_limits_do_not_trip() -> None:
+    breaker = CircuitBreaker("svc", failure_threshold=1)
+    breaker.before_call()
+    breaker.record(RetryableError(429))
+    assert breaker.state == CLOSED
+
+
+def test_blocking_call_times_out_and_short_circuits(monkeypatch) -> None:
+    monkeypatch.setitem(resilience._breakers, "slow", CircuitBreaker("slow", failure_threshold=1))
+    with pytest.raises(TimeoutError):
+        resilience.call("slow", time.sleep, 1, timeout=0.05)
+    assert not resilience.is_available("slow")
+    with pytest.raises(CircuitOpenError):
+        resilience.call("slow", lambda: "never called")
+    assert resilience.breaker_states()["slow"]["state"] == OPEN
+
+
+async def test_async_call_times_out(monkeypatch) -> None:
+    monkeypatch.setitem(resilience._breakers, "slow_async", CircuitBreaker("slow_async"))
+    with pytest.raises(TimeoutError):
+        await resilience.call_async("slow_async", asyncio.sleep, 1, timeout=0.05)
+    assert resilience.get_breaker("slow_async").failures == 1
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from agent.scheduler_engine import CronSpec, Job, Scheduler
+
+pytestmark = pytest.mark.anyio
+
+
+def test_cron_next_after() -> None:
+    spec = CronSpec("30 6 * * 1-5")
+    # 2026-10-17 is a Saturday, so the next weekday run is Monday
+    assert spec.next_after(datetime(2026, 10, 17, 7, 0)) == datetime(2026, 10, 19, 6, 30)
+    assert CronSpec("*/15 * * * *").next_after(datetime(2026, 1, 1, 0, 14)) == datetime(2026, 1, 1, 0, 15)
+    with pytest.raises(ValueError):
+        CronSpec("61 * * * *")
+
+
+async def test_overlap_prevented_and_state_persisted(tmp_path) -> None:
+    running = 0
+    peak = 0
+
+    async def slow() -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    state_file = tmp_path / "state.json"
+    scheduler = Scheduler([Job("slow", slow, interval=0.01)], state_file=state_file)
+    task = asyncio.create_task(scheduler.run())
+    await asyncio.sleep(0.12)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert peak == 1
+    assert "slow" in json.loads(state_file.read_text())["last_runs"]
+
+
+def test_missed_run_is_caught_up(tmp_path) -> None:
+    state_file = tmp_path / "state.json"
+    now = time.time()
+    state_file.write_text(json.dumps({"last_runs": {"a": now - 7200, "b": now - 7200}}))
+    jobs = [
+        Job("a", lambda: None, interval=3600),
+        Job("b", lambda: None, interval=3600, catch_up=False),
+    ]
+    scheduler = Scheduler(jobs, state_file=state_file)
+    scheduler._load_state()
+    assert scheduler._first_run(jobs[0], now) == now
+    assert scheduler._first_run(jobs[1], now) == now + 3600
+
+
+async def test_only_leader_runs_leader_jobs(tmp_path) -> None:
+    from agent.coordination import SQLiteLeaseStore
+
+    store = SQLiteLeaseStore(str(tmp_path / "coord.db"))
+    runs = []
+
+    def make_job(worker: str, name: str, leader_only: bool = True) -> Job:
+        async def run() -> None:
+            runs.append((worker, name))
+
+        return Job(name, run, interval=3600, leader_only=leader_only)
+
+    schedulers = [
+        Scheduler([make_job(w, "post"), make_job(w, "media", leader_only=False)],
+                  state_file=tmp_path / f"{w}.json", store=store, owner=w)
+        for w in ("a", "b")
+    ]
+    tasks = [asyncio.create_task(s.run()) for s in schedulers]
+    await asyncio.sleep(0.2)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert [name for _, name in runs].count("post") == 1
+    assert sorted(w for w, name in runs if name == "media") == ["a", "b"]
+
+
+async def test_non_leader_keeps_the_leaders_last_runs(tmp_path) -> None:
+    from agent.coordination import SQLiteLeaseStore
+
+    store = SQLiteLeaseStore(str(tmp_path / "coord.db"))
+    store.set_value("scheduler:last_runs", {"post": 100.0})
+
+    async def noop() -> None:
+        pass
+
+    jobs = [Job("post", noop, interval=3600), Job("media", noop, interval=3600, leader_only=False)]
+    follower = Scheduler(jobs, state_file=tmp_path / "b.json", store=store, owner="b")
+    follower._last_runs = {"post": 50.0}
+    await follower._start_run(jobs[0], 200.0)
+    await follower._start_run(jobs[1], 200.0)
+    assert store.get_value("scheduler:last_runs") == {"post": 100.0}
+    assert json.loads((tmp_path / "b.json").read_text())["last_runs"] == {"media": 200.0}
+
+    follower._load_state()
+    assert follower._last_runs == {"post": 100.0, "media": 200.0}
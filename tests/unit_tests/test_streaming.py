@@ -0,0 +1,107 @@
+import hashlib
+import http.server
+import os
+import threading
+import tracemalloc
+from email.parser import BytesParser
+
+import pytest
+
+from agent import streaming
+from agent.uploadpost_agent import StreamingUploadPostClient
+
+CHUNK = 64 * 1024
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    received = []
+    payload = os.urandom(5 * CHUNK + 3)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.payload)))
+        self.end_headers()
+        self.wfile.write(self.payload)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.received.append((self.headers["Content-Type"], body))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"success": true}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    _Handler.received.clear()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(os.urandom(10 * CHUNK + 5))
+    return path
+
+
+def test_file_chunks_and_hash(video, tmp_path) -> None:
+    chunks = [bytes(c) for c in streaming.iter_file_chunks(video, CHUNK)]
+    assert [len(c) for c in chunks] == [CHUNK] * 10 + [5]
+    assert streaming.file_sha256(video, CHUNK) == hashlib.sha256(video.read_bytes()).hexdigest()
+    empty = tmp_path / "empty.mp4"
+    empty.touch()
+    assert list(streaming.iter_file_chunks(empty)) == []
+
+
+def test_write_chunks_is_atomic(tmp_path) -> None:
+    target = tmp_path / "out" / "video.mp4"
+
+    def failing():
+        yield b"partial"
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        streaming.write_chunks(target, failing())
+    assert not target.parent.exists() or not list(target.parent.iterdir())
+    assert streaming.write_chunks(target, streaming.iter_bytes_chunks(b"x" * 100, 30)) == 100
+    assert target.read_bytes() == b"x" * 100
+
+
+def test_download_to_file(server, tmp_path) -> None:
+    target = tmp_path / "download.mp4"
+    assert streaming.download_to_file(f"{server}/video", target, chunk_size=CHUNK) == len(_Handler.payload)
+    assert target.read_bytes() == _Handler.payload
+
+
+def test_multipart_stream_memory_is_bounded_by_chunk_size(video) -> None:
+    body = streaming.MultipartStream([("user", "brand"), ("platform[]", "youtube")], [("video", ("v.mp4", str(video)))],
+                                     chunk_size=CHUNK)
+    tracemalloc.start()
+    total = 0
+    for part in body:
+        total += len(part)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert total == len(body)
+    assert peak < 3 * CHUNK  # Not the 640 KiB video
+
+
+def test_streaming_client_uploads_a_valid_multipart_body(server, video, monkeypatch) -> None:
+    monkeypatch.setattr(StreamingUploadPostClient, "BASE_URL", server)
+    client = StreamingUploadPostClient(api_key="key")
+    assert client.upload_video(str(video), title="Title", user="brand", platforms=["youtube", "tiktok"]) == {
+        "success": True
+    }
+    [(content_type, body)] = _Handler.received
+    message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    parts = [(p.get_param("name", header="content-disposition"), p) for p in message.get_payload()]
+    assert dict(parts)["video"].get_payload(decode=True) == video.read_bytes()
+    assert dict(parts)["title"].get_payload() == "Title"
+    assert [p.get_payload() for name, p in parts if name == "platform[]"] == ["youtube", "tiktok"]
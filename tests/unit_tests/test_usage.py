@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation, LLMResult
+
+from agent.usage import (
+    _extract_token_usage,
+    estimate_cost,
+    format_usage,
+    record_video_generation,
+    track_usage,
+    usage_callbacks,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def model(stage: str, *replies: AIMessage) -> GenericFakeChatModel:
+    return GenericFakeChatModel(messages=iter(replies), callbacks=usage_callbacks(stage))
+
+
+def reply(prompt_tokens: int, completion_tokens: int) -> AIMessage:
+    return AIMessage(content="ok", usage_metadata={
+        "input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    })
+
+
+def test_token_extraction() -> None:
+    message = ChatGeneration(message=reply(12, 3))
+    assert _extract_token_usage(LLMResult(generations=[[message]])) == (12, 3)
+    legacy = LLMResult(generations=[[Generation(text="ok")]],
+                       llm_output={"token_usage": {"prompt_tokens": 7, "completion_tokens": 2}})
+    assert _extract_token_usage(legacy) == (7, 2)
+    assert _extract_token_usage(LLMResult(generations=[[Generation(text="ok")]])) is None
+
+
+def test_cost_uses_per_million_token_prices() -> None:
+    assert estimate_cost("models/gemini-2.5-flash", 1_000_000, 1_000_000) == pytest.approx(2.80)
+    assert estimate_cost("gemini-2.0-flash-exp", 2000, 500) == pytest.approx(0.0004)
+    assert estimate_cost("unpriced-model", 1000, 1000) == 0
+
+
+def test_calls_are_aggregated_by_stage_and_model() -> None:
+    with track_usage() as usage:
+        model("image_prompt", reply(100, 20)).invoke("draw")
+        model("youtube_title", reply(50, 10), reply(60, 10)).batch(["a", "b"])
+        model("estimated", AIMessage(content="x" * 40)).invoke("y" * 80)  # No usage metadata
+        record_video_generation("veo-3.1-generate-preview", 8, 30.0)
+    summary = usage.summary()
+    assert summary["calls"] == 5
+    assert summary["by_stage"]["youtube_title"]["prompt_tokens"] == 110
+    assert summary["by_stage"]["estimated"]["prompt_tokens"] > 0
+    assert summary["calls_detail"][3]["estimated"] is True
+    assert summary["by_stage"]["video_generation"]["cost"] == pytest.approx(3.20)
+    assert summary["by_model"]["veo-3.1-generate-preview"]["latency"] == 30.0
+    assert "5 LLM call(s)" in format_usage(summary)
+
+
+def test_nested_blocks_collect_their_own_calls() -> None:
+    with track_usage() as outer:
+        model("outer", reply(1, 1)).invoke("a")
+        with track_usage() as inner:
+            model("inner", reply(2, 2)).invoke("b")
+    assert list(outer.summary()["by_stage"]) == ["outer"]
+    assert list(inner.summary()["by_stage"]) == ["inner"]
+
+
+async def test_concurrent_runs_and_their_threads_stay_separate() -> None:
+    async def run(name: str, tokens: int):
+        with track_usage() as usage:
+            await model(name, reply(tokens, 1)).ainvoke("async")
+            await asyncio.to_thread(model(name, reply(tokens, 1)).invoke, "thread")
+        return usage.summary()
+
+    first, second = await asyncio.gather(run("first", 10), run("second", 20))
+    assert (first["calls"], first["prompt_tokens"], list(first["by_stage"])) == (2, 20, ["first"])
+    assert (second["calls"], second["prompt_tokens"], list(second["by_stage"])) == (2, 40, ["second"])